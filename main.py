@@ -6,14 +6,23 @@ Point d'entrée de l'application
 
 import sys
 import os
+import time
+
+# Origine du rapport de démarrage: avant les imports de Qt et de l'application
+_START = time.perf_counter()
+
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtCore import Qt
 from src.ui.main_window import MainWindow
 from src.core.config import Config
 from src.core.logger import setup_logger
+from src.core.startup import StartupTimer
 
 def main():
     """Point d'entrée principal de l'application"""
+    startup = StartupTimer(_START)
+    startup.mark("Imports")
+    
     # Configuration de l'application
     app = QApplication(sys.argv)
     app.setApplicationName("Borne de Recharge")
@@ -28,15 +37,17 @@ def main():
     
     # Chargement de la configuration
     config = Config()
+    startup.mark("Application et configuration")
     
-    # Création et affichage de la fenêtre principale
-    window = MainWindow(config)
+    # Création et affichage de la fenêtre principale (rapport de démarrage à la première image)
+    window = MainWindow(config, startup)
     
     # Mode plein écran pour la borne
     if config.get('display.fullscreen', True):
         window.showFullScreen()
     else:
         window.show()
+    startup.mark("Affichage de la fenêtre")
     
     # Démarrage de l'application
     try:
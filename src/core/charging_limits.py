@@ -0,0 +1,143 @@
+"""
+Application de la durée maximale de charge (lockers.charging_time_limit)
+"""
+
+import math
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from src.core.logger import setup_logger
+
+
+class ChargingLimitEngine:
+    """Surveille la durée de charge de chaque session
+
+    Les avertissements et la fin de charge sont des échéances de l'ordonnanceur
+    partagé du LockerManager: aucune minuterie par casier, quel que soit leur nombre.
+    À l'échéance, l'action configurée est appliquée:
+    - "overtime": la session passe en dépassement, facturé à la libération; le
+      début du dépassement est enregistré avec la session (save_session). Le
+      dépassement dure au plus lockers.max_overtime secondes (null: sans limite)
+    - "cutoff": l'alimentation du casier est coupée
+    """
+
+    def __init__(self, config, scheduler, save_session: Optional[Callable] = None):
+        self.config = config
+        self.scheduler = scheduler
+        self.save_session = save_session
+        self.logger = setup_logger("charging_limits")
+
+        self.time_limit = config.get('lockers.charging_time_limit', 7200)
+        self.warning_offsets = sorted(config.get('lockers.charging_warnings', [900, 300]), reverse=True)
+        self.limit_action = config.get('lockers.charging_limit_action', 'overtime')
+        self.overtime_rate = config.get('lockers.overtime_rate_per_hour', 1.0)
+        self.max_overtime = config.get('lockers.max_overtime', 3600)
+
+        # Casiers en dépassement (date de fin de charge autorisée) et casiers coupés
+        self.overtime_since: Dict[int, datetime] = {}
+        self.cut_off = set()
+
+        self._warning_listeners: List[Callable[[int, int], None]] = []
+        self._limit_listeners: List[Callable[[int, str], None]] = []
+        self.power_cutoff: Optional[Callable[[int], None]] = None
+
+    def add_warning_listener(self, callback: Callable[[int, int], None]):
+        """callback(locker_id, secondes restantes) avant la fin de charge"""
+        self._warning_listeners.append(callback)
+
+    def add_limit_listener(self, callback: Callable[[int, str], None]):
+        """callback(locker_id, action) quand la durée maximale est atteinte"""
+        self._limit_listeners.append(callback)
+
+    def session_lifetime(self, idle_timeout: float) -> Optional[float]:
+        """Durée au-delà de laquelle une session expire (secondes depuis son début)
+
+        Sans limite de charge, c'est security.session_timeout. Avec une limite,
+        une session en charge n'expire plus avant elle:
+        - "overtime": max_overtime secondes après la limite (le dépassement est
+          facturé à l'expiration), ou None si max_overtime est null: la session
+          reste alors ouverte jusqu'à sa libération
+        - "cutoff": session_timeout secondes après la coupure (délai de retrait)
+        """
+        if not self.time_limit:
+            return idle_timeout
+        if self.limit_action == 'cutoff':
+            return self.time_limit + idle_timeout
+        if self.max_overtime is None:
+            return None
+        return self.time_limit + self.max_overtime
+
+    def session_started(self, session):
+        """Planifie avertissements et fin de charge d'une session"""
+        locker_id = session.locker_id
+        if session.overtime_ts is not None:
+            # Dépassement déjà enregistré (redémarrage): ni avertissement ni nouvelle alerte
+            self.overtime_since[locker_id] = session.overtime_since
+            return
+        if not self.time_limit:
+            return
+
+        elapsed = time.time() - session.start_ts
+        remaining = self.time_limit - elapsed
+
+        for offset in self.warning_offsets:
+            if remaining > offset:
+                self.scheduler.schedule_in(
+                    ('charging_warning', locker_id, offset),
+                    remaining - offset,
+                    lambda offset=offset: self._warn(locker_id, offset)
+                )
+            else:
+                self.scheduler.cancel(('charging_warning', locker_id, offset))
+
+        self.scheduler.schedule_in(
+            ('charging_limit', locker_id),
+            remaining,
+            lambda: self._limit_reached(session)
+        )
+
+    def session_ended(self, locker_id: int) -> float:
+        """Annule les échéances d'une session et retourne le supplément de dépassement"""
+        for offset in self.warning_offsets:
+            self.scheduler.cancel(('charging_warning', locker_id, offset))
+        self.scheduler.cancel(('charging_limit', locker_id))
+        self.cut_off.discard(locker_id)
+
+        overtime_start = self.overtime_since.pop(locker_id, None)
+        if overtime_start is None:
+            return 0.0
+
+        overtime_hours = (datetime.now() - overtime_start).total_seconds() / 3600
+        fee = math.ceil(overtime_hours) * self.overtime_rate
+        self.logger.info(
+            f"Dépassement de {int(overtime_hours * 60)} min pour le casier {locker_id} "
+            f"(supplément: {fee}€)"
+        )
+        return fee
+
+    def is_overtime(self, locker_id: int) -> bool:
+        return locker_id in self.overtime_since
+
+    def _warn(self, locker_id: int, remaining: int):
+        self.logger.info(f"Casier {locker_id}: fin de charge dans {remaining // 60} min")
+        for callback in self._warning_listeners:
+            callback(locker_id, remaining)
+
+    def _limit_reached(self, session):
+        locker_id = session.locker_id
+        self.logger.warning(f"Durée maximale de charge atteinte pour le casier {locker_id}")
+
+        if self.limit_action == 'cutoff':
+            self.cut_off.add(locker_id)
+            if self.power_cutoff:
+                self.power_cutoff(locker_id)
+            else:
+                self.logger.info(f"Coupure de l'alimentation du casier {locker_id} (GPIO désactivé)")
+        else:
+            session.overtime_ts = session.start_ts + self.time_limit
+            self.overtime_since[locker_id] = session.overtime_since
+            if self.save_session:
+                self.save_session(session)
+
+        for callback in self._limit_listeners:
+            callback(locker_id, self.limit_action)
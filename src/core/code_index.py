@@ -0,0 +1,253 @@
+"""
+Index secondaires des codes prépayés (état, échéance, valeur, lot, préfixe)
+"""
+
+import bisect
+import math
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Un code indexé: valeur, création, expiration, utilisation (secondes epoch, 0 = jamais)
+CodeRecord = Tuple[str, float, int, int, Optional[int]]
+
+# Largeur des tranches d'échéance (un jour)
+BUCKET_SECONDS = 86400
+
+_VALUE, _CREATED, _EXPIRY, _USED_TS = range(4)
+
+
+class CodeIndex:
+    """Index en mémoire des codes prépayés pour les recherches de l'administration
+
+    - codes triés (recherche par préfixe, par dichotomie)
+    - ensembles par état (utilisé / non utilisé), par valeur et par lot (codes de même
+      valeur créés dans la même seconde)
+    - tranches d'échéance d'un jour, triées: les codes expirés ou expirant dans une
+      période ne sont cherchés que dans les tranches concernées
+
+    Une requête intersecte les ensembles des filtres, du plus petit au plus grand.
+    Les ordres de tri complets sont calculés une fois puis gardés jusqu'au prochain
+    ajout ou retrait de codes. L'appelant protège l'index par son propre verrou.
+    """
+
+    def __init__(self, records: Iterable[CodeRecord] = ()):
+        self._meta: Dict[str, list] = {}
+        self._used: Set[str] = set()
+        self._unused: Set[str] = set()
+        self._unused_by_value: Dict[float, int] = {}
+        self._by_value: Dict[float, Set[str]] = {}
+        self._by_batch: Dict[Tuple[int, float], Set[str]] = {}
+        self._by_bucket: Dict[int, Set[str]] = {}
+        self._buckets: List[int] = []
+        self._sorted_codes: List[str] = []
+        self._orders: Dict[str, List[str]] = {}
+        self.add_many(records)
+
+    def __len__(self) -> int:
+        return len(self._meta)
+
+    def __contains__(self, code) -> bool:
+        return code in self._meta
+
+    # ------------------------------------------------------------------
+    # Mises à jour
+    # ------------------------------------------------------------------
+
+    def add_many(self, records: Iterable[CodeRecord]):
+        added = []
+        for code, value, created_ts, expiry_ts, used_ts in records:
+            if code in self._meta:
+                continue
+            self._meta[code] = [value, created_ts, expiry_ts, used_ts or 0]
+            self._by_value.setdefault(value, set()).add(code)
+            self._by_batch.setdefault((created_ts, value), set()).add(code)
+
+            bucket = expiry_ts // BUCKET_SECONDS
+            codes = self._by_bucket.get(bucket)
+            if codes is None:
+                codes = self._by_bucket[bucket] = set()
+                bisect.insort(self._buckets, bucket)
+            codes.add(code)
+
+            if used_ts is None:
+                self._unused.add(code)
+                self._unused_by_value[value] = self._unused_by_value.get(value, 0) + 1
+            else:
+                self._used.add(code)
+            added.append(code)
+
+        if not added:
+            return
+        if len(added) == 1:
+            bisect.insort(self._sorted_codes, added[0])
+        else:
+            # Fusion de deux suites triées (timsort): linéaire
+            added.sort()
+            self._sorted_codes += added
+            self._sorted_codes.sort()
+        self._orders.clear()
+
+    def set_used(self, code: str, used_ts: Optional[int]):
+        """Change l'état d'un code (utilisé à used_ts, ou de nouveau utilisable)"""
+        meta = self._meta.get(code)
+        if meta is None:
+            return
+        value = meta[_VALUE]
+        was_used = code in self._used
+        meta[_USED_TS] = used_ts or 0
+
+        if used_ts is not None and not was_used:
+            self._unused.discard(code)
+            self._used.add(code)
+            self._unused_by_value[value] -= 1
+        elif used_ts is None and was_used:
+            self._used.discard(code)
+            self._unused.add(code)
+            self._unused_by_value[value] = self._unused_by_value.get(value, 0) + 1
+        self._orders.pop('used', None)
+
+    def remove_many(self, codes: Iterable[str]):
+        removed = set()
+        for code in codes:
+            meta = self._meta.pop(code, None)
+            if meta is None:
+                continue
+            value, created_ts, expiry_ts, _ = meta
+            self._discard(self._by_value, value, code)
+            self._discard(self._by_batch, (created_ts, value), code)
+            bucket = expiry_ts // BUCKET_SECONDS
+            if self._discard(self._by_bucket, bucket, code):
+                del self._buckets[bisect.bisect_left(self._buckets, bucket)]
+            if code in self._used:
+                self._used.discard(code)
+            else:
+                self._unused.discard(code)
+                self._unused_by_value[value] -= 1
+            removed.add(code)
+
+        if removed:
+            if len(removed) == 1:
+                code = next(iter(removed))
+                del self._sorted_codes[bisect.bisect_left(self._sorted_codes, code)]
+            else:
+                self._sorted_codes = [code for code in self._sorted_codes if code not in removed]
+            self._orders.clear()
+
+    def remove_expired(self, now_ts: float):
+        """Retire les codes expirés (utilisés ou non), comme la purge du magasin"""
+        self.remove_many(self._expiring(-math.inf, now_ts, strict=True))
+
+    @staticmethod
+    def _discard(index: dict, key, code: str) -> bool:
+        """Retire code de index[key]; True si l'entrée est devenue vide (et supprimée)"""
+        codes = index.get(key)
+        if codes is None:
+            return False
+        codes.discard(code)
+        if not codes:
+            del index[key]
+            return True
+        return False
+
+    # ------------------------------------------------------------------
+    # Recherches
+    # ------------------------------------------------------------------
+
+    def _expiring(self, start_ts: float, end_ts: float, strict: bool = False) -> Set[str]:
+        """Codes dont l'échéance est entre start_ts et end_ts (end_ts exclu si strict)"""
+        first = 0 if start_ts == -math.inf else bisect.bisect_left(self._buckets, int(start_ts) // BUCKET_SECONDS)
+        last = bisect.bisect_right(self._buckets, int(end_ts) // BUCKET_SECONDS)
+
+        result = set()
+        for position in range(first, last):
+            bucket = self._buckets[position]
+            codes = self._by_bucket[bucket]
+            inner = start_ts <= bucket * BUCKET_SECONDS and (bucket + 1) * BUCKET_SECONDS <= end_ts
+            if inner:
+                result |= codes
+                continue
+            # Tranches des bornes: vérification code par code
+            for code in codes:
+                expiry_ts = self._meta[code][_EXPIRY]
+                if start_ts <= expiry_ts and (expiry_ts < end_ts if strict else expiry_ts <= end_ts):
+                    result.add(code)
+        return result
+
+    def prefix_matches(self, prefix: str) -> List[str]:
+        """Codes commençant par prefix, triés"""
+        first = bisect.bisect_left(self._sorted_codes, prefix)
+        last = bisect.bisect_left(self._sorted_codes, prefix + "\uffff")
+        return self._sorted_codes[first:last]
+
+    def _sorted(self, codes: List[str], sort_by: str) -> List[str]:
+        """Trie des codes déjà dans l'ordre alphabétique (tri stable: le code départage)"""
+        if sort_by == 'code':
+            return codes
+        # Un code non utilisé a une date d'utilisation nulle
+        column = {'value': _VALUE, 'created': _CREATED, 'expiry': _EXPIRY, 'used': _USED_TS}[sort_by]
+        meta = self._meta
+        return sorted(codes, key=lambda code: meta[code][column])
+
+    def _order(self, sort_by: str) -> List[str]:
+        """Tous les codes dans l'ordre demandé (calculé une fois)"""
+        order = self._orders.get(sort_by)
+        if order is None:
+            order = self._orders[sort_by] = self._sorted(self._sorted_codes, sort_by)
+        return order
+
+    def query(self, now_ts: float, status: Optional[str] = None, value: Optional[float] = None,
+              sort_by: str = 'created', descending: bool = False, prefix: Optional[str] = None,
+              batch: Optional[Tuple[int, float]] = None, expiring_within: Optional[int] = None) -> List[str]:
+        filters = []
+        if prefix:
+            filters.append(set(self.prefix_matches(prefix)))
+        if batch is not None:
+            filters.append(self._by_batch.get(tuple(batch), set()))
+        if value is not None:
+            filters.append(self._by_value.get(value, set()))
+        if expiring_within is not None:
+            filters.append(self._expiring(now_ts, now_ts + expiring_within))
+        if status == 'used':
+            filters.append(self._used)
+        elif status == 'expired':
+            filters.append(self._unused & self._expiring(-math.inf, now_ts, strict=True))
+        elif status == 'active':
+            filters.append(self._unused - self._expiring(-math.inf, now_ts, strict=True))
+
+        if not filters:
+            codes = list(self._order(sort_by))
+        else:
+            filters.sort(key=len)
+            candidates = set(filters[0])
+            for codes in filters[1:]:
+                candidates &= codes
+
+            if len(candidates) * 8 < len(self._meta):
+                codes = self._sorted(sorted(candidates), sort_by)
+            else:
+                codes = [code for code in self._order(sort_by) if code in candidates]
+
+        if descending:
+            codes.reverse()
+        return codes
+
+    def values(self) -> List[float]:
+        return sorted(self._by_value)
+
+    def batches(self) -> List[Tuple[int, float, int]]:
+        """Lots de codes: (date de création, valeur, nombre de codes), du plus récent au plus ancien"""
+        result = []
+        for created_ts, value in sorted(self._by_batch, reverse=True):
+            result.append((created_ts, value, len(self._by_batch[(created_ts, value)])))
+        return result
+
+    def statistics(self, now_ts: float) -> dict:
+        expired = self._unused & self._expiring(-math.inf, now_ts, strict=True)
+        active_value = sum(value * count for value, count in self._unused_by_value.items())
+        active_value -= sum(self._meta[code][_VALUE] for code in expired)
+        return {
+            'total': len(self._meta),
+            'used': len(self._used),
+            'expired': len(expired),
+            'active': len(self._unused) - len(expired),
+            'active_value': round(active_value, 2),
+        }
\ No newline at end of file
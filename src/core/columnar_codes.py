@@ -0,0 +1,451 @@
+"""
+Stockage colonnaire des codes prépayés (tableaux NumPy projetés en mémoire)
+"""
+
+import os
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from src.core.records import PrepaidCode
+
+# Bits du champ d'état
+FLAG_USED = 1
+FLAG_DELETED = 2
+
+# Emplacement libre de la table de hachage
+_EMPTY = -1
+
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+# En-tête: nombre de lignes écrites, nombre de codes vivants, largeur des codes,
+# génération des fichiers de colonnes et d'index
+_HEADER_COUNT, _HEADER_LIVE, _HEADER_WIDTH, _HEADER_GENERATION = 0, 1, 2, 3
+
+
+def _hash_words(words: np.ndarray) -> np.ndarray:
+    """Hache des codes vus comme des mots de 64 bits (une ligne par code)"""
+    h = np.zeros(words.shape[0], dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for column in range(words.shape[1]):
+            h = (h ^ words[:, column]) * _HASH_MULTIPLIER
+        return h ^ (h >> np.uint64(32))
+
+
+class ColumnarCodeStore:
+    """Codes prépayés stockés par colonnes dans des fichiers .npy projetés en mémoire
+
+    - codes: octets de largeur fixe (complétés à un multiple de 8)
+    - values: float32
+    - created / expiry / used_at: timestamps epoch int64 (0 = absent)
+    - flags: champ de bits (utilisé, supprimé)
+    - index: table de hachage à adressage ouvert (code -> ligne), persistée elle aussi
+
+    Le chargement se limite à projeter les fichiers; purge des expirés et
+    statistiques sont des opérations vectorisées. Le magasin se comporte comme
+    un dictionnaire en lecture (code -> PrepaidCode).
+
+    L'en-tête est écrit en dernier: les lignes ajoutées ne comptent qu'une fois
+    colonnes et index écrits. Agrandissement et compaction écrivent une nouvelle
+    génération de fichiers, désignée par l'en-tête une fois complète: une coupure
+    laisse toujours l'ancienne ou la nouvelle génération entière. À l'ouverture,
+    l'index est vérifié et reconstruit s'il ne couvre pas les lignes vivantes.
+    """
+
+    COLUMNS = ('codes', 'values', 'created', 'expiry', 'used_at', 'flags')
+
+    def __init__(self, directory: str, code_length: int = 8, initial_capacity: int = 1024):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        header_path = os.path.join(directory, "header.npy")
+
+        self.is_new = not os.path.exists(header_path)
+        if self.is_new:
+            # En-tête créé en dernier: sans lui le magasin est recréé au démarrage suivant
+            width = (code_length + 7) // 8 * 8
+            header = np.array([0, 0, width, 0], dtype=np.int64)
+            self._write_columns(0, width, initial_capacity, {}, 0)
+            self._write_index(0, width, initial_capacity * 2, np.empty(0, dtype=np.int64))
+            tmp_path = header_path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, header)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, header_path)
+
+        self.header = open_memmap(header_path, mode='r+')
+        self._open_generation()
+        if not self.is_new:
+            self._check_index()
+
+    # ------------------------------------------------------------------
+    # Fichiers
+    # ------------------------------------------------------------------
+
+    def _path(self, name: str, generation: Optional[int] = None) -> str:
+        if generation is None:
+            generation = self.generation
+        suffix = f".{generation}" if generation else ""
+        return os.path.join(self.directory, f"{name}{suffix}.npy")
+
+    @property
+    def width(self) -> int:
+        return int(self.header[_HEADER_WIDTH])
+
+    @property
+    def count(self) -> int:
+        return int(self.header[_HEADER_COUNT])
+
+    @property
+    def generation(self) -> int:
+        return int(self.header[_HEADER_GENERATION])
+
+    @property
+    def capacity(self) -> int:
+        return self.codes.shape[0]
+
+    @staticmethod
+    def _column_dtypes(width: int) -> Dict[str, np.dtype]:
+        return {
+            'codes': np.dtype(f'S{width}'),
+            'values': np.dtype(np.float32),
+            'created': np.dtype(np.int64),
+            'expiry': np.dtype(np.int64),
+            'used_at': np.dtype(np.int64),
+            'flags': np.dtype(np.uint8),
+        }
+
+    def _write_columns(self, generation: int, width: int, capacity: int,
+                       source: Dict[str, np.ndarray], rows: int):
+        """Écrit les fichiers de colonnes d'une génération (rows premières lignes de source)"""
+        for name, dtype in self._column_dtypes(width).items():
+            column = open_memmap(self._path(name, generation), mode='w+', dtype=dtype, shape=(capacity,))
+            if rows:
+                column[:rows] = source[name][:rows]
+            column.flush()
+            del column
+
+    def _write_index(self, generation: int, width: int, size: int, live_rows: np.ndarray):
+        """Écrit la table de hachage d'une génération pour les lignes vivantes
+
+        Fichier temporaire puis renommage: une coupure laisse l'ancien index entier.
+        """
+        size = 1 << max(4, (size - 1).bit_length())
+        tmp_path = self._path('index', generation) + ".tmp"
+        index = open_memmap(tmp_path, mode='w+', dtype=np.int32, shape=(size,))
+        index[:] = _EMPTY
+        if len(live_rows):
+            codes = open_memmap(self._path('codes', generation), mode='r')
+            self._index_rows(index, codes, live_rows, width)
+            del codes
+        index.flush()
+        del index
+        os.replace(tmp_path, self._path('index', generation))
+
+    def _open_generation(self):
+        """Projette les colonnes et l'index désignés par l'en-tête et retire les autres générations"""
+        for name in self.COLUMNS:
+            setattr(self, name, open_memmap(self._path(name), mode='r+'))
+        if os.path.exists(self._path('index')):
+            self.index = open_memmap(self._path('index'), mode='r+')
+        else:
+            self._rebuild_index(self.count * 4)
+
+        # Fichiers d'une génération abandonnée ou remplacée, temporaires interrompus
+        current = {os.path.basename(self._path(name)) for name in self.COLUMNS + ('index',)}
+        current.add("header.npy")
+        for filename in os.listdir(self.directory):
+            if filename.endswith((".npy", ".npy.tmp")) and filename not in current:
+                os.remove(os.path.join(self.directory, filename))
+
+    def _rewrite(self, capacity: int, rows: np.ndarray, index_size: int):
+        """Recopie des lignes dans une nouvelle génération de fichiers puis bascule l'en-tête"""
+        generation = self.generation + 1
+        source = {name: getattr(self, name)[rows] for name in self.COLUMNS}
+        self._write_columns(generation, self.width, capacity, source, len(rows))
+        live = np.flatnonzero((source['flags'] & FLAG_DELETED) == 0)
+        self._write_index(generation, self.width, index_size, live)
+
+        # Bascule: une seule page d'en-tête désigne la génération complète
+        self.header[_HEADER_COUNT] = len(rows)
+        self.header[_HEADER_LIVE] = len(live)
+        self.header[_HEADER_GENERATION] = generation
+        self.header.flush()
+        self._open_generation()
+
+    def _rebuild_index(self, size: int):
+        """Reconstruit la table de hachage de la génération courante"""
+        self.index = None
+        self._write_index(self.generation, self.width, size, self._live_rows())
+        self.index = open_memmap(self._path('index'), mode='r+')
+
+    def _check_index(self):
+        """Reconstruit l'index s'il ne désigne pas exactement des lignes écrites
+        ou n'en couvre pas toutes les lignes vivantes (coupure pendant une écriture)"""
+        count = self.count
+        live_rows = self._live_rows()
+        if int(self.header[_HEADER_LIVE]) != len(live_rows):
+            self.header[_HEADER_LIVE] = len(live_rows)
+            self.header.flush()
+
+        rows = self.index[self.index != _EMPTY]
+        valid = len(rows) == 0 or (rows.min() >= 0 and rows.max() < count)
+        if valid:
+            indexed = np.zeros(count, dtype=bool)
+            indexed[rows] = True
+            valid = bool(indexed[live_rows].all()) and len(self.index) >= 2 * count
+        if not valid:
+            self._rebuild_index(count * 4)
+
+    def flush(self):
+        """Force l'écriture des pages modifiées sur le support (en-tête en dernier)"""
+        for name in self.COLUMNS:
+            getattr(self, name).flush()
+        self.index.flush()
+        self.header.flush()
+
+    # ------------------------------------------------------------------
+    # Table de hachage
+    # ------------------------------------------------------------------
+
+    def check_code(self, code: str) -> bytes:
+        """Octets d'un code pour la colonne des codes
+
+        Lève ValueError si le code n'est pas en ASCII imprimable ou dépasse la
+        largeur de la colonne (il serait tronqué et pourrait en confondre deux).
+        """
+        try:
+            key = code.encode('ascii')
+        except UnicodeEncodeError:
+            raise ValueError(f"Code prépayé {code!r} refusé: caractères non ASCII") from None
+        if not key:
+            raise ValueError("Code prépayé vide refusé")
+        if not all(32 <= byte < 127 for byte in key):
+            raise ValueError(f"Code prépayé {code!r} refusé: caractères non imprimables")
+        if len(key) > self.width:
+            raise ValueError(f"Code prépayé {code!r} refusé: plus de {self.width} caractères")
+        return key
+
+    @staticmethod
+    def _hash_keys(keys: np.ndarray, width: int) -> np.ndarray:
+        words = np.ascontiguousarray(keys).view('<u8').reshape(len(keys), width // 8)
+        return _hash_words(words)
+
+    @classmethod
+    def _index_rows(cls, index: np.ndarray, codes: np.ndarray, rows: np.ndarray, width: int):
+        """Insère des lignes dans la table de hachage (sondage linéaire vectorisé)
+
+        À chaque tour, chaque ligne en attente tente son emplacement courant; une seule
+        ligne par emplacement libre l'obtient, les autres passent à l'emplacement suivant.
+        """
+        if len(rows) == 0:
+            return
+        mask = len(index) - 1
+        slots = (cls._hash_keys(codes[rows], width) & np.uint64(mask)).astype(np.int64)
+        pending = np.asarray(rows, dtype=np.int64)
+
+        while len(pending):
+            free = index[slots] == _EMPTY
+            candidate_slots = slots[free]
+            unique_slots, first = np.unique(candidate_slots, return_index=True)
+            winners = np.flatnonzero(free)[first]
+            index[unique_slots] = pending[winners]
+
+            placed = np.zeros(len(pending), dtype=bool)
+            placed[winners] = True
+            pending = pending[~placed]
+            slots = (slots[~placed] + 1) & mask
+
+    def _find(self, code: str) -> int:
+        """Retourne la ligne d'un code vivant, ou -1"""
+        try:
+            key = self.check_code(code)
+        except (ValueError, AttributeError):
+            # Saisie impossible à stocker: le code ne peut pas exister
+            return -1
+        mask = len(self.index) - 1
+        padded = np.array([key], dtype=f'S{self.width}')
+        slot = int(self._hash_keys(padded, self.width)[0]) & mask
+
+        while True:
+            row = int(self.index[slot])
+            if row == _EMPTY:
+                return -1
+            if self.codes[row] == key and not self.flags[row] & FLAG_DELETED:
+                return row
+            slot = (slot + 1) & mask
+
+    # ------------------------------------------------------------------
+    # Interface de type dictionnaire
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return int(self.header[_HEADER_LIVE])
+
+    def __contains__(self, code) -> bool:
+        return self._find(code) != -1
+
+    def __getitem__(self, code: str):
+        row = self._find(code)
+        if row == -1:
+            raise KeyError(code)
+        return self._materialize(row)
+
+    def get(self, code: str, default=None):
+        row = self._find(code)
+        return self._materialize(row) if row != -1 else default
+
+    def _live_rows(self) -> np.ndarray:
+        return np.flatnonzero((self.flags[:self.count] & FLAG_DELETED) == 0)
+
+    def __iter__(self) -> Iterator[str]:
+        for raw in self.codes[self._live_rows()]:
+            yield raw.decode('ascii')
+
+    def keys(self) -> Iterator[str]:
+        return iter(self)
+
+    def values(self):
+        for row in self._live_rows():
+            yield self._materialize(int(row))
+
+    def items(self):
+        for prepaid_code in self.values():
+            yield prepaid_code.code, prepaid_code
+
+    def _materialize(self, row: int):
+        """Construit le PrepaidCode d'une ligne"""
+        used_at = int(self.used_at[row])
+        return PrepaidCode.from_epoch(
+            self.codes[row].decode('ascii'),
+            round(float(self.values[row]), 2),
+            int(self.created[row]),
+            int(self.expiry[row]),
+            bool(self.flags[row] & FLAG_USED),
+            used_at or None
+        )
+
+    # ------------------------------------------------------------------
+    # Mutations
+    # ------------------------------------------------------------------
+
+    def add_many(self, prepaid_codes: Iterable):
+        """Ajoute un lot de codes (écriture vectorisée des colonnes)"""
+        prepaid_codes = list(prepaid_codes)
+        if not prepaid_codes:
+            return
+
+        # Tous les codes sont vérifiés avant la moindre écriture
+        keys = [self.check_code(code.code) for code in prepaid_codes]
+
+        start = self.count
+        end = start + len(prepaid_codes)
+        if end > self.capacity:
+            self._rewrite(max(end, self.capacity * 2), np.arange(start), end * 4)
+
+        self.codes[start:end] = keys
+        self.values[start:end] = [code.value for code in prepaid_codes]
+        self.created[start:end] = [code.created_ts for code in prepaid_codes]
+        self.expiry[start:end] = [code.expiry_ts for code in prepaid_codes]
+        self.used_at[start:end] = [code.used_ts or 0 for code in prepaid_codes]
+        self.flags[start:end] = [FLAG_USED if code.is_used else 0 for code in prepaid_codes]
+
+        # Facteur de charge de la table de hachage maintenu sous 1/2
+        if end * 2 > len(self.index):
+            self.index = None
+            self._write_index(self.generation, self.width, end * 4,
+                              np.concatenate([self._live_rows(), np.arange(start, end)]))
+            self.index = open_memmap(self._path('index'), mode='r+')
+        else:
+            self._index_rows(self.index, self.codes, np.arange(start, end), self.width)
+        for name in self.COLUMNS:
+            getattr(self, name).flush()
+        self.index.flush()
+
+        # Les nouvelles lignes ne comptent qu'une fois colonnes et index écrits
+        self.header[_HEADER_COUNT] = end
+        self.header[_HEADER_LIVE] += len(prepaid_codes)
+        self.header.flush()
+
+    def save(self, prepaid_code):
+        """Réécrit la ligne d'un code existant"""
+        row = self._find(prepaid_code.code)
+        if row == -1:
+            self.add_many([prepaid_code])
+            return
+
+        self.values[row] = prepaid_code.value
+        self.expiry[row] = prepaid_code.expiry_ts
+        self.used_at[row] = prepaid_code.used_ts or 0
+        if prepaid_code.is_used:
+            self.flags[row] |= FLAG_USED
+        else:
+            self.flags[row] &= ~np.uint8(FLAG_USED)
+        self.flush()
+
+    def delete_many(self, codes: Iterable[str]) -> int:
+        """Marque des codes comme supprimés"""
+        rows = [row for row in (self._find(code) for code in codes) if row != -1]
+        if rows:
+            self.flags[rows] |= FLAG_DELETED
+            self.header[_HEADER_LIVE] -= len(rows)
+            self._compact_if_needed()
+            self.flush()
+        return len(rows)
+
+    def remove_expired(self, now: Optional[datetime] = None) -> int:
+        """Supprime en une passe vectorisée les codes expirés, retourne leur nombre"""
+        # Même comparaison que PrepaidCode.is_expired et CodeIndex: échéance < maintenant (réel)
+        now_ts = (now or datetime.now()).timestamp()
+        count = self.count
+        expired = ((self.flags[:count] & FLAG_DELETED) == 0) & (self.expiry[:count] < now_ts)
+        removed = int(np.count_nonzero(expired))
+        if removed:
+            self.flags[:count][expired] |= FLAG_DELETED
+            self.header[_HEADER_LIVE] -= removed
+            self._compact_if_needed()
+            self.flush()
+        return removed
+
+    def statistics(self, now: Optional[datetime] = None) -> dict:
+        """Statistiques des codes calculées sur les colonnes"""
+        now_ts = (now or datetime.now()).timestamp()
+        count = self.count
+        flags = self.flags[:count]
+        live = (flags & FLAG_DELETED) == 0
+        used = live & ((flags & FLAG_USED) != 0)
+        expired = live & ~used & (self.expiry[:count] < now_ts)
+        active = live & ~used & ~expired
+        return {
+            'total': int(np.count_nonzero(live)),
+            'used': int(np.count_nonzero(used)),
+            'expired': int(np.count_nonzero(expired)),
+            'active': int(np.count_nonzero(active)),
+            'active_value': round(float(self.values[:count][active].sum(dtype=np.float64)), 2),
+        }
+
+    def records(self) -> Iterator[tuple]:
+        """(code, valeur, création, expiration, utilisation ou None) des codes vivants,
+        lus colonne par colonne (construction de l'index des codes)"""
+        rows = self._live_rows()
+        used = (self.flags[rows] & FLAG_USED) != 0
+        return zip(
+            (raw.decode('ascii') for raw in self.codes[rows]),
+            np.round(self.values[rows].astype(np.float64), 2).tolist(),
+            self.created[rows].tolist(),
+            self.expiry[rows].tolist(),
+            [int(used_at) if is_used else None for used_at, is_used in zip(self.used_at[rows].tolist(), used.tolist())]
+        )
+
+    def _compact_if_needed(self):
+        """Réécrit les colonnes sans les lignes supprimées lorsqu'elles sont majoritaires"""
+        dead = self.count - len(self)
+        if dead <= max(len(self), 1024):
+            return
+        live_rows = self._live_rows()
+        self._rewrite(max(len(live_rows) * 2, 1024), live_rows, len(live_rows) * 4)
+
+    def close(self):
+        self.flush()
@@ -30,16 +30,46 @@ class Config:
             },
             "lockers": {
                 "count": 8,
-                "charging_time_limit": 7200  # 2 heures
+                "charging_time_limit": 7200,  # 2 heures
+                "charging_warnings": [900, 300],  # avertissements (secondes avant la limite)
+                "charging_limit_action": "overtime",  # "overtime" ou "cutoff"
+                "overtime_rate_per_hour": 1.0,
+                "max_overtime": 3600,  # secondes de dépassement avant expiration de la session (null: aucune)
+                "allocation_policy": "first_free",  # "first_free", "round_robin" ou "nearest"
+                "screen_order": [],  # casiers du plus proche au plus éloigné de l'écran
+                "port_types": {}  # type de prise par casier, ex: {"1": "usb-c"}
             },
             "payment": {
                 "prepaid_code_length": 8,
                 "ussd_code": "*123#",
-                "qr_payment_url": "https://payment.example.com"
+                "qr_payment_url": "https://payment.example.com",
+                "code_store": "memory",  # "memory", "lazy" ou "columnar" (NumPy, projeté en mémoire)
+                "columnar_store_dir": "data/prepaid_codes",
+                "lazy_cache_size": 1024,
+                "qr_pool_size": 3,  # demandes de paiement QR préparées à l'avance
+                "qr_pool_ttl": 120,  # secondes: au-delà, une demande préparée n'est plus affichée (réserve au repos sans tirage)
+                "pending_ttl": 900,  # secondes de validité d'une référence QR/USSD non rattachée
+                "provider_url": "",  # API du fournisseur (vide: paiement déclaré par le client à la borne)
+                "provider_poll_interval": 2.0,  # secondes entre deux interrogations des références suivies
+                "provider_timeout": 5.0,  # secondes par lot de requêtes
+                "provider_retries": 3,
+                "provider_connections": 4,  # connexions persistantes au plus
+                "provider_pipeline_depth": 16,  # requêtes envoyées d'un bloc par connexion
+                "provider_failure_threshold": 5,  # échecs consécutifs avant ouverture du coupe-circuit
+                "provider_reset_timeout": 30.0  # secondes de suspension du coupe-circuit
             },
             "hardware": {
                 "gpio_enabled": False,  # True sur Raspberry Pi
                 "touchscreen": True
+            },
+            "storage": {
+                "backend": "json",  # "json", "journal" ou "sqlite"
+                "data_dir": "data",
+                "sqlite_path": "data/borne.db",
+                "journal_compact_every": 500,  # entrées avant compaction du journal
+                "commit_window": 0.05,  # secondes de regroupement des écritures JSON
+                "background_writes": True,  # écritures dans un thread dédié
+                "write_queue_size": 256
             }
         }
     
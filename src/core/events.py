@@ -0,0 +1,65 @@
+"""
+Bus d'événements des gestionnaires (changements d'état des casiers et des codes)
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class LockerEvent:
+    """Changement d'état d'un casier"""
+    locker_id: int
+    is_occupied: bool
+    reason: str  # "reserved", "released", "expired" ou "cancelled"
+
+
+@dataclass(frozen=True)
+class CodesEvent:
+    """Changement d'état de codes prépayés
+
+    `codes` est vide lorsque le détail n'est pas connu (purge vectorisée).
+    """
+    change: str  # "created", "used", "restored" ou "expired"
+    codes: Tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class PaymentEvent:
+    """Changement d'état d'une demande de paiement QR ou USSD"""
+    reference: str
+    status: str  # "confirmed" ou "failed"
+    amount: float = 0.0
+
+
+class EventBus:
+    """Diffusion synchrone d'événements aux abonnés
+
+    Un abonné reçoit tous les événements, ou seulement ceux d'une clé (par exemple
+    un numéro de casier). Les callbacks sont appelés dans le thread qui publie.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[Optional[Hashable], List[Callable]] = {}
+
+    def subscribe(self, callback: Callable, key: Optional[Hashable] = None) -> Callable[[], None]:
+        """Abonne callback(event); retourne la fonction de désabonnement"""
+        with self._lock:
+            self._subscribers.setdefault(key, []).append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                callbacks = self._subscribers.get(key, [])
+                if callback in callbacks:
+                    callbacks.remove(callback)
+        return unsubscribe
+
+    def publish(self, event, key: Optional[Hashable] = None):
+        with self._lock:
+            callbacks = list(self._subscribers.get(None, []))
+            if key is not None:
+                callbacks += self._subscribers.get(key, [])
+        for callback in callbacks:
+            callback(event)
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""
+Historique append-only des sessions terminées, indexé par casier, date et moyen de paiement
+"""
+
+import bisect
+import json
+import math
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+from src.core.logger import setup_logger
+from src.core.records import iso_from_epoch, to_epoch
+
+# Clé d'index: (date de fin en secondes epoch, numéro d'enregistrement)
+IndexKey = Tuple[int, int]
+
+
+class SessionHistory:
+    """Registre des sessions terminées (fichier JSON Lines en ajout seul)
+
+    Chaque session libérée est une ligne ajoutée en fin de fichier. Au chargement,
+    trois index triés par date de fin sont construits: global, par casier et par
+    moyen de paiement. Une requête sur une période ne parcourt que la tranche de
+    l'index le plus sélectif, trouvée par dichotomie.
+    """
+
+    def __init__(self, path: str, durable: bool = True):
+        self.logger = setup_logger("history")
+        self.path = path
+        self.durable = durable
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._records: List[dict] = []
+        self._by_date: List[IndexKey] = []
+        self._by_locker: Dict[int, List[IndexKey]] = {}
+        self._by_payment: Dict[str, List[IndexKey]] = {}
+        self._file = None
+        self._loaded = False
+
+    def _ensure_open(self):
+        if self._file is not None:
+            return
+
+        if not self._loaded and os.path.exists(self.path):
+            with open(self.path, 'rb+') as f:
+                data = f.read()
+                # Dernière ligne interrompue par une coupure: jamais validée
+                if data and not data.endswith(b"\n"):
+                    self.logger.warning(f"Entrée incomplète ignorée en fin de {self.path}")
+                    data = data[:data.rfind(b"\n") + 1]
+                    f.truncate(len(data))
+
+            for index, line in enumerate(data.decode('utf-8').splitlines()):
+                if not line.strip():
+                    continue
+                try:
+                    self._index(json.loads(line))
+                except (json.JSONDecodeError, KeyError, ValueError) as e:
+                    self.logger.error(f"Entrée corrompue ignorée dans {self.path} (ligne {index + 1}): {e}")
+
+        self._loaded = True
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _index(self, record: dict):
+        """Ajoute un enregistrement aux index (insertion en fin dans le cas courant)"""
+        key = (to_epoch(record['end_time']), len(self._records))
+        self._records.append(record)
+        bisect.insort(self._by_date, key)
+        bisect.insort(self._by_locker.setdefault(record['locker_id'], []), key)
+        bisect.insort(self._by_payment.setdefault(record.get('payment_method', ''), []), key)
+
+    def append(self, session_data: dict):
+        """Enregistre une session terminée (une ligne ajoutée, sans réécriture)"""
+        # Le code d'accès de l'utilisateur n'est pas conservé dans l'historique
+        record = {
+            'locker_id': session_data['locker_id'],
+            'start_time': session_data['start_time'],
+            'end_time': session_data.get('end_time') or iso_from_epoch(to_epoch(session_data['start_time'])),
+            'payment_method': session_data.get('payment_method', ''),
+            'amount_paid': session_data.get('amount_paid', 0.0),
+            'overtime_fee': session_data.get('overtime_fee', 0.0)
+        }
+
+        with self._lock:
+            self._ensure_open()
+            try:
+                self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._file.flush()
+                if self.durable:
+                    os.fsync(self._file.fileno())
+            except Exception as e:
+                self.logger.error(f"Erreur lors de l'écriture de l'historique: {e}")
+                return
+            self._index(record)
+
+    def query(self, locker_id: Optional[int] = None, start=None, end=None,
+              payment_method: Optional[str] = None) -> List[dict]:
+        """Sessions terminées entre start et end (inclus), filtrées par casier et moyen de paiement
+
+        start et end acceptent un datetime, une date ISO ou des secondes epoch.
+        """
+        low = to_epoch(start) if start is not None else -math.inf
+        high = to_epoch(end) if end is not None else math.inf
+
+        with self._lock:
+            self._ensure_open()
+
+            candidates = [self._by_date]
+            if locker_id is not None:
+                candidates.append(self._by_locker.get(locker_id, []))
+            if payment_method is not None:
+                candidates.append(self._by_payment.get(payment_method, []))
+
+            # Tranche de la période dans chaque index, puis parcours de la plus courte
+            slices = []
+            for keys in candidates:
+                first = bisect.bisect_left(keys, (low, -1))
+                last = bisect.bisect_right(keys, (high, math.inf))
+                slices.append((last - first, keys, first, last))
+            _, keys, first, last = min(slices, key=lambda item: item[0])
+
+            results = []
+            for _, record_index in keys[first:last]:
+                record = self._records[record_index]
+                if locker_id is not None and record['locker_id'] != locker_id:
+                    continue
+                if payment_method is not None and record.get('payment_method', '') != payment_method:
+                    continue
+                results.append(dict(record))
+            return results
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_open()
+            return len(self._records)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
\ No newline at end of file
@@ -0,0 +1,317 @@
+"""
+Journal de mutations append-only avec compaction en instantané
+"""
+
+import copy
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional
+from src.core.logger import setup_logger
+from src.core.persistence import atomic_write
+from src.core.storage import JsonStorage
+
+
+class AppendOnlyJournal:
+    """Journal append-only d'un état en mémoire
+
+    Chaque mutation est ajoutée en fin de fichier (une ligne JSON numérotée).
+    Au-delà de `compact_every` entrées, le journal est basculé sur un nouveau
+    segment et l'état est écrit en instantané par un thread de fond.
+    Au démarrage, l'état est reconstruit depuis l'instantané puis la fin du journal.
+    """
+
+    def __init__(self, journal_path: str, snapshot_path: str,
+                 apply_entry: Callable[[dict, dict], None],
+                 compact_every: int = 500, durable: bool = True):
+        self.logger = setup_logger("journal")
+        self.journal_path = journal_path
+        self.compacting_path = journal_path + ".compacting"
+        self.snapshot_path = snapshot_path
+        self.apply_entry = apply_entry
+        self.compact_every = compact_every
+        self.durable = durable
+
+        os.makedirs(os.path.dirname(journal_path) or ".", exist_ok=True)
+
+        self.state = {}
+        self._seq = 0
+        self._entries_since_snapshot = 0
+        self._lock = threading.RLock()
+        self._compaction_thread: Optional[threading.Thread] = None
+        self._file = None
+
+    def exists(self) -> bool:
+        """Indique si un instantané ou un journal existe déjà"""
+        return any(os.path.exists(path) for path in
+                   (self.snapshot_path, self.compacting_path, self.journal_path))
+
+    def replay(self, initial_state: Optional[dict] = None) -> dict:
+        """Reconstruit l'état: dernier instantané puis entrées plus récentes"""
+        with self._lock:
+            self.state = initial_state if initial_state is not None else {}
+            snapshot_seq = 0
+
+            if os.path.exists(self.snapshot_path):
+                try:
+                    with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                        snapshot = json.load(f)
+                    self.state = snapshot['state']
+                    snapshot_seq = snapshot['seq']
+                except Exception as e:
+                    self.logger.error(f"Instantané illisible {self.snapshot_path}: {e}")
+
+            self._seq = snapshot_seq
+            self._entries_since_snapshot = 0
+            for path in (self.compacting_path, self.journal_path):
+                for entry in self._read_entries(path):
+                    if entry['seq'] <= snapshot_seq:
+                        continue
+                    self.apply_entry(self.state, entry)
+                    self._seq = entry['seq']
+                    self._entries_since_snapshot += 1
+
+            self._truncate_partial_tail()
+            self._file = open(self.journal_path, 'a', encoding='utf-8')
+            return self.state
+
+    def _truncate_partial_tail(self):
+        """Supprime une dernière ligne incomplète pour que les ajouts repartent proprement"""
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def _read_entries(self, path: str) -> List[dict]:
+        """Lit les entrées d'un segment, en ignorant une dernière ligne tronquée"""
+        if not os.path.exists(path):
+            return []
+
+        entries = []
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+
+        for index, line in enumerate(lines):
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                if index == len(lines) - 1:
+                    # Écriture interrompue par une coupure: l'entrée n'a jamais été validée
+                    self.logger.warning(f"Entrée incomplète ignorée en fin de {path}")
+                else:
+                    self.logger.error(f"Entrée corrompue ignorée dans {path} (ligne {index + 1})")
+        return entries
+
+    def append(self, entry: dict):
+        """Ajoute une mutation au journal puis l'applique à l'état
+
+        Lève l'erreur d'écriture: l'entrée est alors retirée du journal et l'état
+        n'est pas modifié.
+        """
+        with self._lock:
+            entry = dict(entry, seq=self._seq + 1)
+            size = os.fstat(self._file.fileno()).st_size
+            try:
+                self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                self._file.flush()
+                if self.durable:
+                    os.fsync(self._file.fileno())
+            except Exception:
+                self._discard_tail(size)
+                raise
+
+            self._seq += 1
+            self.apply_entry(self.state, entry)
+            self._entries_since_snapshot += 1
+            if self._entries_since_snapshot >= self.compact_every:
+                self.compact(background=True)
+
+    def _discard_tail(self, size: int):
+        """Retire une entrée dont l'écriture a échoué (elle ne doit pas être rejouée)"""
+        try:
+            self._file.close()
+        except OSError:
+            pass
+        try:
+            os.truncate(self.journal_path, size)
+        except OSError as e:
+            self.logger.error(f"Impossible de retirer l'entrée échouée de {self.journal_path}: {e}")
+        self._file = open(self.journal_path, 'a', encoding='utf-8')
+
+    def compact(self, background: bool = False):
+        """Écrit l'état courant en instantané et purge les segments couverts"""
+        with self._lock:
+            if self._compaction_thread and self._compaction_thread.is_alive():
+                return
+            if os.path.exists(self.compacting_path):
+                # Une compaction précédente n'a pas abouti: son segment est encore nécessaire
+                self._write_snapshot(copy.deepcopy(self.state), self._seq)
+                os.remove(self.compacting_path)
+
+            # Bascule sur un nouveau segment: les ajouts continuent pendant la compaction
+            self._file.close()
+            if os.path.exists(self.journal_path):
+                os.replace(self.journal_path, self.compacting_path)
+            self._file = open(self.journal_path, 'a', encoding='utf-8')
+
+            state = copy.deepcopy(self.state)
+            seq = self._seq
+            self._entries_since_snapshot = 0
+
+            if background:
+                self._compaction_thread = threading.Thread(
+                    target=self._finish_compaction, args=(state, seq), daemon=True
+                )
+                self._compaction_thread.start()
+                return
+
+        self._finish_compaction(state, seq)
+
+    def _finish_compaction(self, state: dict, seq: int):
+        try:
+            self._write_snapshot(state, seq)
+            if os.path.exists(self.compacting_path):
+                os.remove(self.compacting_path)
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la compaction du journal: {e}")
+
+    def _write_snapshot(self, state: dict, seq: int):
+        """Écrit l'instantané de façon atomique (fichier temporaire puis renommage)"""
+        atomic_write(self.snapshot_path, json.dumps({'seq': seq, 'state': state}, ensure_ascii=False))
+
+    def close(self):
+        """Compacte le journal et ferme le segment courant"""
+        with self._lock:
+            thread = self._compaction_thread
+        if thread:
+            thread.join()
+        if self._file is None:
+            return
+        if self._entries_since_snapshot:
+            self.compact()
+        with self._lock:
+            self._file.close()
+            self._file = None
+
+
+def _apply_locker_entry(state: dict, entry: dict):
+    """Applique une mutation du journal à l'état des casiers"""
+    op = entry['op']
+    if op == 'locker':
+        state['lockers'][entry['locker_id']] = entry['is_occupied']
+    elif op == 'session':
+        state['sessions'][str(entry['data']['locker_id'])] = entry['data']
+    elif op == 'end_session':
+        state['sessions'].pop(str(entry['locker_id']), None)
+    elif op == 'pending':
+        state.setdefault('pending', {})[entry['data']['reference']] = entry['data']
+    elif op == 'end_pending':
+        for reference in entry['references']:
+            state.setdefault('pending', {}).pop(reference, None)
+    elif op == 'batch':
+        # Transaction: une seule ligne du journal, donc appliquée en entier ou pas du tout
+        for sub_entry in entry['entries']:
+            _apply_locker_entry(state, sub_entry)
+
+
+class JournalStorage(JsonStorage):
+    """Stockage JSON dont l'état des casiers et des sessions passe par un journal
+
+    Chaque réservation ou libération devient un simple ajout séquentiel au lieu
+    de la réécriture de lockers.json et sessions.json; les paiements QR/USSD en
+    attente passent par le même journal. Les codes prépayés restent dans
+    prepaid_codes.json.
+    """
+
+    def __init__(self, data_dir: str = "data", compact_every: int = 500, commit_window: float = 0.05):
+        super().__init__(data_dir, commit_window)
+        self.journal = AppendOnlyJournal(
+            os.path.join(data_dir, "lockers.journal"),
+            os.path.join(data_dir, "lockers.snapshot.json"),
+            _apply_locker_entry,
+            compact_every=compact_every
+        )
+        self._state: Dict[str, dict] = {}
+        self._journal_batch: List[dict] = []
+
+    def _ensure_loaded(self):
+        if self._state:
+            return
+
+        if self.journal.exists():
+            self._state = self.journal.replay({'lockers': {}, 'sessions': {}, 'pending': {}})
+            # Instantané antérieur aux paiements en attente
+            self._state.setdefault('pending', {})
+            return
+
+        # Premier démarrage en mode journal: reprise des fichiers JSON existants
+        initial_state = {
+            'lockers': super().load_lockers(),
+            'sessions': {str(data['locker_id']): data for data in super().load_sessions()},
+            'pending': {data['reference']: data for data in super().load_pending_payments()}
+        }
+        self._state = self.journal.replay(initial_state)
+        self.journal.compact()
+
+    def load_lockers(self) -> Dict[str, bool]:
+        self._ensure_loaded()
+        return dict(self._state['lockers'])
+
+    def _append(self, entry: dict):
+        """Ajoute une mutation au journal (regroupée si une transaction est en cours)"""
+        self._ensure_loaded()
+        if self._in_transaction():
+            self._journal_batch.append(entry)
+            return
+        try:
+            self.journal.append(entry)
+        except Exception as e:
+            self.logger.error(f"Erreur lors de l'écriture du journal: {e}")
+
+    def _commit_transaction(self):
+        batch, self._journal_batch = self._journal_batch, []
+        if batch:
+            self.journal.append({'op': 'batch', 'entries': batch})
+        super()._commit_transaction()
+
+    @contextmanager
+    def transaction(self, wait: bool = False):
+        with self._transaction_lock:
+            if not self._in_transaction():
+                self._journal_batch = []
+            with super().transaction(wait):
+                yield
+
+    def save_locker(self, locker_id: int, is_occupied: bool):
+        self._append({'op': 'locker', 'locker_id': str(locker_id), 'is_occupied': is_occupied})
+
+    def load_sessions(self) -> List[dict]:
+        self._ensure_loaded()
+        return list(self._state['sessions'].values())
+
+    def save_session(self, session_data: dict):
+        self._append({'op': 'session', 'data': session_data})
+
+    def delete_session(self, locker_id: int):
+        self._append({'op': 'end_session', 'locker_id': locker_id})
+
+    def load_pending_payments(self) -> List[dict]:
+        self._ensure_loaded()
+        return list(self._state['pending'].values())
+
+    def save_pending_payment(self, payment_data: dict):
+        self._append({'op': 'pending', 'data': payment_data})
+
+    def delete_pending_payments(self, references: Iterable[str]):
+        references = list(references)
+        if references:
+            self._append({'op': 'end_pending', 'references': references})
+
+    def close(self):
+        self.journal.close()
+        super().close()
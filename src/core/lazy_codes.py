@@ -0,0 +1,110 @@
+"""
+Accès paresseux aux codes prépayés: chargement à la demande depuis le moteur de stockage
+"""
+
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, Optional, Set
+
+
+class LazyCodeStore:
+    """Codes prépayés lus à la demande dans le moteur de stockage
+
+    Au démarrage, seul l'ensemble des clés est chargé: l'appartenance (`in`, len,
+    unicité des codes générés) est résolue en mémoire sans lire d'enregistrement.
+    Un code n'est matérialisé en PrepaidCode qu'à sa lecture (typiquement depuis
+    validate_prepaid_code), puis gardé dans un petit cache LRU. Avec le moteur
+    SQLite, les clés viennent de l'index de la clé primaire et chaque lecture est
+    une recherche sur cette clé; les moteurs JSON lisent le fichier des codes une
+    fois, au démarrage. Le magasin se comporte comme un dictionnaire en lecture.
+    """
+
+    def __init__(self, storage, serialize: Callable, deserialize: Callable, cache_size: int = 1024):
+        self.storage = storage
+        self.serialize = serialize
+        self.deserialize = deserialize
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._keys: Set[str] = set(storage.prepaid_code_keys())
+
+    def _remember(self, prepaid_code):
+        self._cache[prepaid_code.code] = prepaid_code
+        self._cache.move_to_end(prepaid_code.code)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def get(self, code: str, default=None):
+        if code not in self._keys:
+            return default
+
+        prepaid_code = self._cache.get(code)
+        if prepaid_code is not None:
+            self._cache.move_to_end(code)
+            return prepaid_code
+
+        code_data = self.storage.get_prepaid_code(code)
+        if code_data is None:
+            return default
+
+        prepaid_code = self.deserialize(code_data)
+        self._remember(prepaid_code)
+        return prepaid_code
+
+    def __getitem__(self, code: str):
+        prepaid_code = self.get(code)
+        if prepaid_code is None:
+            raise KeyError(code)
+        return prepaid_code
+
+    def __contains__(self, code) -> bool:
+        return code in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._keys))
+
+    def keys(self) -> Iterator[str]:
+        return iter(self)
+
+    def values(self):
+        # Parcours complet (administration): lecture en flux sans remplir le cache
+        for code_data in self.storage.load_prepaid_codes():
+            yield self._cache.get(code_data['code']) or self.deserialize(code_data)
+
+    def items(self):
+        for prepaid_code in self.values():
+            yield prepaid_code.code, prepaid_code
+
+    def add_many(self, prepaid_codes: Iterable):
+        prepaid_codes = list(prepaid_codes)
+        self.storage.save_prepaid_codes([self.serialize(code) for code in prepaid_codes])
+        self._keys.update(code.code for code in prepaid_codes)
+
+    def save(self, prepaid_code):
+        self.storage.save_prepaid_codes([self.serialize(prepaid_code)])
+        self._keys.add(prepaid_code.code)
+        self._remember(prepaid_code)
+
+    def delete_many(self, codes: Iterable[str]) -> int:
+        codes = list(codes)
+        for code in codes:
+            self._cache.pop(code, None)
+            self._keys.discard(code)
+        self.storage.delete_prepaid_codes(codes)
+        return len(codes)
+
+    def remove_expired(self, now: Optional[datetime] = None) -> int:
+        expired = self.storage.delete_expired_prepaid_codes(now or datetime.now())
+        for code in expired:
+            self._cache.pop(code, None)
+            self._keys.discard(code)
+        return len(expired)
+
+    def statistics(self, now: Optional[datetime] = None) -> dict:
+        return self.storage.prepaid_code_statistics(now or datetime.now())
+
+    def close(self):
+        self._cache.clear()
+        self._keys.clear()
@@ -0,0 +1,172 @@
+"""
+Allocation des casiers libres (ensemble de bits et politiques d'attribution)
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+
+def _lowest_bit(mask: int) -> int:
+    """Position du bit de poids faible d'un masque non nul"""
+    return (mask & -mask).bit_length() - 1
+
+
+class AllocationPolicy:
+    """Politique de choix du prochain casier libre"""
+
+    def attach(self, allocator: 'LockerAllocator'):
+        self.allocator = allocator
+
+    def mark(self, locker_id: int, is_free: bool):
+        """Notifie un changement d'état d'un casier"""
+        pass
+
+    def choose(self, port_type: Optional[str] = None) -> Optional[int]:
+        """Choisit un casier libre (du type de prise demandé), ou None"""
+        raise NotImplementedError
+
+    def allocated(self, locker_id: int):
+        """Notifie l'attribution effective d'un casier"""
+        pass
+
+
+class FirstFreePolicy(AllocationPolicy):
+    """Plus petit numéro de casier libre"""
+
+    def choose(self, port_type: Optional[str] = None) -> Optional[int]:
+        candidates = self.allocator.candidates(port_type)
+        return _lowest_bit(candidates) if candidates else None
+
+
+class RoundRobinPolicy(AllocationPolicy):
+    """Tourne sur les casiers pour répartir l'usure des portes et des prises"""
+
+    def __init__(self):
+        self.cursor = 0
+
+    def choose(self, port_type: Optional[str] = None) -> Optional[int]:
+        candidates = self.allocator.candidates(port_type)
+        if not candidates:
+            return None
+        after_cursor = candidates >> (self.cursor + 1) << (self.cursor + 1)
+        return _lowest_bit(after_cursor or candidates)
+
+    def allocated(self, locker_id: int):
+        self.cursor = locker_id
+
+
+class PreferenceOrderPolicy(AllocationPolicy):
+    """Casiers attribués dans un ordre de préférence (ex: les plus proches de l'écran)
+
+    Les casiers sont renumérotés par rang de préférence dans des masques dédiés,
+    si bien que le meilleur casier libre reste le bit de poids faible.
+    """
+
+    def __init__(self, order: Iterable[int]):
+        self.order = list(order)
+
+    def attach(self, allocator: 'LockerAllocator'):
+        super().attach(allocator)
+        known = set(self.order)
+        self.order += [locker_id for locker_id in allocator.locker_ids if locker_id not in known]
+        self.rank = {locker_id: rank for rank, locker_id in enumerate(self.order)}
+
+        self.free_ranks = 0
+        self.type_ranks: Dict[str, int] = {}
+        for locker_id in allocator.locker_ids:
+            rank_bit = 1 << self.rank[locker_id]
+            if allocator.is_free(locker_id):
+                self.free_ranks |= rank_bit
+            port_type = allocator.port_types.get(locker_id)
+            if port_type:
+                self.type_ranks[port_type] = self.type_ranks.get(port_type, 0) | rank_bit
+
+    def mark(self, locker_id: int, is_free: bool):
+        rank_bit = 1 << self.rank[locker_id]
+        if is_free:
+            self.free_ranks |= rank_bit
+        else:
+            self.free_ranks &= ~rank_bit
+
+    def choose(self, port_type: Optional[str] = None) -> Optional[int]:
+        candidates = self.free_ranks
+        if port_type is not None:
+            candidates &= self.type_ranks.get(port_type, 0)
+        return self.order[_lowest_bit(candidates)] if candidates else None
+
+
+class LockerAllocator:
+    """Casiers libres représentés par un entier utilisé comme ensemble de bits
+
+    Le bit n correspond au casier n. Le nombre de casiers libres est tenu à jour
+    à chaque changement, et la recherche du prochain casier libre se réduit à
+    quelques opérations sur des masques.
+    """
+
+    def __init__(self, locker_ids: Iterable[int], port_types: Optional[Dict[int, str]] = None,
+                 policy: Optional[AllocationPolicy] = None):
+        self.locker_ids = sorted(locker_ids)
+        self.port_types = port_types or {}
+        self.free_mask = 0
+        self._free_count = 0
+
+        self.type_masks: Dict[str, int] = {}
+        for locker_id, port_type in self.port_types.items():
+            self.type_masks[port_type] = self.type_masks.get(port_type, 0) | (1 << locker_id)
+
+        self.policy = policy or FirstFreePolicy()
+
+    def start(self, free_ids: Iterable[int]):
+        """Initialise l'ensemble des casiers libres puis la politique"""
+        for locker_id in free_ids:
+            if not self.free_mask >> locker_id & 1:
+                self.free_mask |= 1 << locker_id
+                self._free_count += 1
+        self.policy.attach(self)
+
+    def is_free(self, locker_id: int) -> bool:
+        return bool(self.free_mask >> locker_id & 1) if locker_id >= 0 else False
+
+    def mark_free(self, locker_id: int):
+        if not self.is_free(locker_id):
+            self.free_mask |= 1 << locker_id
+            self._free_count += 1
+            self.policy.mark(locker_id, True)
+
+    def mark_occupied(self, locker_id: int):
+        if self.is_free(locker_id):
+            self.free_mask &= ~(1 << locker_id)
+            self._free_count -= 1
+            self.policy.mark(locker_id, False)
+
+    def free_count(self) -> int:
+        return self._free_count
+
+    def candidates(self, port_type: Optional[str] = None) -> int:
+        """Masque des casiers libres, éventuellement restreint à un type de prise"""
+        if port_type is None:
+            return self.free_mask
+        return self.free_mask & self.type_masks.get(port_type, 0)
+
+    def next_free(self, port_type: Optional[str] = None) -> Optional[int]:
+        """Prochain casier libre selon la politique d'attribution"""
+        return self.policy.choose(port_type)
+
+    def free_lockers(self) -> List[int]:
+        """Liste des casiers libres, par numéro croissant"""
+        free_ids = []
+        mask = self.free_mask
+        while mask:
+            bit = mask & -mask
+            free_ids.append(bit.bit_length() - 1)
+            mask ^= bit
+        return free_ids
+
+
+def create_allocation_policy(config) -> AllocationPolicy:
+    """Crée la politique d'attribution choisie dans la configuration"""
+    name = config.get('lockers.allocation_policy', 'first_free')
+    if name == 'round_robin':
+        return RoundRobinPolicy()
+    if name == 'nearest':
+        return PreferenceOrderPolicy(config.get('lockers.screen_order', []))
+    return FirstFreePolicy()
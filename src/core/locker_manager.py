@@ -2,113 +2,140 @@
 Gestionnaire des casiers de la borne
 """
 
-import json
-import os
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
 from typing import Dict, List, Optional
-from dataclasses import dataclass, asdict
 from src.core.logger import setup_logger
+from src.core.charging_limits import ChargingLimitEngine
+from src.core.events import EventBus, LockerEvent
+from src.core.locker_allocator import LockerAllocator, create_allocation_policy
+from src.core.records import LockerSession
+from src.core.scheduler import DeadlineScheduler
+from src.core.storage import StorageBackend, create_storage
 
-@dataclass
-class LockerSession:
-    """Représente une session d'utilisation d'un casier"""
-    locker_id: int
-    user_code: str
-    start_time: datetime
-    end_time: Optional[datetime] = None
-    payment_method: str = ""
-    amount_paid: float = 0.0
-    is_active: bool = True
 
 class LockerManager:
     """Gestionnaire des casiers et des sessions"""
     
-    def __init__(self, config):
+    def __init__(self, config, storage: Optional[StorageBackend] = None):
         self.config = config
         self.logger = setup_logger("locker_manager")
-        self.sessions_file = "data/sessions.json"
-        self.lockers_file = "data/lockers.json"
         
-        # Création du dossier data
-        os.makedirs("data", exist_ok=True)
+        # Moteur de stockage (JSON ou SQLite selon la configuration)
+        self.storage = storage or create_storage(config)
         
         # État des casiers (True = occupé, False = libre)
         self.lockers_status = {}
         self.active_sessions = {}
         
+        # Changements d'état des casiers (clé de publication: numéro du casier)
+        self.events = EventBus()
+        
+        # Échéances des sessions (horloge monotone), partagées avec la limite de charge
+        self.scheduler = DeadlineScheduler()
+        self.charging = ChargingLimitEngine(config, self.scheduler, self._save_session)
+        
         self._initialize_lockers()
         self._load_sessions()
+        self._reconcile_lockers()
+        self._initialize_allocator()
     
     def _initialize_lockers(self):
         """Initialise l'état des casiers"""
         locker_count = self.config.get('lockers.count', 8)
         
-        if os.path.exists(self.lockers_file):
-            try:
-                with open(self.lockers_file, 'r', encoding='utf-8') as f:
-                    self.lockers_status = json.load(f)
-            except Exception as e:
-                self.logger.error(f"Erreur lors du chargement des casiers: {e}")
+        try:
+            self.lockers_status = self.storage.load_lockers()
+        except Exception as e:
+            self.logger.error(f"Erreur lors du chargement des casiers: {e}")
         
         # Initialiser les casiers manquants
         for i in range(1, locker_count + 1):
             if str(i) not in self.lockers_status:
                 self.lockers_status[str(i)] = False
     
+    def _initialize_allocator(self):
+        """Construit l'ensemble des casiers libres et la politique d'attribution"""
+        port_types = {
+            int(locker_id): port_type
+            for locker_id, port_type in self.config.get('lockers.port_types', {}).items()
+        }
+        self.allocator = LockerAllocator(
+            (int(locker_id) for locker_id in self.lockers_status),
+            port_types,
+            create_allocation_policy(self.config)
+        )
+        self.allocator.start(
+            int(locker_id) for locker_id, is_occupied in self.lockers_status.items()
+            if not is_occupied
+        )
+    
     def _load_sessions(self):
         """Charge les sessions actives"""
-        if os.path.exists(self.sessions_file):
-            try:
-                with open(self.sessions_file, 'r', encoding='utf-8') as f:
-                    sessions_data = json.load(f)
-                    
-                for session_data in sessions_data:
-                    if session_data.get('is_active', False):
-                        session = LockerSession(
-                            locker_id=session_data['locker_id'],
-                            user_code=session_data['user_code'],
-                            start_time=datetime.fromisoformat(session_data['start_time']),
-                            end_time=datetime.fromisoformat(session_data['end_time']) if session_data.get('end_time') else None,
-                            payment_method=session_data.get('payment_method', ''),
-                            amount_paid=session_data.get('amount_paid', 0.0),
-                            is_active=session_data.get('is_active', True)
-                        )
-                        self.active_sessions[session.locker_id] = session
-            except Exception as e:
-                self.logger.error(f"Erreur lors du chargement des sessions: {e}")
-    
-    def _save_sessions(self):
-        """Sauvegarde les sessions"""
         try:
-            sessions_data = []
-            for session in self.active_sessions.values():
-                session_dict = asdict(session)
-                session_dict['start_time'] = session.start_time.isoformat()
-                if session.end_time:
-                    session_dict['end_time'] = session.end_time.isoformat()
-                sessions_data.append(session_dict)
-            
-            with open(self.sessions_file, 'w', encoding='utf-8') as f:
-                json.dump(sessions_data, f, indent=2, ensure_ascii=False)
+            for session_data in self.storage.load_sessions():
+                if session_data.get('is_active', False):
+                    session = self._deserialize_session(session_data)
+                    self.active_sessions[session.locker_id] = session
+                    self._track_session(session)
         except Exception as e:
-            self.logger.error(f"Erreur lors de la sauvegarde des sessions: {e}")
+            self.logger.error(f"Erreur lors du chargement des sessions: {e}")
     
-    def _save_lockers_status(self):
-        """Sauvegarde l'état des casiers"""
-        try:
-            with open(self.lockers_file, 'w', encoding='utf-8') as f:
-                json.dump(self.lockers_status, f, indent=2)
-        except Exception as e:
-            self.logger.error(f"Erreur lors de la sauvegarde des casiers: {e}")
+    def _reconcile_lockers(self):
+        """Remet en cohérence l'état des casiers avec les sessions actives
+        
+        Casiers et sessions sont deux enregistrements distincts: après une coupure
+        entre leurs deux écritures, la session active fait foi.
+        """
+        for locker_id, is_occupied in list(self.lockers_status.items()):
+            has_session = int(locker_id) in self.active_sessions
+            if is_occupied != has_session:
+                self.logger.warning(
+                    f"État du casier {locker_id} incohérent avec les sessions, corrigé "
+                    f"({'occupé' if has_session else 'libre'})"
+                )
+                self.lockers_status[locker_id] = has_session
+                self.storage.save_locker(int(locker_id), has_session)
+    
+    @staticmethod
+    def _serialize_session(session: LockerSession) -> dict:
+        """Convertit une session en dictionnaire sérialisable"""
+        return session.to_dict()
+    
+    @staticmethod
+    def _deserialize_session(session_data: dict) -> LockerSession:
+        """Reconstruit une session depuis un dictionnaire"""
+        return LockerSession.from_dict(session_data)
+    
+    def locker_ids(self) -> List[int]:
+        """Numéros de tous les casiers, triés"""
+        return sorted(int(locker_id) for locker_id in self.lockers_status)
     
     def get_available_lockers(self) -> List[int]:
         """Retourne la liste des casiers disponibles"""
-        return [int(locker_id) for locker_id, is_occupied in self.lockers_status.items() 
-                if not is_occupied]
+        return self.allocator.free_lockers()
+    
+    def available_count(self) -> int:
+        """Nombre de casiers disponibles (sans parcourir les casiers)"""
+        return self.allocator.free_count()
     
     def is_locker_available(self, locker_id: int) -> bool:
         """Vérifie si un casier est disponible"""
-        return not self.lockers_status.get(str(locker_id), True)
+        return self.allocator.is_free(locker_id)
+    
+    def reserve_any(self, user_code: str, payment_method: str = "", amount: float = 0.0,
+                    port_type: Optional[str] = None) -> Optional[int]:
+        """Réserve le casier choisi par la politique d'attribution
+        
+        Retourne le numéro du casier réservé, ou None si aucun casier
+        (du type de prise demandé) n'est libre.
+        """
+        locker_id = self.allocator.next_free(port_type)
+        if locker_id is None or not self.reserve_locker(locker_id, user_code, payment_method, amount):
+            return None
+        
+        self.allocator.policy.allocated(locker_id)
+        return locker_id
     
     def reserve_locker(self, locker_id: int, user_code: str, payment_method: str = "", amount: float = 0.0) -> bool:
         """Réserve un casier pour un utilisateur"""
@@ -126,13 +153,21 @@ class LockerManager:
         
         # Marquer le casier comme occupé
         self.lockers_status[str(locker_id)] = True
+        self.allocator.mark_occupied(locker_id)
         self.active_sessions[locker_id] = session
+        self._track_session(session)
         
-        # Sauvegarder
-        self._save_lockers_status()
-        self._save_sessions()
+        # Sauvegarder uniquement les lignes modifiées
+        try:
+            self.storage.save_locker(locker_id, True)
+            self.storage.save_session(self._serialize_session(session))
+        except Exception:
+            # Écriture refusée (transaction SQLite): le casier reste libre
+            self.cancel_reservation(locker_id)
+            raise
         
         self.logger.info(f"Casier {locker_id} réservé avec le code {user_code}")
+        self.events.publish(LockerEvent(locker_id, True, 'reserved'), locker_id)
         return True
     
     def unlock_locker(self, locker_id: int, code: str) -> bool:
@@ -153,42 +188,101 @@ class LockerManager:
         self.logger.warning(f"Tentative d'ouverture échouée pour le casier {locker_id}")
         return False
     
-    def release_locker(self, locker_id: int) -> bool:
+    def cancel_reservation(self, locker_id: int):
+        """Annule en mémoire une réservation dont la transaction a échoué
+        
+        Rien n'est écrit: l'annulation de la transaction retire déjà la réservation
+        du stockage. La session n'est pas ajoutée à l'historique.
+        """
+        session = self.active_sessions.pop(locker_id, None)
+        if session is None:
+            return
+        self.lockers_status[str(locker_id)] = False
+        self.allocator.mark_free(locker_id)
+        self.scheduler.cancel(('session_timeout', locker_id))
+        self.charging.session_ended(locker_id)
+        self.events.publish(LockerEvent(locker_id, False, 'cancelled'), locker_id)
+    
+    def release_locker(self, locker_id: int, reason: str = 'released') -> bool:
         """Libère un casier"""
         if locker_id in self.active_sessions:
             session = self.active_sessions[locker_id]
             session.end_time = datetime.now()
             session.is_active = False
+            session.overtime_fee = self.charging.session_ended(locker_id)
             
             # Marquer le casier comme libre
             self.lockers_status[str(locker_id)] = False
+            self.allocator.mark_free(locker_id)
             
             # Supprimer de la liste des sessions actives
             del self.active_sessions[locker_id]
+            self.scheduler.cancel(('session_timeout', locker_id))
             
-            # Sauvegarder
-            self._save_lockers_status()
-            self._save_sessions()
+            # Sauvegarder uniquement les lignes modifiées
+            self.storage.save_locker(locker_id, False)
+            self.storage.delete_session(locker_id)
+            self.storage.append_session_history(self._serialize_session(session))
             
             self.logger.info(f"Casier {locker_id} libéré")
+            self.events.publish(LockerEvent(locker_id, False, reason), locker_id)
             return True
         
         return False
     
+    def when_saved(self, callback):
+        """Appelle callback une fois durables les modifications déjà effectuées"""
+        self.storage.when_durable(callback)
+    
     def get_session_info(self, locker_id: int) -> Optional[LockerSession]:
         """Récupère les informations d'une session"""
         return self.active_sessions.get(locker_id)
     
-    def check_expired_sessions(self):
-        """Vérifie et gère les sessions expirées"""
-        timeout = self.config.get('security.session_timeout', 300)
-        current_time = datetime.now()
-        expired_sessions = []
-        
-        for locker_id, session in self.active_sessions.items():
-            if (current_time - session.start_time).seconds > timeout:
-                expired_sessions.append(locker_id)
+    def get_session_history(self, locker_id: Optional[int] = None, start: Optional[datetime] = None,
+                            end: Optional[datetime] = None, payment_method: Optional[str] = None) -> List[dict]:
+        """Sessions terminées sur une période (ex: le mois en cours pour un casier)"""
+        try:
+            return self.storage.query_session_history(locker_id, start, end, payment_method)
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la lecture de l'historique: {e}")
+            return []
+    
+    def _save_session(self, session: LockerSession):
+        """Enregistre une session active modifiée (début de dépassement)"""
+        if self.active_sessions.get(session.locker_id) is session:
+            self.storage.save_session(self._serialize_session(session))
+    
+    def _track_session(self, session: LockerSession):
+        """Planifie les échéances d'une session (expiration et limite de charge)"""
+        self._schedule_session_timeout(session)
+        self.charging.session_started(session)
+    
+    def _schedule_session_timeout(self, session: LockerSession):
+        """Planifie l'expiration d'une session (jamais avant la limite de charge)"""
+        timeout = self.charging.session_lifetime(self.config.get('security.session_timeout', 300))
+        if timeout is None:
+            # Dépassement sans limite (lockers.max_overtime à null): la session reste ouverte
+            self.scheduler.cancel(('session_timeout', session.locker_id))
+            return
         
-        for locker_id in expired_sessions:
-            self.logger.warning(f"Session expirée pour le casier {locker_id}")
-            self.release_locker(locker_id)
\ No newline at end of file
+        # La date de début est en heure murale (persistée); l'échéance est convertie
+        # sur l'horloge monotone pour ne pas dépendre des changements d'heure
+        elapsed = time.time() - session.start_ts
+        self.scheduler.schedule_in(
+            ('session_timeout', session.locker_id),
+            timeout - elapsed,
+            lambda: self._expire_session(session.locker_id)
+        )
+    
+    def _expire_session(self, locker_id: int):
+        """Libère le casier d'une session expirée"""
+        self.logger.warning(f"Session expirée pour le casier {locker_id}")
+        self.release_locker(locker_id, 'expired')
+    
+    def check_expired_sessions(self) -> int:
+        """Vérifie et gère les sessions expirées (seules les échéances atteintes sont traitées)"""
+        return self.scheduler.run_due()
+    
+    def time_until_next_deadline(self) -> Optional[float]:
+        """Secondes avant la prochaine échéance de session, ou None"""
+        return self.scheduler.time_until_next()
\ No newline at end of file
@@ -6,11 +6,14 @@ import logging
 import os
 from datetime import datetime
 
+# Dossier des fichiers de logs (relatif au dossier de lancement)
+LOG_DIR = "logs"
+
 def setup_logger(name: str = "borne_recharge", level: int = logging.INFO) -> logging.Logger:
     """Configure et retourne un logger pour l'application"""
     
     # Création du dossier de logs
-    log_dir = "logs"
+    log_dir = LOG_DIR
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
     
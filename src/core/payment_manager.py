@@ -2,100 +2,172 @@
 Gestionnaire des paiements et codes prépayés
 """
 
-import json
-import os
 import secrets
 import string
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-from dataclasses import dataclass, asdict
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from src.core.code_index import CodeIndex
+from src.core.events import CodesEvent, EventBus, PaymentEvent
 from src.core.logger import setup_logger
+from src.core.pending_payments import PendingPayment, PendingPaymentRegistry
+from src.core.records import PrepaidCode
+from src.core.storage import StorageBackend, create_storage
 
-@dataclass
-class PrepaidCode:
-    """Représente un code prépayé"""
-    code: str
-    value: float
-    created_date: datetime
-    expiry_date: datetime
-    is_used: bool = False
-    used_date: Optional[datetime] = None
+CODE_ALPHABET = string.ascii_uppercase + string.digits
+
+# Plus grand multiple de len(CODE_ALPHABET) tenant sur un octet: les octets au-delà
+# sont rejetés pour que chaque caractère reste équiprobable
+_CODE_BYTE_LIMIT = 256 - 256 % len(CODE_ALPHABET)
 
 class PaymentManager:
     """Gestionnaire des paiements et codes prépayés"""
     
-    def __init__(self, config):
+    def __init__(self, config, storage: Optional[StorageBackend] = None):
         self.config = config
         self.logger = setup_logger("payment_manager")
-        self.codes_file = "data/prepaid_codes.json"
         
-        # Création du dossier data
-        os.makedirs("data", exist_ok=True)
+        # Moteur de stockage (JSON ou SQLite selon la configuration)
+        self.storage = storage or create_storage(config)
+        
+        # Protège prepaid_codes lorsqu'une génération en lot tourne dans un thread
+        self._lock = threading.RLock()
+        
+        # Changements d'état des codes (clé de publication: le code, pour un code unique)
+        self.events = EventBus()
+        
+        # Index secondaires des recherches d'administration, construit à la première requête
+        self._code_index: Optional[CodeIndex] = None
+        
+        # Paiements QR/USSD en attente de confirmation, ouverts au premier appel
+        self._pending_payments: Optional[PendingPaymentRegistry] = None
         
-        self.prepaid_codes = {}
-        self._load_prepaid_codes()
+        # Client du fournisseur de paiement (payment.provider_url), démarré au premier paiement
+        self._provider = None
+        
+        # Magasin de codes optionnel (payment.code_store): "columnar" ou "lazy".
+        # Par défaut, tous les codes sont chargés dans un dictionnaire.
+        self.code_store = None
+        self._code_store_kind = store_kind = config.get('payment.code_store', 'memory')
+        if store_kind == 'columnar':
+            self._open_columnar_store()
+        elif store_kind == 'lazy':
+            self._open_lazy_store()
+        else:
+            self.prepaid_codes = {}
+            self._load_prepaid_codes()
     
-    def _load_prepaid_codes(self):
-        """Charge les codes prépayés depuis le fichier"""
-        if os.path.exists(self.codes_file):
+    def _open_columnar_store(self):
+        """Ouvre le stockage colonnaire projeté en mémoire"""
+        from src.core.columnar_codes import ColumnarCodeStore
+        
+        directory = self.config.get('payment.columnar_store_dir', 'data/prepaid_codes')
+        code_length = self.config.get('payment.prepaid_code_length', 8)
+        self.code_store = ColumnarCodeStore(directory, code_length)
+        self.prepaid_codes = self.code_store
+        
+        if self.code_store.is_new:
+            # Import unique des codes existants depuis le moteur de stockage
             try:
-                with open(self.codes_file, 'r', encoding='utf-8') as f:
-                    codes_data = json.load(f)
-                    
-                for code_data in codes_data:
-                    code = PrepaidCode(
-                        code=code_data['code'],
-                        value=code_data['value'],
-                        created_date=datetime.fromisoformat(code_data['created_date']),
-                        expiry_date=datetime.fromisoformat(code_data['expiry_date']),
-                        is_used=code_data.get('is_used', False),
-                        used_date=datetime.fromisoformat(code_data['used_date']) if code_data.get('used_date') else None
-                    )
-                    self.prepaid_codes[code.code] = code
+                codes = []
+                for code_data in self.storage.load_prepaid_codes():
+                    try:
+                        self.code_store.check_code(code_data['code'])
+                    except ValueError as e:
+                        self.logger.error(f"{e}: code non importé")
+                        continue
+                    codes.append(self._deserialize_code(code_data))
+                self.code_store.add_many(codes)
+                self.logger.info(f"{len(codes)} codes prépayés importés dans {directory}")
             except Exception as e:
-                self.logger.error(f"Erreur lors du chargement des codes prépayés: {e}")
+                self.logger.error(f"Erreur lors de l'import des codes prépayés: {e}")
+    
+    def _open_lazy_store(self):
+        """Ouvre l'accès paresseux: les codes sont lus à la demande"""
+        from src.core.lazy_codes import LazyCodeStore
+        
+        self.code_store = LazyCodeStore(
+            self.storage, self._serialize_code, self._deserialize_code,
+            cache_size=self.config.get('payment.lazy_cache_size', 1024)
+        )
+        self.prepaid_codes = self.code_store
     
-    def _save_prepaid_codes(self):
-        """Sauvegarde les codes prépayés"""
+    def _load_prepaid_codes(self):
+        """Charge les codes prépayés depuis le stockage"""
         try:
-            codes_data = []
-            for code in self.prepaid_codes.values():
-                code_dict = asdict(code)
-                code_dict['created_date'] = code.created_date.isoformat()
-                code_dict['expiry_date'] = code.expiry_date.isoformat()
-                if code.used_date:
-                    code_dict['used_date'] = code.used_date.isoformat()
-                codes_data.append(code_dict)
-            
-            with open(self.codes_file, 'w', encoding='utf-8') as f:
-                json.dump(codes_data, f, indent=2, ensure_ascii=False)
+            for code_data in self.storage.load_prepaid_codes():
+                code = self._deserialize_code(code_data)
+                self.prepaid_codes[code.code] = code
         except Exception as e:
-            self.logger.error(f"Erreur lors de la sauvegarde des codes prépayés: {e}")
+            self.logger.error(f"Erreur lors du chargement des codes prépayés: {e}")
+    
+    @staticmethod
+    def _serialize_code(code: PrepaidCode) -> dict:
+        """Convertit un code prépayé en dictionnaire sérialisable"""
+        return code.to_dict()
+    
+    @staticmethod
+    def _deserialize_code(code_data: dict) -> PrepaidCode:
+        """Reconstruit un code prépayé depuis un dictionnaire"""
+        return PrepaidCode.from_dict(code_data)
+    
+    def _save_prepaid_code(self, prepaid_code: PrepaidCode):
+        """Sauvegarde un code prépayé (mise à jour ligne par ligne)"""
+        if self.code_store is not None:
+            self.code_store.save(prepaid_code)
+        else:
+            self.storage.save_prepaid_codes([self._serialize_code(prepaid_code)])
     
     def generate_prepaid_code(self, value: float, validity_days: int = 365) -> str:
         """Génère un nouveau code prépayé"""
+        code = self.generate_prepaid_codes(1, value, validity_days)[0]
+        self.logger.info(f"Code prépayé généré: {code} (valeur: {value}€)")
+        return code
+    
+    def generate_prepaid_codes(self, count: int, value: float, validity_days: int = 365,
+                               progress_callback: Optional[Callable[[int, int], None]] = None) -> List[str]:
+        """Génère un lot de codes prépayés uniques et les sauvegarde en une seule écriture"""
         code_length = self.config.get('payment.prepaid_code_length', 8)
+        created_ts = int(time.time())
+        expiry_ts = created_ts + validity_days * 86400
         
-        # Générer un code unique
-        while True:
-            code = ''.join(secrets.choice(string.ascii_uppercase + string.digits) 
-                          for _ in range(code_length))
-            if code not in self.prepaid_codes:
-                break
-        
-        # Créer le code prépayé
-        prepaid_code = PrepaidCode(
-            code=code,
-            value=value,
-            created_date=datetime.now(),
-            expiry_date=datetime.now() + timedelta(days=validity_days)
-        )
+        new_codes = {}
+        progress_step = max(1, count // 100)
         
-        self.prepaid_codes[code] = prepaid_code
-        self._save_prepaid_codes()
+        while len(new_codes) < count:
+            # Tirage groupé: quelques octets de plus que nécessaire pour absorber les rejets
+            missing = count - len(new_codes)
+            random_bytes = secrets.token_bytes(missing * code_length * 9 // 8 + code_length)
+            chars = [CODE_ALPHABET[b % len(CODE_ALPHABET)] for b in random_bytes if b < _CODE_BYTE_LIMIT]
+            
+            for start in range(0, len(chars) - code_length + 1, code_length):
+                code = ''.join(chars[start:start + code_length])
+                if code in new_codes or code in self.prepaid_codes:
+                    continue
+                
+                new_codes[code] = PrepaidCode.from_epoch(code, value, created_ts, expiry_ts)
+                
+                if progress_callback and len(new_codes) % progress_step == 0:
+                    progress_callback(len(new_codes), count)
+                if len(new_codes) == count:
+                    break
         
-        self.logger.info(f"Code prépayé généré: {code} (valeur: {value}€)")
-        return code
+        with self._lock:
+            if self.code_store is not None:
+                self.code_store.add_many(new_codes.values())
+            else:
+                self.prepaid_codes.update(new_codes)
+                self.storage.save_prepaid_codes([self._serialize_code(code) for code in new_codes.values()])
+            if self._code_index is not None:
+                self._code_index.add_many(self._index_record(code) for code in new_codes.values())
+        
+        self.events.publish(CodesEvent('created', tuple(new_codes)))
+        if count > 1:
+            self.logger.info(f"{count} codes prépayés générés (valeur: {value}€)")
+        if progress_callback:
+            progress_callback(count, count)
+        return list(new_codes)
     
     def validate_prepaid_code(self, code: str) -> Optional[PrepaidCode]:
         """Valide un code prépayé"""
@@ -111,7 +183,7 @@ class PaymentManager:
             return None
         
         # Vérifier si le code est expiré
-        if datetime.now() > prepaid_code.expiry_date:
+        if prepaid_code.is_expired(time.time()):
             self.logger.warning(f"Code prépayé expiré: {code}")
             return None
         
@@ -119,17 +191,55 @@ class PaymentManager:
     
     def use_prepaid_code(self, code: str) -> bool:
         """Utilise un code prépayé"""
-        prepaid_code = self.validate_prepaid_code(code)
-        if not prepaid_code:
-            return False
+        return self.redeem_prepaid_code(code) is not None
+    
+    def redeem_prepaid_code(self, code: str) -> Optional[PrepaidCode]:
+        """Valide et utilise un code prépayé; retourne le code utilisé, ou None
         
-        # Marquer le code comme utilisé
-        prepaid_code.is_used = True
-        prepaid_code.used_date = datetime.now()
+        Validation et utilisation sont faites sous le même verrou: un code ne peut
+        pas être utilisé deux fois par des appels concurrents.
+        """
+        with self._lock:
+            prepaid_code = self.validate_prepaid_code(code)
+            if not prepaid_code:
+                return None
+            
+            prepaid_code.is_used = True
+            prepaid_code.used_ts = int(time.time())
+            try:
+                self._save_prepaid_code(prepaid_code)
+            except Exception:
+                # Écriture refusée (transaction SQLite): le code reste utilisable
+                prepaid_code.is_used = False
+                prepaid_code.used_ts = None
+                raise
+            self._index_used(prepaid_code)
         
-        self._save_prepaid_codes()
         self.logger.info(f"Code prépayé utilisé: {code}")
-        return True
+        self.events.publish(CodesEvent('used', (prepaid_code.code,)), prepaid_code.code)
+        return prepaid_code
+    
+    @property
+    def codes_in_storage(self) -> bool:
+        """Les écritures des codes passent par le moteur de stockage (et ses transactions)
+
+        Le magasin colonnaire écrit dans ses propres fichiers.
+        """
+        return self._code_store_kind != 'columnar'
+    
+    def restore_prepaid_code(self, prepaid_code: PrepaidCode):
+        """Annule l'utilisation d'un code (transaction annulée)"""
+        prepaid_code.is_used = False
+        prepaid_code.used_ts = None
+        # Le magasin colonnaire écrit hors du moteur de stockage, donc hors transaction:
+        # l'état d'origine est réécrit dans tous les cas
+        self._save_prepaid_code(prepaid_code)
+        self._index_used(prepaid_code)
+        self.events.publish(CodesEvent('restored', (prepaid_code.code,)), prepaid_code.code)
+    
+    def when_saved(self, callback: Callable[[], None]):
+        """Appelle callback une fois durables les modifications déjà effectuées"""
+        self.storage.when_durable(callback)
     
     def get_code_value(self, code: str) -> float:
         """Récupère la valeur d'un code prépayé"""
@@ -145,18 +255,229 @@ class PaymentManager:
         """Récupère le code USSD pour le paiement"""
         return self.config.get('payment.ussd_code', '*123#')
     
+    def _get_pending_payments(self) -> PendingPaymentRegistry:
+        """Registre des paiements en attente (relu depuis le stockage au premier appel)"""
+        with self._lock:
+            if self._pending_payments is None:
+                self._pending_payments = PendingPaymentRegistry(
+                    self.storage, ttl=self.config.get('payment.pending_ttl', 900)
+                )
+            return self._pending_payments
+    
+    @property
+    def has_payment_provider(self) -> bool:
+        """Les paiements QR/USSD sont confirmés par le fournisseur (et non déclarés à la borne)"""
+        return bool(self.config.get('payment.provider_url'))
+    
+    def _get_provider(self):
+        """Client du fournisseur de paiement (démarré au premier appel), ou None"""
+        if not self.has_payment_provider:
+            return None
+        with self._lock:
+            if self._provider is None:
+                from src.core.payment_provider import PaymentProviderClient
+                
+                self._provider = PaymentProviderClient(
+                    self.config.get('payment.provider_url'),
+                    self._on_provider_status,
+                    poll_interval=self.config.get('payment.provider_poll_interval', 2.0),
+                    timeout=self.config.get('payment.provider_timeout', 5.0),
+                    max_retries=self.config.get('payment.provider_retries', 3),
+                    max_connections=self.config.get('payment.provider_connections', 4),
+                    pipeline_depth=self.config.get('payment.provider_pipeline_depth', 16),
+                    failure_threshold=self.config.get('payment.provider_failure_threshold', 5),
+                    reset_timeout=self.config.get('payment.provider_reset_timeout', 30.0)
+                )
+            return self._provider
+    
+    def prepare_payments(self):
+        """Ouvre dès maintenant le registre des paiements en attente et le client du fournisseur"""
+        self._get_pending_payments()
+        self._get_provider()
+    
+    def _on_provider_status(self, reference: str, status: str):
+        """État final d'une référence rapporté par le fournisseur (thread du client)"""
+        if status == 'confirmed':
+            self.confirm_pending_payment(reference)
+        else:
+            self.logger.warning(f"Paiement {reference} refusé par le fournisseur")
+            self.events.publish(PaymentEvent(reference, status), reference)
+    
+    def new_payment_reference(self) -> str:
+        """Référence libre pour une nouvelle demande de paiement"""
+        return self._get_pending_payments().new_reference()
+    
+    def pending_payments_locked(self):
+        """Suspend les autres modifications des paiements en attente (à prendre
+        avant d'ouvrir une transaction du moteur qui les modifie)"""
+        return self._get_pending_payments().locked()
+    
+    def register_pending_payment(self, reference: str, method: str, amount: float) -> PendingPayment:
+        """Enregistre une demande de paiement QR ou USSD en attente de confirmation
+        
+        Avec un fournisseur configuré, la référence est suivie jusqu'à sa confirmation.
+        Lève DuplicateReferenceError si la référence est déjà attribuée.
+        """
+        payment = self._get_pending_payments().register(reference, method, amount)
+        provider = self._get_provider()
+        if provider is not None:
+            provider.watch(reference, payment.expires_ts)
+        return payment
+    
+    def check_payment_status(self, reference: str):
+        """Demande l'état d'une référence au fournisseur sans attendre (réponse par événement)"""
+        provider = self._get_provider()
+        if provider is not None:
+            provider.poll_now()
+    
+    def get_pending_payment(self, reference: str) -> Optional[PendingPayment]:
+        """Demande de paiement encore valide de cette référence, ou None"""
+        return self._get_pending_payments().get(reference)
+    
+    def confirm_pending_payment(self, reference: str) -> Optional[PendingPayment]:
+        """Enregistre la confirmation d'un paiement; None si la référence est inconnue ou expirée"""
+        payment, confirmed = self._get_pending_payments().confirm(reference)
+        
+        if payment is None:
+            self.logger.warning(f"Confirmation d'une référence inconnue ou expirée: {reference}")
+            return None
+        if confirmed:
+            self.logger.info(f"Paiement {payment.method} {reference} confirmé ({payment.amount}€)")
+            self.events.publish(PaymentEvent(reference, 'confirmed', payment.amount), reference)
+        return payment
+    
+    def complete_pending_payment(self, reference: str, locker_id: int) -> Optional[PendingPayment]:
+        """Rattache un paiement confirmé à la session d'un casier (la référence est retirée)
+        
+        Retourne None si le paiement n'est pas (ou plus) confirmé et valide: il ne
+        peut être rattaché qu'une seule fois.
+        """
+        payment = self._get_pending_payments().complete(reference)
+        if payment is not None:
+            self.logger.info(f"Paiement {reference} rattaché au casier {locker_id}")
+        return payment
+    
+    def restore_pending_payment(self, payment: PendingPayment):
+        """Annule le rattachement d'un paiement (transaction annulée)"""
+        self._get_pending_payments().restore(payment)
+    
+    def cleanup_pending_payments(self):
+        """Retire les demandes de paiement échues"""
+        if self._pending_payments is not None:
+            evicted = self._pending_payments.evict_expired()
+            if evicted:
+                self.logger.info(f"{evicted} demandes de paiement expirées retirées")
+    
+    def close(self):
+        """Arrête le client du fournisseur de paiement"""
+        with self._lock:
+            if self._provider is not None:
+                self._provider.close()
+                self._provider = None
+    
     def cleanup_expired_codes(self):
         """Nettoie les codes expirés"""
         current_time = datetime.now()
-        expired_codes = []
+        now_ts = current_time.timestamp()
         
-        for code, prepaid_code in self.prepaid_codes.items():
-            if current_time > prepaid_code.expiry_date:
-                expired_codes.append(code)
+        if self.code_store is not None:
+            with self._lock:
+                removed = self.code_store.remove_expired(current_time)
+                if removed and self._code_index is not None:
+                    self._code_index.remove_expired(now_ts)
+            if removed:
+                self.logger.info(f"{removed} codes prépayés expirés supprimés")
+                self.events.publish(CodesEvent('expired'))
+            return
         
-        for code in expired_codes:
-            del self.prepaid_codes[code]
-            self.logger.info(f"Code prépayé expiré supprimé: {code}")
+        with self._lock:
+            expired_codes = [code for code, prepaid_code in self.prepaid_codes.items()
+                             if prepaid_code.is_expired(now_ts)]
+            
+            for code in expired_codes:
+                del self.prepaid_codes[code]
+                self.logger.info(f"Code prépayé expiré supprimé: {code}")
+            if self._code_index is not None:
+                self._code_index.remove_many(expired_codes)
         
         if expired_codes:
-            self._save_prepaid_codes()
\ No newline at end of file
+            self.storage.delete_prepaid_codes(expired_codes)
+            self.events.publish(CodesEvent('expired', tuple(expired_codes)))
+    
+    @staticmethod
+    def _index_record(prepaid_code: PrepaidCode) -> tuple:
+        used_ts = (prepaid_code.used_ts or 0) if prepaid_code.is_used else None
+        return (prepaid_code.code, prepaid_code.value, prepaid_code.created_ts, prepaid_code.expiry_ts, used_ts)
+    
+    def _index_used(self, prepaid_code: PrepaidCode):
+        with self._lock:
+            if self._code_index is not None:
+                used_ts = (prepaid_code.used_ts or 0) if prepaid_code.is_used else None
+                self._code_index.set_used(prepaid_code.code, used_ts)
+    
+    def _get_code_index(self) -> CodeIndex:
+        """Index des codes (construit au premier appel, puis tenu à jour)"""
+        with self._lock:
+            if self._code_index is None:
+                start = time.perf_counter()
+                if self.code_store is not None and hasattr(self.code_store, 'records'):
+                    records = self.code_store.records()
+                else:
+                    records = (self._index_record(code) for code in self.prepaid_codes.values())
+                self._code_index = CodeIndex(records)
+                self.logger.info(f"Index de {len(self._code_index)} codes prépayés construit "
+                                 f"en {(time.perf_counter() - start) * 1000:.0f} ms")
+            return self._code_index
+    
+    def query_codes(self, status: Optional[str] = None, value: Optional[float] = None,
+                    sort_by: str = 'created', descending: bool = False, prefix: Optional[str] = None,
+                    batch: Optional[tuple] = None, expiring_within: Optional[int] = None) -> List[str]:
+        """Codes correspondant aux filtres, triés
+        
+        status: "active", "used" ou "expired"; prefix: début du code; batch: lot
+        (date de création epoch, valeur), voir code_batches; expiring_within: échéance dans les N secondes.
+        Seules les clés sont retournées: les codes sont lus à l'affichage.
+        """
+        index = self._get_code_index()
+        with self._lock:
+            return index.query(time.time(), status, value, sort_by, descending,
+                               prefix.upper() if prefix else None, batch, expiring_within)
+    
+    def code_values(self) -> List[float]:
+        """Valeurs distinctes des codes existants"""
+        index = self._get_code_index()
+        with self._lock:
+            return index.values()
+    
+    def code_batches(self) -> List[tuple]:
+        """Lots générés: (date de création epoch, valeur, nombre de codes), du plus récent au plus ancien"""
+        index = self._get_code_index()
+        with self._lock:
+            return index.batches()
+    
+    def get_code_statistics(self) -> dict:
+        """Statistiques des codes prépayés (total, utilisés, expirés, actifs, valeur active)"""
+        current_time = datetime.now()
+        now_ts = current_time.timestamp()
+        
+        # Index déjà construit (administration): statistiques sans parcours des codes
+        if self._code_index is not None:
+            with self._lock:
+                return self._code_index.statistics(now_ts)
+        
+        if self.code_store is not None:
+            return self.code_store.statistics(current_time)
+        
+        stats = {'total': 0, 'used': 0, 'expired': 0, 'active': 0, 'active_value': 0.0}
+        with self._lock:
+            for prepaid_code in self.prepaid_codes.values():
+                stats['total'] += 1
+                if prepaid_code.is_used:
+                    stats['used'] += 1
+                elif prepaid_code.is_expired(now_ts):
+                    stats['expired'] += 1
+                else:
+                    stats['active'] += 1
+                    stats['active_value'] += prepaid_code.value
+        stats['active_value'] = round(stats['active_value'], 2)
+        return stats
@@ -0,0 +1,383 @@
+"""
+Client asynchrone du fournisseur de paiement (confirmations des paiements QR et USSD)
+"""
+
+import asyncio
+import json
+import random
+import ssl
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+from src.core.logger import setup_logger
+
+# Une requête: méthode, chemin, corps JSON éventuel
+Request = Tuple[str, str, Optional[dict]]
+
+
+class ProviderError(Exception):
+    """Échec d'un échange avec le fournisseur (réseau, délai, réponse invalide)"""
+
+
+class CircuitBreaker:
+    """Coupe-circuit des appels au fournisseur
+
+    Après failure_threshold échecs consécutifs le circuit s'ouvre: aucun appel
+    pendant reset_timeout secondes. Un seul appel d'essai est ensuite permis
+    (demi-ouvert): son succès referme le circuit, son échec le rouvre.
+    Utilisé depuis la seule boucle asyncio du client (pas de verrou).
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+
+class _Connection:
+    __slots__ = ('reader', 'writer')
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @property
+    def is_closed(self) -> bool:
+        return self.writer.is_closing() or self.reader.at_eof()
+
+    def close(self):
+        self.writer.close()
+
+
+class HttpConnectionPool:
+    """Connexions HTTP/1.1 persistantes vers un hôte, réutilisées d'une requête à l'autre
+
+    pipeline() envoie plusieurs requêtes d'un bloc sur une même connexion puis lit
+    les réponses dans l'ordre (pipelining HTTP/1.1): un seul aller-retour réseau
+    pour un lot d'interrogations. Au plus max_connections connexions sont ouvertes.
+    """
+
+    def __init__(self, host: str, port: int, use_ssl: bool = False, max_connections: int = 4):
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl.create_default_context() if use_ssl else None
+        self._idle = deque()
+        self._slots = asyncio.Semaphore(max_connections)
+
+    async def _acquire(self) -> Tuple[_Connection, bool]:
+        """Connexion libre (réutilisée si possible) et indicateur de réutilisation"""
+        await self._slots.acquire()
+        while self._idle:
+            connection = self._idle.pop()
+            if not connection.is_closed:
+                return connection, True
+            connection.close()
+        try:
+            reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl_context)
+        except BaseException:
+            self._slots.release()
+            raise
+        return _Connection(reader, writer), False
+
+    def _release(self, connection: _Connection, reusable: bool):
+        if reusable and not connection.is_closed:
+            self._idle.append(connection)
+        else:
+            connection.close()
+        self._slots.release()
+
+    def _encode(self, method: str, path: str, body: Optional[dict]) -> bytes:
+        payload = b"" if body is None else json.dumps(body).encode('utf-8')
+        head = (f"{method} {path} HTTP/1.1\r\n"
+                f"Host: {self.host}:{self.port}\r\n"
+                f"Accept: application/json\r\n"
+                f"Connection: keep-alive\r\n"
+                f"Content-Length: {len(payload)}\r\n")
+        if body is not None:
+            head += "Content-Type: application/json\r\n"
+        return (head + "\r\n").encode('ascii') + payload
+
+    @staticmethod
+    async def _read_response(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str], bytes]:
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connexion fermée par le fournisseur")
+        try:
+            status = int(status_line.split()[1])
+        except (IndexError, ValueError):
+            raise ProviderError(f"ligne de statut invalide: {status_line[:80]!r}")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode('latin-1').partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            body = b"".join(chunks)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            body = await reader.read()
+        return status, headers, body
+
+    async def pipeline(self, requests: List[Request]) -> List[Tuple[int, bytes]]:
+        """Envoie les requêtes d'un bloc et retourne (statut, corps) de chacune, dans l'ordre"""
+        payload = b"".join(self._encode(method, path, body) for method, path, body in requests)
+        for attempt in range(2):
+            connection, reused = await self._acquire()
+            responses = []
+            reusable = False
+            try:
+                connection.writer.write(payload)
+                await connection.writer.drain()
+                keep_alive = True
+                for _ in requests:
+                    status, headers, body = await self._read_response(connection.reader)
+                    responses.append((status, body))
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+                # Rendue au pool seulement si toutes les réponses ont été lues
+                reusable = keep_alive
+                return responses
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # Connexion gardée fermée entre-temps par le fournisseur: une
+                # seconde tentative sur une connexion neuve, sans compter d'échec
+                if not reused or responses or attempt:
+                    raise
+            finally:
+                self._release(connection, reusable)
+
+    async def close(self):
+        while self._idle:
+            connection = self._idle.pop()
+            connection.close()
+            try:
+                await connection.writer.wait_closed()
+            except Exception:
+                pass
+
+
+class PaymentProviderClient:
+    """Client du fournisseur de paiement, dans sa propre boucle asyncio
+
+    La boucle tourne dans un thread dédié, à côté de la boucle Qt: l'interface
+    n'appelle que des méthodes qui ne bloquent pas (watch, unwatch, poll_now) et
+    les changements d'état sont rapportés par on_status(référence, état), appelé
+    dans le thread de la boucle.
+
+    Les références suivies sont interrogées toutes les poll_interval secondes,
+    par lots de pipeline_depth requêtes envoyés d'un bloc sur une connexion
+    persistante. Chaque lot a un délai (timeout) et est réessayé avec un délai
+    croissant (backoff exponentiel avec gigue); le coupe-circuit suspend les
+    interrogations quand le fournisseur ne répond plus (délai dépassé, erreur
+    réseau ou erreur 5xx). Une réponse 4xx ou illisible ne concerne que sa
+    référence: elle est journalisée et la référence reste suivie.
+    """
+
+    FINAL_STATUSES = ('confirmed', 'failed')
+
+    def __init__(self, base_url: str, on_status: Callable[[str, str], None],
+                 poll_interval: float = 2.0, timeout: float = 5.0, max_retries: int = 3,
+                 backoff: float = 0.5, max_connections: int = 4, pipeline_depth: int = 16,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.logger = setup_logger("payment_provider")
+        parts = urlsplit(base_url)
+        use_ssl = parts.scheme == 'https'
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port or (443 if use_ssl else 80)
+        self.base_path = parts.path.rstrip('/')
+        self.on_status = on_status
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.pipeline_depth = max(1, pipeline_depth)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        # Référence suivie -> échéance (secondes epoch); lu et modifié dans la boucle seulement
+        self._watched: Dict[str, float] = {}
+        self._stopping = False
+
+        # La boucle et ses objets sont créés dans le thread du client
+        self._ready = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(use_ssl, max_connections), name="payment-provider", daemon=True
+        )
+        self._thread.start()
+        self._ready.wait()
+
+    # ------------------------------------------------------------------
+    # Appels depuis les autres threads (interface, gestionnaires)
+    # ------------------------------------------------------------------
+
+    def watch(self, reference: str, expires_ts: float):
+        """Suit une référence jusqu'à son état final ou son échéance"""
+        self._loop.call_soon_threadsafe(self._watch, reference, expires_ts)
+
+    def unwatch(self, reference: str):
+        self._loop.call_soon_threadsafe(self._watched.pop, reference, None)
+
+    def poll_now(self):
+        """Avance la prochaine interrogation (par exemple quand le client dit avoir payé)"""
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def close(self):
+        """Arrête la boucle et ferme les connexions"""
+        if self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._stop)
+            self._thread.join(timeout=self.timeout + 1)
+
+    # ------------------------------------------------------------------
+    # Boucle asyncio
+    # ------------------------------------------------------------------
+
+    def _run(self, use_ssl: bool, max_connections: int):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._wakeup = asyncio.Event()
+        self._pool = HttpConnectionPool(self.host, self.port, use_ssl, max_connections)
+        self._ready.set()
+        try:
+            self._loop.run_until_complete(self._poll_loop())
+        finally:
+            self._loop.close()
+
+    def _watch(self, reference: str, expires_ts: float):
+        self._watched[reference] = expires_ts
+        self._wakeup.set()
+
+    def _stop(self):
+        self._stopping = True
+        self._wakeup.set()
+
+    async def _poll_loop(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._stopping:
+                break
+            try:
+                await self._poll_watched()
+            except Exception as e:
+                self.logger.error(f"Erreur lors de l'interrogation du fournisseur: {e}")
+        await self._pool.close()
+
+    async def _poll_watched(self):
+        now = time.time()
+        for reference in [ref for ref, expires_ts in self._watched.items() if expires_ts <= now]:
+            del self._watched[reference]
+        if not self._watched:
+            return
+
+        recovering = self.breaker.state != CircuitBreaker.CLOSED
+        if not self.breaker.allow():
+            return
+
+        references = list(self._watched)
+        batches = [references[i:i + self.pipeline_depth]
+                   for i in range(0, len(references), self.pipeline_depth)]
+        results = await asyncio.gather(*(self._poll_batch(batch) for batch in batches),
+                                       return_exceptions=True)
+
+        failed = [result for result in results if isinstance(result, Exception)]
+        if failed:
+            self.breaker.record_failure()
+            self.logger.error(f"Fournisseur injoignable ({len(failed)}/{len(batches)} lots): {failed[0]}")
+            if self.breaker.state == CircuitBreaker.OPEN:
+                self.logger.warning(f"Interrogations suspendues {self.breaker.reset_timeout:.0f} s (coupe-circuit)")
+        else:
+            self.breaker.record_success()
+            if recovering:
+                self.logger.info("Fournisseur de nouveau joignable")
+
+        for result in results:
+            if isinstance(result, Exception):
+                continue
+            for reference, status in result:
+                if status in self.FINAL_STATUSES and self._watched.pop(reference, None) is not None:
+                    self._report(reference, status)
+
+    async def _poll_batch(self, references: List[str]) -> List[Tuple[str, str]]:
+        requests = [('GET', f"{self.base_path}/payments/{quote(reference)}", None) for reference in references]
+        responses = await self._request(requests)
+
+        statuses = []
+        for reference, (status, body) in zip(references, responses):
+            if status == 404:
+                # Référence pas encore connue du fournisseur: le client n'a pas payé
+                statuses.append((reference, 'pending'))
+                continue
+            if status >= 400:
+                # Requête refusée: le fournisseur répond, le coupe-circuit n'est pas concerné
+                self.logger.warning(f"Interrogation refusée pour {reference}: erreur {status}")
+                continue
+            try:
+                statuses.append((reference, json.loads(body)['status']))
+            except (ValueError, KeyError, TypeError):
+                self.logger.error(f"Réponse invalide du fournisseur pour {reference}: {body[:80]!r}")
+        return statuses
+
+    async def _request(self, requests: List[Request]) -> List[Tuple[int, bytes]]:
+        """Lot de requêtes avec délai et nouvelles tentatives (backoff exponentiel)"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                responses = await asyncio.wait_for(self._pool.pipeline(requests), self.timeout)
+                server_error = next((status for status, _ in responses if status >= 500), None)
+                if server_error is None:
+                    return responses
+                error = ProviderError(f"erreur {server_error} du fournisseur")
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ProviderError) as e:
+                error = e if str(e) else ProviderError(type(e).__name__)
+
+            if attempt == self.max_retries:
+                raise error
+            await asyncio.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.0))
+
+    def _report(self, reference: str, status: str):
+        try:
+            self.on_status(reference, status)
+        except Exception as e:
+            self.logger.error(f"Erreur lors du traitement de l'état de {reference}: {e}")
\ No newline at end of file
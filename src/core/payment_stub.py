@@ -0,0 +1,187 @@
+"""
+Fournisseur de paiement local pour les essais hors ligne
+
+    python -m src.core.payment_stub --port 8765 --auto-confirm 5
+
+puis "provider_url": "http://127.0.0.1:8765" dans la section payment de config.json.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import unquote
+from src.core.logger import setup_logger
+
+
+class StubPaymentProvider:
+    """Serveur HTTP/1.1 minimal imitant l'API du fournisseur de paiement
+
+    GET  /payments/<référence>          état {"reference", "status"}, 404 si inconnue
+    POST /payments/<référence>/confirm  le client a payé (état "confirmed")
+    POST /payments/<référence>/fail     paiement refusé (état "failed")
+
+    Les connexions restent ouvertes entre les requêtes (keep-alive) et les
+    requêtes envoyées d'un bloc sont traitées dans l'ordre (pipelining).
+    Pour les essais: auto_confirm confirme une référence ce nombre de secondes
+    après sa première interrogation; latency retarde chaque réponse et
+    failure_rate répond une erreur 503 à cette proportion des requêtes.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, auto_confirm: Optional[float] = None,
+                 latency: float = 0.0, failure_rate: float = 0.0):
+        self.logger = setup_logger("payment_stub")
+        self.host = host
+        self.port = port
+        self.auto_confirm = auto_confirm
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+        # Référence -> [état, date de première interrogation]
+        self.payments: Dict[str, list] = {}
+        self.requests_served = 0
+        self.connections_opened = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def confirm(self, reference: str):
+        """Simule le paiement d'une référence (depuis n'importe quel thread)"""
+        self._set_status(reference, 'confirmed')
+
+    def fail(self, reference: str):
+        self._set_status(reference, 'failed')
+
+    def _set_status(self, reference: str, status: str):
+        payment = self.payments.setdefault(reference, ['pending', time.time()])
+        payment[0] = status
+
+    # ------------------------------------------------------------------
+    # Serveur
+    # ------------------------------------------------------------------
+
+    async def start_server(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.logger.info(f"Fournisseur de paiement de test sur {self.url}")
+
+    def start(self):
+        """Démarre le serveur dans un thread dédié; retourne une fois à l'écoute"""
+        self._thread = threading.Thread(target=self._run, name="payment-stub", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self.start_server())
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+    def stop(self):
+        if self._thread and self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections_opened += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode('latin-1').partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if int(headers.get('content-length', 0)):
+                    await reader.readexactly(int(headers['content-length']))
+
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                status, body = self._route(method, path)
+                self.requests_served += 1
+
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                payload = json.dumps(body).encode('utf-8')
+                writer.write((f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}\r\n"
+                              f"Content-Type: application/json\r\n"
+                              f"Content-Length: {len(payload)}\r\n"
+                              f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                              f"\r\n").encode('ascii') + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def _route(self, method: str, path: str) -> Tuple[int, dict]:
+        if self.failure_rate and random.random() < self.failure_rate:
+            return 503, {'error': 'unavailable'}
+
+        parts = [unquote(part) for part in path.split("?")[0].strip("/").split("/")]
+        if len(parts) < 2 or parts[0] != 'payments':
+            return 404, {'error': 'not found'}
+        reference = parts[1]
+
+        if method == 'GET' and len(parts) == 2:
+            payment = self.payments.get(reference)
+            if payment is None:
+                if self.auto_confirm is None:
+                    return 404, {'error': 'unknown reference'}
+                payment = self.payments[reference] = ['pending', time.time()]
+            if (payment[0] == 'pending' and self.auto_confirm is not None
+                    and time.time() - payment[1] >= self.auto_confirm):
+                payment[0] = 'confirmed'
+            return 200, {'reference': reference, 'status': payment[0]}
+
+        if method == 'POST' and len(parts) == 3 and parts[2] in ('confirm', 'fail'):
+            self._set_status(reference, 'confirmed' if parts[2] == 'confirm' else 'failed')
+            return 200, {'reference': reference, 'status': self.payments[reference][0]}
+
+        return 404, {'error': 'not found'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fournisseur de paiement local (essais hors ligne)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--auto-confirm", type=float, default=None,
+                        help="confirme une référence N secondes après sa première interrogation")
+    parser.add_argument("--latency", type=float, default=0.0, help="délai de chaque réponse (secondes)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="proportion de réponses 503")
+    args = parser.parse_args()
+
+    stub = StubPaymentProvider(args.host, args.port, args.auto_confirm, args.latency, args.failure_rate)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(stub.start_server())
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
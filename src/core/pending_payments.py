@@ -0,0 +1,187 @@
+"""
+Registre des paiements en attente de confirmation (références QR et USSD)
+"""
+
+import heapq
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, replace
+from typing import Dict, List, Optional, Tuple
+from src.core.logger import setup_logger
+
+
+@dataclass(frozen=True)
+class PendingPayment:
+    """Demande de paiement enregistrée sous sa référence"""
+    reference: str
+    method: str  # "qr" ou "ussd"
+    amount: float
+    created_ts: float
+    expires_ts: float
+    confirmed_ts: Optional[float] = None
+
+    @property
+    def is_confirmed(self) -> bool:
+        return self.confirmed_ts is not None
+
+
+class DuplicateReferenceError(ValueError):
+    """Référence déjà attribuée à une demande de paiement encore valide"""
+
+
+def new_payment_reference() -> str:
+    """Référence courte d'une demande de paiement (8 caractères hexadécimaux)"""
+    return uuid.uuid4().hex[:8].upper()
+
+
+class PendingPaymentRegistry:
+    """Paiements en attente, indexés par référence
+
+    - recherche d'une référence en O(1) (dictionnaire) à l'arrivée d'une confirmation
+    - chaque demande expire après ttl secondes; les expirées sont retirées par
+      ordre d'échéance (tas), la mémoire reste proportionnelle au flux sur ttl
+    - persistance par le moteur de stockage (thread d'écriture compris): après un
+      redémarrage, les demandes encore valides sont retrouvées. Les écritures sont
+      transmises sous le verrou du registre, donc au moteur dans l'ordre des
+      modifications (confirmation du fournisseur puis rattachement par l'écran).
+      Le verrou se prend avant celui du moteur: une transaction qui modifie le
+      registre est ouverte sous locked().
+    - une référence encore valide n'est jamais réattribuée (DuplicateReferenceError)
+    """
+
+    def __init__(self, storage, ttl: float = 900.0):
+        self.logger = setup_logger("pending_payments")
+        self.storage = storage
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._payments: Dict[str, PendingPayment] = {}
+        for payment_data in storage.load_pending_payments():
+            try:
+                payment = PendingPayment(**payment_data)
+            except TypeError as e:
+                self.logger.error(f"Paiement en attente illisible ignoré: {e}")
+                continue
+            self._payments[payment.reference] = payment
+        self._deadlines: List[Tuple[float, str]] = [
+            (payment.expires_ts, reference) for reference, payment in self._payments.items()
+        ]
+        heapq.heapify(self._deadlines)
+        self.evict_expired()
+
+    def __len__(self) -> int:
+        return len(self._payments)
+
+    def _track(self, payment: PendingPayment):
+        """Garde une demande en mémoire (verrou tenu)"""
+        self._payments[payment.reference] = payment
+        heapq.heappush(self._deadlines, (payment.expires_ts, payment.reference))
+
+    @contextmanager
+    def locked(self):
+        """Suspend les autres modifications du registre pendant le bloc"""
+        with self._lock:
+            yield
+
+    def new_reference(self) -> str:
+        """Référence qui n'est attribuée à aucune demande en cours"""
+        with self._lock:
+            while True:
+                reference = new_payment_reference()
+                if reference not in self._payments:
+                    return reference
+
+    def register(self, reference: str, method: str, amount: float,
+                 ttl: Optional[float] = None) -> PendingPayment:
+        """Enregistre une demande de paiement
+
+        Lève DuplicateReferenceError si la référence est déjà attribuée à une
+        demande encore valide (elle n'est jamais remplacée).
+        """
+        now = time.time()
+        payment = PendingPayment(reference, method, amount, now, now + (self.ttl if ttl is None else ttl))
+        with self._lock:
+            self.evict_expired(now)
+            if reference in self._payments:
+                raise DuplicateReferenceError(f"référence de paiement déjà attribuée: {reference}")
+            self._track(payment)
+            try:
+                self.storage.save_pending_payment(asdict(payment))
+            except Exception:
+                del self._payments[reference]
+                raise
+        return payment
+
+    def get(self, reference: str) -> Optional[PendingPayment]:
+        """Demande encore valide de cette référence, ou None"""
+        with self._lock:
+            payment = self._payments.get(reference)
+        if payment is None or payment.expires_ts <= time.time():
+            return None
+        return payment
+
+    def confirm(self, reference: str) -> Tuple[Optional[PendingPayment], bool]:
+        """Marque la demande payée; retourne la demande (None si inconnue ou expirée)
+        et si elle vient d'être confirmée
+
+        L'échéance est repoussée de ttl: le client a le temps de choisir son casier.
+        Une confirmation déjà reçue n'est pas enregistrée une seconde fois.
+        """
+        now = time.time()
+        with self._lock:
+            payment = self._payments.get(reference)
+            if payment is None or payment.expires_ts <= now:
+                return None, False
+            if payment.is_confirmed:
+                return payment, False
+            confirmed = replace(payment, expires_ts=now + self.ttl, confirmed_ts=now)
+            self._track(confirmed)
+            try:
+                self.storage.save_pending_payment(asdict(confirmed))
+            except Exception:
+                self._track(payment)
+                raise
+        return confirmed, True
+
+    def complete(self, reference: str) -> Optional[PendingPayment]:
+        """Retire une demande confirmée et encore valide (rattachée à une session)
+
+        Retourne None, sans rien retirer, si la référence est inconnue, expirée ou
+        pas encore payée.
+        """
+        with self._lock:
+            payment = self._payments.get(reference)
+            if payment is None or not payment.is_confirmed or payment.expires_ts <= time.time():
+                return None
+            del self._payments[reference]
+            try:
+                self.storage.delete_pending_payments([reference])
+            except Exception:
+                # Écriture refusée (transaction SQLite): la demande reste à rattacher
+                self._track(payment)
+                raise
+        return payment
+
+    def restore(self, payment: PendingPayment):
+        """Remet une demande retirée par complete() (transaction annulée)"""
+        with self._lock:
+            self._track(payment)
+            self.storage.save_pending_payment(asdict(payment))
+
+    def evict_expired(self, now: Optional[float] = None) -> int:
+        """Retire les demandes échues, aussi du stockage; retourne leur nombre"""
+        now = time.time() if now is None else now
+        evicted = []
+        with self._lock:
+            while self._deadlines and self._deadlines[0][0] <= now:
+                expires_ts, reference = heapq.heappop(self._deadlines)
+                payment = self._payments.get(reference)
+                # Entrée périmée du tas (demande retirée, remplacée ou repoussée)
+                if payment is None or payment.expires_ts != expires_ts:
+                    continue
+                del self._payments[reference]
+                evicted.append(reference)
+            if evicted:
+                self.storage.delete_pending_payments(evicted)
+        return len(evicted)
@@ -0,0 +1,267 @@
+"""
+Écritures atomiques et validation groupée des fichiers de données
+"""
+
+import json
+import os
+import queue
+import threading
+from typing import Any, Callable, Dict, Optional
+from src.core.logger import setup_logger
+
+
+def _fsync_directory(directory: str):
+    """Rend les renommages durables (sans effet sur les systèmes qui ne le permettent pas)"""
+    try:
+        fd = os.open(directory or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_temp(path: str, content: str, durable: bool) -> str:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+        f.flush()
+        if durable:
+            os.fsync(f.fileno())
+    return tmp_path
+
+
+def atomic_write(path: str, content: str, durable: bool = True):
+    """Écrit un fichier de façon atomique (fichier temporaire puis renommage)
+
+    Après une coupure, le fichier contient soit l'ancienne, soit la nouvelle version.
+    """
+    os.replace(_write_temp(path, content, durable), path)
+    if durable:
+        _fsync_directory(os.path.dirname(path))
+
+
+class GroupCommitWriter:
+    """Regroupe les écritures de fichiers JSON en validations atomiques
+
+    Les écritures reçues pendant `commit_window` secondes sont fusionnées (seule la
+    dernière version de chaque fichier est gardée) puis validées ensemble: tous les
+    fichiers temporaires sont écrits avant le premier renommage, puis une seule
+    synchronisation par répertoire. Si un fichier temporaire ne peut pas être
+    écrit, aucun fichier n'est remplacé: l'erreur est levée par flush() et
+    release(), et les écritures restent en attente pour la validation suivante.
+    flush() valide immédiatement les écritures en attente (arrêt de l'application).
+    """
+
+    def __init__(self, commit_window: float = 0.05, durable: bool = True):
+        self.logger = setup_logger("persistence")
+        self.commit_window = commit_window
+        self.durable = durable
+
+        self._lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+        self._pending: Dict[str, tuple] = {}
+        self._timer: Optional[threading.Timer] = None
+        self._held = 0
+
+    def write(self, path: str, data: Any, indent: Optional[int] = 2):
+        """Programme l'écriture de `data` (déjà copié par l'appelant) dans `path`"""
+        with self._lock:
+            self._pending[path] = (data, indent)
+            if self.commit_window <= 0:
+                immediate = not self._held
+            else:
+                immediate = False
+                if self._timer is None:
+                    self._timer = threading.Timer(self.commit_window, self._on_timer)
+                    self._timer.daemon = True
+                    self._timer.start()
+
+        if immediate:
+            self._flush_logged()
+
+    def hold(self):
+        """Suspend les validations automatiques (début de transaction)"""
+        with self._lock:
+            self._held += 1
+
+    def release(self):
+        """Fin de transaction: valide ensemble toutes les écritures retenues
+
+        Lève l'erreur de validation: la transaction peut alors être annulée.
+        """
+        with self._lock:
+            self._held -= 1
+            held = self._held
+        if not held:
+            self.flush()
+
+    def _on_timer(self):
+        with self._lock:
+            if self._held:
+                # La fin de la transaction validera les écritures
+                self._timer = None
+                return
+        self._flush_logged()
+
+    def _flush_logged(self):
+        """Validation hors transaction: l'erreur est journalisée, les écritures restent en attente"""
+        try:
+            self.flush()
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la validation des écritures: {e}")
+
+    def has_pending(self) -> bool:
+        with self._lock:
+            return bool(self._pending)
+
+    def flush(self):
+        """Barrière: valide toutes les écritures en attente avant de rendre la main
+
+        Lève l'erreur de validation; aucun fichier n'a alors été remplacé.
+        """
+        with self._commit_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not pending:
+                return
+            try:
+                self._commit(pending)
+            except Exception:
+                with self._lock:
+                    # Une version plus récente écrite entre-temps reste prioritaire
+                    for path, entry in pending.items():
+                        self._pending.setdefault(path, entry)
+                raise
+
+    def _commit(self, pending: Dict[str, tuple]):
+        """Écrit tous les fichiers temporaires, puis les renomme
+
+        Chaque fichier temporaire est synchronisé avant son renommage (il n'existe pas
+        de synchronisation de plusieurs fichiers en un appel), les répertoires une
+        seule fois par validation.
+        """
+        temp_files = []
+        try:
+            for path, (data, indent) in pending.items():
+                content = json.dumps(data, indent=indent, ensure_ascii=False)
+                temp_files.append((_write_temp(path, content, self.durable), path))
+        except Exception as e:
+            self.logger.error(f"Validation annulée, aucun fichier remplacé: {e}")
+            for path in pending:
+                try:
+                    os.remove(path + ".tmp")
+                except OSError:
+                    pass
+            raise
+
+        directories = set()
+        try:
+            for tmp_path, path in temp_files:
+                os.replace(tmp_path, path)
+                directories.add(os.path.dirname(path))
+        finally:
+            if self.durable:
+                for directory in directories:
+                    _fsync_directory(directory)
+
+    def close(self):
+        self._flush_logged()
+
+
+class PersistenceWorker:
+    """Thread d'écriture alimenté par une file bornée
+
+    Les tâches soumises (écritures portant sur des copies des données) sont
+    exécutées dans l'ordre par un thread dédié. Tout ce qui est disponible dans la
+    file est traité d'un bloc puis validé par un seul appel à `commit`; les
+    callbacks de durabilité du bloc sont appelés ensuite, depuis ce thread.
+    Une file pleine bloque l'appelant jusqu'à ce que le thread rattrape son retard.
+    """
+
+    _TASK, _DURABLE, _STOP = range(3)
+
+    def __init__(self, commit: Callable[[], None], max_pending: int = 256):
+        self.logger = setup_logger("persistence")
+        self.commit = commit
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="persistence", daemon=True)
+        self._thread.start()
+
+    def is_running(self) -> bool:
+        return self._thread.is_alive()
+
+    def is_worker_thread(self) -> bool:
+        """Indique si l'appelant est le thread d'écriture (callbacks de durabilité)"""
+        return threading.current_thread() is self._thread
+
+    def submit(self, task: Callable[[], None]):
+        """Programme une écriture"""
+        if not self.is_running():
+            task()
+            self.commit()
+            return
+        self._queue.put((self._TASK, task))
+
+    def when_durable(self, callback: Callable[[], None]):
+        """Appelle callback une fois validées toutes les écritures déjà soumises"""
+        if not self.is_running():
+            callback()
+            return
+        self._queue.put((self._DURABLE, callback))
+
+    def barrier(self):
+        """Attend que toutes les écritures déjà soumises soient validées"""
+        if self.is_worker_thread():
+            return
+        done = threading.Event()
+        self.when_durable(done.set)
+        done.wait()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            callbacks = []
+            stop = False
+            for kind, payload in batch:
+                if kind == self._TASK:
+                    try:
+                        payload()
+                    except Exception as e:
+                        self.logger.error(f"Erreur lors d'une écriture en arrière-plan: {e}")
+                elif kind == self._DURABLE:
+                    callbacks.append(payload)
+                else:
+                    stop = True
+
+            try:
+                self.commit()
+            except Exception as e:
+                self.logger.error(f"Erreur lors de la validation des écritures: {e}")
+
+            for callback in callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    self.logger.error(f"Erreur dans un callback de durabilité: {e}")
+
+            if stop:
+                return
+
+    def close(self):
+        """Vide la file puis arrête le thread"""
+        if self.is_running():
+            self._queue.put((self._STOP, None))
+            self._thread.join()
\ No newline at end of file
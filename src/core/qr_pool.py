@@ -0,0 +1,112 @@
+"""
+Réserve de demandes de paiement QR préparées en arrière-plan
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, NamedTuple
+from src.core.logger import setup_logger
+
+
+class QrPayment(NamedTuple):
+    """Demande de paiement prête à afficher"""
+    reference: str
+    amount: float
+    url: str
+    image: Any          # rendu du QR code (fourni par l'interface)
+    expires_at: float   # time.monotonic() au-delà duquel elle n'est plus affichée
+
+
+class QrPaymentPool:
+    """Quelques demandes de paiement QR prêtes (référence, URL, image)
+
+    Un thread dédié garde la réserve pleine: chaque demande est préparée à
+    l'avance (référence, URL du PaymentManager, rendu par `render`) et n'est
+    gardée que ttl secondes; une demande périmée est retirée puis remplacée, et
+    n'est jamais servie. take() ne fait que retirer la plus ancienne demande
+    valide; la réserve vide (démarrage, tirages rapprochés), la demande est
+    préparée sur place.
+
+    Sans tirage depuis ttl secondes, la réserve est au repos: les demandes
+    périmées ne sont plus remplacées et le thread attend le prochain tirage
+    (préparé sur place) pour remplir de nouveau la réserve.
+    """
+
+    def __init__(self, payment_manager, render: Callable[[str], Any], amount: float,
+                 capacity: int = 3, ttl: float = 120.0):
+        self.logger = setup_logger("qr_pool")
+        self.payment_manager = payment_manager
+        self.render = render
+        self.amount = amount
+        self.capacity = max(1, capacity)
+        self.ttl = ttl
+
+        self._ready = deque()
+        self._last_take = time.monotonic()
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="qr-pool", daemon=True)
+        self._thread.start()
+
+    def prepare(self) -> QrPayment:
+        """Prépare une demande de paiement (référence unique, URL, image)"""
+        reference = self.payment_manager.new_payment_reference()
+        url = self.payment_manager.generate_qr_payment_url(self.amount, reference)
+        image = self.render(url)
+        return QrPayment(reference, self.amount, url, image, time.monotonic() + self.ttl)
+
+    def take(self) -> QrPayment:
+        """Retire une demande prête de la réserve (préparée sur place si elle est vide)"""
+        with self._condition:
+            self._evict_expired()
+            payment = self._ready.popleft() if self._ready else None
+            self._last_take = time.monotonic()
+            self._condition.notify()
+        return payment if payment is not None else self.prepare()
+
+    def __len__(self) -> int:
+        with self._condition:
+            self._evict_expired()
+            return len(self._ready)
+
+    def _evict_expired(self):
+        # Les demandes sont rangées par ancienneté: les périmées sont en tête
+        now = time.monotonic()
+        while self._ready and self._ready[0].expires_at <= now:
+            self._ready.popleft()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._stopped:
+                        return
+                    self._evict_expired()
+                    idle = time.monotonic() - self._last_take >= self.ttl
+                    if len(self._ready) < self.capacity and not idle:
+                        break
+                    # Réveil à la prochaine péremption; au repos et vide, au prochain tirage
+                    if self._ready:
+                        self._condition.wait(max(0.0, self._ready[0].expires_at - time.monotonic()))
+                    else:
+                        self._condition.wait()
+
+            try:
+                payment = self.prepare()
+            except Exception as e:
+                self.logger.error(f"Erreur lors de la préparation d'un paiement QR: {e}")
+                with self._condition:
+                    self._condition.wait(5.0)
+                continue
+
+            with self._condition:
+                self._ready.append(payment)
+
+    def close(self):
+        """Arrête le thread de préparation"""
+        with self._condition:
+            self._stopped = True
+            self._ready.clear()
+            self._condition.notify()
+        self._thread.join()
\ No newline at end of file
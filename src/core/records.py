@@ -0,0 +1,221 @@
+"""
+Enregistrements compacts des sessions de casier et des codes prépayés
+"""
+
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional, Union
+
+Timestamp = Union[datetime, int, float, str, None]
+
+
+# Les codes d'un même lot partagent leurs dates: les conversions texte <-> epoch
+# sont mémorisées pour éviter de refaire le calcul du fuseau horaire local
+@lru_cache(maxsize=4096)
+def _epoch_from_iso(value: str) -> int:
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+@lru_cache(maxsize=4096)
+def _iso_from_epoch(timestamp: int) -> str:
+    return datetime.fromtimestamp(timestamp).isoformat()
+
+
+def to_epoch(value: Timestamp) -> Optional[int]:
+    """Convertit une date (datetime, ISO 8601 ou secondes epoch) en secondes epoch"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    if isinstance(value, str):
+        return _epoch_from_iso(value)
+    return int(value)
+
+
+def from_epoch(timestamp: Optional[int]) -> Optional[datetime]:
+    """Convertit des secondes epoch en datetime local"""
+    return None if timestamp is None else datetime.fromtimestamp(timestamp)
+
+
+def iso_from_epoch(timestamp: Optional[int]) -> Optional[str]:
+    """Format ISO 8601 des fichiers de données"""
+    return None if timestamp is None else _iso_from_epoch(timestamp)
+
+
+class LockerSession:
+    """Représente une session d'utilisation d'un casier
+
+    Les dates sont conservées en secondes epoch (start_ts, end_ts, overtime_ts);
+    start_time, end_time et overtime_since restent disponibles sous forme de datetime.
+    overtime_ts est le début du dépassement de la durée de charge (None sans dépassement).
+    """
+
+    __slots__ = ('locker_id', 'user_code', 'start_ts', 'end_ts', 'payment_method',
+                 'amount_paid', 'is_active', 'overtime_fee', 'overtime_ts')
+
+    def __init__(self, locker_id: int, user_code: str, start_time: Timestamp,
+                 end_time: Timestamp = None, payment_method: str = "",
+                 amount_paid: float = 0.0, is_active: bool = True, overtime_fee: float = 0.0,
+                 overtime_since: Timestamp = None):
+        self.locker_id = locker_id
+        self.user_code = user_code
+        self.start_ts = to_epoch(start_time)
+        self.end_ts = to_epoch(end_time)
+        self.payment_method = payment_method
+        self.amount_paid = amount_paid
+        self.is_active = is_active
+        self.overtime_fee = overtime_fee
+        self.overtime_ts = to_epoch(overtime_since)
+
+    @property
+    def start_time(self) -> datetime:
+        return from_epoch(self.start_ts)
+
+    @start_time.setter
+    def start_time(self, value: Timestamp):
+        self.start_ts = to_epoch(value)
+
+    @property
+    def end_time(self) -> Optional[datetime]:
+        return from_epoch(self.end_ts)
+
+    @end_time.setter
+    def end_time(self, value: Timestamp):
+        self.end_ts = to_epoch(value)
+
+    @property
+    def overtime_since(self) -> Optional[datetime]:
+        return from_epoch(self.overtime_ts)
+
+    @overtime_since.setter
+    def overtime_since(self, value: Timestamp):
+        self.overtime_ts = to_epoch(value)
+
+    def to_dict(self) -> dict:
+        """Dictionnaire au format des fichiers de données (dates ISO 8601)"""
+        return {
+            'locker_id': self.locker_id,
+            'user_code': self.user_code,
+            'start_time': iso_from_epoch(self.start_ts),
+            'end_time': iso_from_epoch(self.end_ts),
+            'payment_method': self.payment_method,
+            'amount_paid': self.amount_paid,
+            'is_active': self.is_active,
+            'overtime_fee': self.overtime_fee,
+            'overtime_since': iso_from_epoch(self.overtime_ts)
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'LockerSession':
+        """Reconstruit une session (dates ISO 8601 ou secondes epoch)"""
+        session = cls.__new__(cls)
+        session.locker_id = data['locker_id']
+        session.user_code = data['user_code']
+        session.start_ts = to_epoch(data['start_time'])
+        session.end_ts = to_epoch(data.get('end_time'))
+        session.payment_method = data.get('payment_method', '')
+        session.amount_paid = data.get('amount_paid', 0.0)
+        session.is_active = data.get('is_active', True)
+        session.overtime_fee = data.get('overtime_fee', 0.0)
+        session.overtime_ts = to_epoch(data.get('overtime_since'))
+        return session
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, LockerSession):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return (f"LockerSession(locker_id={self.locker_id}, user_code={self.user_code!r}, "
+                f"start_time={self.start_time!r}, is_active={self.is_active})")
+
+
+class PrepaidCode:
+    """Représente un code prépayé
+
+    Les dates sont conservées en secondes epoch (created_ts, expiry_ts, used_ts);
+    created_date, expiry_date et used_date restent disponibles sous forme de datetime.
+    """
+
+    __slots__ = ('code', 'value', 'created_ts', 'expiry_ts', 'is_used', 'used_ts')
+
+    def __init__(self, code: str, value: float, created_date: Timestamp, expiry_date: Timestamp,
+                 is_used: bool = False, used_date: Timestamp = None):
+        self.code = code
+        self.value = value
+        self.created_ts = to_epoch(created_date)
+        self.expiry_ts = to_epoch(expiry_date)
+        self.is_used = is_used
+        self.used_ts = to_epoch(used_date)
+
+    @classmethod
+    def from_epoch(cls, code: str, value: float, created_ts: int, expiry_ts: int,
+                   is_used: bool = False, used_ts: Optional[int] = None) -> 'PrepaidCode':
+        """Construction directe depuis des secondes epoch (sans conversion)"""
+        prepaid_code = cls.__new__(cls)
+        prepaid_code.code = code
+        prepaid_code.value = value
+        prepaid_code.created_ts = created_ts
+        prepaid_code.expiry_ts = expiry_ts
+        prepaid_code.is_used = is_used
+        prepaid_code.used_ts = used_ts
+        return prepaid_code
+
+    @property
+    def created_date(self) -> datetime:
+        return from_epoch(self.created_ts)
+
+    @created_date.setter
+    def created_date(self, value: Timestamp):
+        self.created_ts = to_epoch(value)
+
+    @property
+    def expiry_date(self) -> datetime:
+        return from_epoch(self.expiry_ts)
+
+    @expiry_date.setter
+    def expiry_date(self, value: Timestamp):
+        self.expiry_ts = to_epoch(value)
+
+    @property
+    def used_date(self) -> Optional[datetime]:
+        return from_epoch(self.used_ts)
+
+    @used_date.setter
+    def used_date(self, value: Timestamp):
+        self.used_ts = to_epoch(value)
+
+    def is_expired(self, now_ts: float) -> bool:
+        return now_ts > self.expiry_ts
+
+    def to_dict(self) -> dict:
+        """Dictionnaire au format des fichiers de données (dates ISO 8601)"""
+        return {
+            'code': self.code,
+            'value': self.value,
+            'created_date': iso_from_epoch(self.created_ts),
+            'expiry_date': iso_from_epoch(self.expiry_ts),
+            'is_used': self.is_used,
+            'used_date': iso_from_epoch(self.used_ts)
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'PrepaidCode':
+        """Reconstruit un code (dates ISO 8601 ou secondes epoch)"""
+        return cls.from_epoch(
+            data['code'],
+            data['value'],
+            to_epoch(data['created_date']),
+            to_epoch(data['expiry_date']),
+            data.get('is_used', False),
+            to_epoch(data.get('used_date'))
+        )
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, PrepaidCode):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return (f"PrepaidCode(code={self.code!r}, value={self.value}, "
+                f"expiry_date={self.expiry_date!r}, is_used={self.is_used})")
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""
+Ordonnanceur d'échéances sur horloge monotone
+"""
+
+import heapq
+import itertools
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class DeadlineScheduler:
+    """File de priorité (tas binaire) d'échéances identifiées par une clé
+
+    Replanifier ou annuler une clé invalide simplement l'ancienne entrée du tas:
+    elle est ignorée lorsqu'elle remonte. Chaque passage ne traite ainsi que les
+    échéances réellement atteintes, quel que soit le nombre d'échéances en attente.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._entries: Dict[Hashable, Tuple[float, int, Callable[[], None]]] = {}
+        self._counter = itertools.count()
+        self._wakeup_callback: Optional[Callable[[], None]] = None
+
+    def set_wakeup_callback(self, callback: Optional[Callable[[], None]]):
+        """Callback appelé quand la prochaine échéance change (pour réarmer un timer)"""
+        self._wakeup_callback = callback
+
+    def _notify(self, previous_deadline: Optional[float]):
+        if self._wakeup_callback and self.next_deadline() != previous_deadline:
+            self._wakeup_callback()
+
+    def schedule(self, key: Hashable, deadline: float, callback: Callable[[], None]):
+        """Planifie (ou replanifie) une échéance absolue sur l'horloge monotone"""
+        previous_deadline = self.next_deadline()
+        counter = next(self._counter)
+        self._entries[key] = (deadline, counter, callback)
+        heapq.heappush(self._heap, (deadline, counter, key))
+        self._compact_if_needed()
+        self._notify(previous_deadline)
+
+    def schedule_in(self, key: Hashable, delay: float, callback: Callable[[], None]):
+        """Planifie une échéance dans `delay` secondes"""
+        self.schedule(key, self.clock() + delay, callback)
+
+    def cancel(self, key: Hashable) -> bool:
+        """Annule une échéance, retourne False si elle n'existait pas"""
+        previous_deadline = self.next_deadline()
+        if self._entries.pop(key, None) is None:
+            return False
+        self._notify(previous_deadline)
+        return True
+
+    def deadline_of(self, key: Hashable) -> Optional[float]:
+        entry = self._entries.get(key)
+        return entry[0] if entry else None
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _is_current(self, counter: int, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] == counter
+
+    def _discard_stale(self):
+        while self._heap and not self._is_current(self._heap[0][1], self._heap[0][2]):
+            heapq.heappop(self._heap)
+
+    def _compact_if_needed(self):
+        """Reconstruit le tas lorsque les entrées invalidées y sont majoritaires"""
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._entries):
+            self._heap = [(deadline, counter, key)
+                          for key, (deadline, counter, _) in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def next_deadline(self) -> Optional[float]:
+        """Prochaine échéance (horloge monotone), ou None"""
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def time_until_next(self) -> Optional[float]:
+        """Secondes avant la prochaine échéance (0 si déjà atteinte), ou None"""
+        deadline = self.next_deadline()
+        if deadline is None:
+            return None
+        return max(0.0, deadline - self.clock())
+
+    def run_due(self) -> int:
+        """Déclenche les échéances atteintes, retourne leur nombre"""
+        now = self.clock()
+        fired = 0
+        previous_wakeup, self._wakeup_callback = self._wakeup_callback, None
+        try:
+            while True:
+                self._discard_stale()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                _, _, key = heapq.heappop(self._heap)
+                _, _, callback = self._entries.pop(key)
+                callback()
+                fired += 1
+        finally:
+            self._wakeup_callback = previous_wakeup
+        if fired and self._wakeup_callback:
+            self._wakeup_callback()
+        return fired
@@ -0,0 +1,41 @@
+"""
+Mesure du démarrage de l'application, phase par phase, jusqu'à la première image
+"""
+
+import time
+from typing import List, Optional, Tuple
+
+
+class StartupTimer:
+    """Durées des phases du démarrage
+
+    Chaque appel à mark() clôt la phase en cours: sa durée est le temps écoulé
+    depuis la marque précédente (ou depuis l'origine, prise le plus tôt possible
+    dans main.py, avant les imports de Qt et de l'application).
+    """
+
+    def __init__(self, origin: Optional[float] = None):
+        self.origin = time.perf_counter() if origin is None else origin
+        self._last = self.origin
+        self.phases: List[Tuple[str, float]] = []
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    @property
+    def elapsed(self) -> float:
+        """Temps écoulé depuis l'origine jusqu'à la dernière marque (secondes)"""
+        return self._last - self.origin
+
+    def report(self) -> List[str]:
+        """Lignes du rapport: durée de chaque phase et temps cumulé"""
+        lines = []
+        cumulative = 0.0
+        width = max((len(phase) for phase, _ in self.phases), default=0)
+        for phase, duration in self.phases:
+            cumulative += duration
+            lines.append(f"{phase:<{width}}  {duration * 1000:8.1f} ms  (cumul {cumulative * 1000:8.1f} ms)")
+        lines.append(f"{'Première image affichée après':<{width}}  {self.elapsed * 1000:8.1f} ms")
+        return lines
\ No newline at end of file
@@ -0,0 +1,1010 @@
+"""
+Moteurs de stockage des données de la borne (casiers, sessions, codes prépayés)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+from src.core.history import SessionHistory
+from src.core.logger import setup_logger
+from src.core.persistence import GroupCommitWriter, PersistenceWorker
+
+# Absence d'entrée dans le journal d'annulation d'une transaction
+_MISSING = object()
+
+
+class StorageBackend:
+    """Interface commune des moteurs de stockage
+
+    Les enregistrements échangés avec les gestionnaires sont des dictionnaires
+    au format des fichiers JSON historiques (dates au format ISO). Les paiements
+    en attente gardent leurs dates en secondes epoch.
+    """
+
+    def load_lockers(self) -> Dict[str, bool]:
+        """Charge l'état des casiers"""
+        raise NotImplementedError
+
+    def save_locker(self, locker_id: int, is_occupied: bool):
+        """Enregistre l'état d'un casier"""
+        raise NotImplementedError
+
+    def load_sessions(self) -> List[dict]:
+        """Charge les sessions enregistrées"""
+        raise NotImplementedError
+
+    def save_session(self, session_data: dict):
+        """Enregistre (ou remplace) la session d'un casier"""
+        raise NotImplementedError
+
+    def delete_session(self, locker_id: int):
+        """Supprime la session d'un casier"""
+        raise NotImplementedError
+
+    def load_prepaid_codes(self) -> List[dict]:
+        """Charge les codes prépayés"""
+        raise NotImplementedError
+
+    def save_prepaid_codes(self, codes_data: List[dict]):
+        """Enregistre (ou remplace) un lot de codes prépayés"""
+        raise NotImplementedError
+
+    def delete_prepaid_codes(self, codes: Iterable[str]):
+        """Supprime des codes prépayés"""
+        raise NotImplementedError
+
+    def get_prepaid_code(self, code: str) -> Optional[dict]:
+        """Lit un seul code prépayé"""
+        raise NotImplementedError
+
+    def prepaid_code_keys(self) -> List[str]:
+        """Liste les codes prépayés enregistrés (sans leurs données)"""
+        raise NotImplementedError
+
+    def count_prepaid_codes(self) -> int:
+        """Nombre de codes prépayés enregistrés"""
+        raise NotImplementedError
+
+    def delete_expired_prepaid_codes(self, now: datetime) -> List[str]:
+        """Supprime les codes expirés et retourne leur liste"""
+        raise NotImplementedError
+
+    def prepaid_code_statistics(self, now: datetime) -> dict:
+        """Statistiques des codes (total, utilisés, expirés, actifs, valeur active)"""
+        raise NotImplementedError
+
+    def load_pending_payments(self) -> List[dict]:
+        """Charge les paiements QR/USSD en attente de confirmation"""
+        raise NotImplementedError
+
+    def save_pending_payment(self, payment_data: dict):
+        """Enregistre (ou remplace) un paiement en attente"""
+        raise NotImplementedError
+
+    def delete_pending_payments(self, references: Iterable[str]):
+        """Supprime des paiements en attente (rattachés à une session ou échus)"""
+        raise NotImplementedError
+
+    def append_session_history(self, session_data: dict):
+        """Ajoute une session terminée à l'historique"""
+        raise NotImplementedError
+
+    def query_session_history(self, locker_id: Optional[int] = None,
+                              start: Optional[datetime] = None, end: Optional[datetime] = None,
+                              payment_method: Optional[str] = None) -> List[dict]:
+        """Sessions terminées sur une période (dates de fin incluses), par date de fin croissante"""
+        raise NotImplementedError
+
+    # Une transaction est validée d'un seul bloc sur le support: après une coupure,
+    # elle est entièrement présente ou entièrement absente
+    atomic_transactions = False
+
+    @contextmanager
+    def transaction(self, wait: bool = False):
+        """Regroupe les écritures du bloc: validées ensemble, ou annulées si le bloc échoue
+
+        Avec wait, la validation est faite avant de rendre la main et son échec est
+        levé à l'appelant, qui peut alors annuler ses modifications en mémoire.
+        """
+        yield
+
+    def flush(self):
+        """Barrière: rend durables toutes les écritures en attente"""
+        pass
+
+    def when_durable(self, callback: Callable[[], None]):
+        """Appelle callback une fois durables toutes les écritures déjà demandées
+
+        Avec les écritures en arrière-plan, le callback est appelé depuis le thread
+        d'écriture.
+        """
+        self.flush()
+        callback()
+
+    def close(self):
+        """Libère les ressources du moteur"""
+        pass
+
+
+class JsonStorage(StorageBackend):
+    """Stockage historique dans des fichiers JSON sous data/
+
+    Chaque modification réécrit le fichier concerné en entier, de façon atomique.
+    Les modifications rapprochées (casier puis session) sont validées ensemble.
+    Les paiements en attente peuvent être confirmés depuis le thread du client
+    du fournisseur: ces écritures ne font jamais partie de la transaction ouverte
+    par un autre thread.
+    """
+
+    def __init__(self, data_dir: str = "data", commit_window: float = 0.05):
+        self.logger = setup_logger("storage")
+        self.lockers_file = os.path.join(data_dir, "lockers.json")
+        self.sessions_file = os.path.join(data_dir, "sessions.json")
+        self.codes_file = os.path.join(data_dir, "prepaid_codes.json")
+        self.pending_file = os.path.join(data_dir, "pending_payments.json")
+        self.history = SessionHistory(os.path.join(data_dir, "session_history.jsonl"))
+        self.writer = GroupCommitWriter(commit_window)
+
+        os.makedirs(data_dir, exist_ok=True)
+
+        # Copies en mémoire des fichiers, réécrites à chaque modification
+        # (None tant que le fichier n'a pas été lu)
+        self._lockers = None
+        self._sessions = None
+        self._codes = None
+        self._pending = None
+
+        # Transaction en cours (une seule à la fois, ouverte par _transaction_thread):
+        # valeurs précédentes des entrées modifiées et sessions à ajouter à
+        # l'historique une fois la transaction validée
+        self._transaction_lock = threading.RLock()
+        self._transaction_thread: Optional[int] = None
+        self._undo: Optional[List[tuple]] = None
+        self._pending_history: List[dict] = []
+
+    def _read_json(self, path: str, default):
+        """Lit un fichier JSON, retourne la valeur par défaut en cas d'erreur"""
+        if not os.path.exists(path):
+            return default
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la lecture de {path}: {e}")
+            return default
+
+    def _write_json(self, path: str, data, indent: int = 2):
+        """Programme la réécriture atomique d'un fichier JSON (data doit être une copie)"""
+        self.writer.write(path, data, indent)
+
+    def _in_transaction(self) -> bool:
+        """Une transaction est ouverte par le thread appelant"""
+        return self._undo is not None and self._transaction_thread == threading.get_ident()
+
+    def _remember(self, mirror: dict, key):
+        """Note la valeur d'une entrée avant modification (transaction en cours)"""
+        if self._in_transaction():
+            self._undo.append((mirror, key, mirror.get(key, _MISSING)))
+
+    def _rewrite_mirror(self, mirror: dict):
+        """Réécrit le fichier correspondant à une copie en mémoire"""
+        if mirror is self._lockers:
+            self._write_json(self.lockers_file, dict(self._lockers))
+        elif mirror is self._sessions:
+            self._write_json(self.sessions_file, list(self._sessions.values()))
+        elif mirror is self._codes:
+            self._write_json(self.codes_file, list(self._codes.values()))
+        elif mirror is self._pending:
+            self._write_json(self.pending_file, list(self._pending.values()))
+
+    @contextmanager
+    def transaction(self, wait: bool = False):
+        # Un fichier par table, renommés un par un: les écritures sont validées
+        # ensemble mais pas de façon atomique (atomic_transactions reste False).
+        # Une erreur de validation est levée à l'appelant après annulation.
+        with self._transaction_lock:
+            if self._in_transaction():
+                yield
+                return
+
+            undo = self._undo = []
+            self._transaction_thread = threading.get_ident()
+            self._pending_history = []
+            self.writer.hold()
+            held = True
+            try:
+                yield
+                self._undo = None
+                held = False
+                self.writer.release()
+                self._commit_transaction()
+            except BaseException:
+                self._undo = None
+                self._pending_history = []
+                self._rollback(undo)
+                if held:
+                    try:
+                        self.writer.release()
+                    except Exception as e:
+                        self.logger.error(f"Erreur lors de la réécriture après annulation: {e}")
+                raise
+
+    def _rollback(self, undo: List[tuple]):
+        """Restaure les entrées modifiées puis réécrit les fichiers concernés"""
+        touched = []
+        for mirror, key, previous in reversed(undo):
+            if previous is _MISSING:
+                mirror.pop(key, None)
+            else:
+                mirror[key] = previous
+            if not any(mirror is seen for seen in touched):
+                touched.append(mirror)
+        for mirror in touched:
+            self._rewrite_mirror(mirror)
+
+    def _commit_transaction(self):
+        """Applique les effets différés d'une transaction validée"""
+        pending_history, self._pending_history = self._pending_history, []
+        for session_data in pending_history:
+            self.history.append(session_data)
+
+    def load_lockers(self) -> Dict[str, bool]:
+        if self._lockers is None:
+            self._lockers = self._read_json(self.lockers_file, {})
+        return dict(self._lockers)
+
+    def save_locker(self, locker_id: int, is_occupied: bool):
+        if self._lockers is None:
+            self.load_lockers()
+        self._remember(self._lockers, str(locker_id))
+        self._lockers[str(locker_id)] = is_occupied
+        self._write_json(self.lockers_file, dict(self._lockers))
+
+    def load_sessions(self) -> List[dict]:
+        if self._sessions is None:
+            sessions_data = self._read_json(self.sessions_file, [])
+            self._sessions = {data['locker_id']: data for data in sessions_data}
+        return list(self._sessions.values())
+
+    def save_session(self, session_data: dict):
+        if self._sessions is None:
+            self.load_sessions()
+        self._remember(self._sessions, session_data['locker_id'])
+        self._sessions[session_data['locker_id']] = session_data
+        self._write_json(self.sessions_file, list(self._sessions.values()))
+
+    def delete_session(self, locker_id: int):
+        if self._sessions is None:
+            self.load_sessions()
+        self._remember(self._sessions, locker_id)
+        if self._sessions.pop(locker_id, None) is not None:
+            self._write_json(self.sessions_file, list(self._sessions.values()))
+
+    def load_prepaid_codes(self) -> List[dict]:
+        # Une fois chargée, la copie en mémoire fait foi: le fichier peut avoir des
+        # écritures en attente de validation (parcours complets du magasin paresseux)
+        if self._codes is None:
+            codes_data = self._read_json(self.codes_file, [])
+            self._codes = {data['code']: data for data in codes_data}
+        return list(self._codes.values())
+
+    def _loaded_codes(self) -> Dict[str, dict]:
+        if self._codes is None:
+            self.load_prepaid_codes()
+        return self._codes
+
+    def save_prepaid_codes(self, codes_data: List[dict]):
+        codes = self._loaded_codes()
+        for code_data in codes_data:
+            self._remember(codes, code_data['code'])
+            codes[code_data['code']] = code_data
+        self._write_json(self.codes_file, list(codes.values()))
+
+    def delete_prepaid_codes(self, codes: Iterable[str]):
+        loaded = self._loaded_codes()
+        removed = []
+        for code in codes:
+            self._remember(loaded, code)
+            if loaded.pop(code, None) is not None:
+                removed.append(code)
+        if removed:
+            self._write_json(self.codes_file, list(loaded.values()))
+
+    def get_prepaid_code(self, code: str) -> Optional[dict]:
+        return self._loaded_codes().get(code)
+
+    def prepaid_code_keys(self) -> List[str]:
+        return list(self._loaded_codes())
+
+    def count_prepaid_codes(self) -> int:
+        return len(self._loaded_codes())
+
+    def delete_expired_prepaid_codes(self, now: datetime) -> List[str]:
+        expired = [code for code, data in self._loaded_codes().items()
+                   if datetime.fromisoformat(data['expiry_date']) < now]
+        self.delete_prepaid_codes(expired)
+        return expired
+
+    def prepaid_code_statistics(self, now: datetime) -> dict:
+        stats = {'total': 0, 'used': 0, 'expired': 0, 'active': 0, 'active_value': 0.0}
+        for data in self._loaded_codes().values():
+            stats['total'] += 1
+            if data.get('is_used', False):
+                stats['used'] += 1
+            elif datetime.fromisoformat(data['expiry_date']) < now:
+                stats['expired'] += 1
+            else:
+                stats['active'] += 1
+                stats['active_value'] += data['value']
+        stats['active_value'] = round(stats['active_value'], 2)
+        return stats
+
+    def load_pending_payments(self) -> List[dict]:
+        return list(self._loaded_pending().values())
+
+    def _loaded_pending(self) -> Dict[str, dict]:
+        if self._pending is None:
+            pending_data = self._read_json(self.pending_file, [])
+            self._pending = {data['reference']: data for data in pending_data}
+        return self._pending
+
+    def save_pending_payment(self, payment_data: dict):
+        pending = self._loaded_pending()
+        self._remember(pending, payment_data['reference'])
+        pending[payment_data['reference']] = payment_data
+        self._write_json(self.pending_file, list(pending.values()))
+
+    def delete_pending_payments(self, references: Iterable[str]):
+        pending = self._loaded_pending()
+        removed = []
+        for reference in references:
+            self._remember(pending, reference)
+            if pending.pop(reference, None) is not None:
+                removed.append(reference)
+        if removed:
+            self._write_json(self.pending_file, list(pending.values()))
+
+    def append_session_history(self, session_data: dict):
+        if self._in_transaction():
+            self._pending_history.append(session_data)
+            return
+        self.history.append(session_data)
+
+    def query_session_history(self, locker_id: Optional[int] = None,
+                              start: Optional[datetime] = None, end: Optional[datetime] = None,
+                              payment_method: Optional[str] = None) -> List[dict]:
+        return self.history.query(locker_id, start, end, payment_method)
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+        self.history.close()
+
+
+def _to_timestamp(value: Optional[str]) -> Optional[float]:
+    """Convertit une date ISO en timestamp"""
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+def _to_isoformat(value: Optional[float]) -> Optional[str]:
+    """Convertit un timestamp en date ISO"""
+    return datetime.fromtimestamp(value).isoformat() if value is not None else None
+
+
+class SqliteStorage(StorageBackend):
+    """Stockage SQLite en mode WAL avec mises à jour ligne par ligne"""
+
+    atomic_transactions = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS lockers (
+            locker_id INTEGER PRIMARY KEY,
+            is_occupied INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS sessions (
+            locker_id INTEGER PRIMARY KEY,
+            user_code TEXT NOT NULL,
+            start_time REAL NOT NULL,
+            end_time REAL,
+            payment_method TEXT NOT NULL DEFAULT '',
+            amount_paid REAL NOT NULL DEFAULT 0,
+            is_active INTEGER NOT NULL DEFAULT 1,
+            overtime_since REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_sessions_start ON sessions(start_time);
+        CREATE TABLE IF NOT EXISTS prepaid_codes (
+            code TEXT PRIMARY KEY,
+            value REAL NOT NULL,
+            created_date REAL NOT NULL,
+            expiry_date REAL NOT NULL,
+            is_used INTEGER NOT NULL DEFAULT 0,
+            used_date REAL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_codes_expiry ON prepaid_codes(expiry_date);
+        CREATE INDEX IF NOT EXISTS idx_codes_used ON prepaid_codes(is_used, expiry_date);
+        CREATE TABLE IF NOT EXISTS session_history (
+            id INTEGER PRIMARY KEY,
+            locker_id INTEGER NOT NULL,
+            start_time REAL NOT NULL,
+            end_time REAL NOT NULL,
+            payment_method TEXT NOT NULL DEFAULT '',
+            amount_paid REAL NOT NULL DEFAULT 0,
+            overtime_fee REAL NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_history_end ON session_history(end_time);
+        CREATE INDEX IF NOT EXISTS idx_history_locker ON session_history(locker_id, end_time);
+        CREATE INDEX IF NOT EXISTS idx_history_payment ON session_history(payment_method, end_time);
+        CREATE TABLE IF NOT EXISTS pending_payments (
+            reference TEXT PRIMARY KEY,
+            method TEXT NOT NULL,
+            amount REAL NOT NULL,
+            created_ts REAL NOT NULL,
+            expires_ts REAL NOT NULL,
+            confirmed_ts REAL
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, db_path: str = "data/borne.db", data_dir: str = "data"):
+        self.logger = setup_logger("storage")
+        self.db_path = db_path
+        self.data_dir = data_dir
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._in_transaction = False
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._upgrade_schema()
+        self._conn.commit()
+
+        migrate_json_to_sqlite(self, data_dir)
+
+    def _upgrade_schema(self):
+        """Ajoute les colonnes apparues depuis la création de la base"""
+        columns = {name for _, name, *_ in self._conn.execute("PRAGMA table_info(sessions)")}
+        if 'overtime_since' not in columns:
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN overtime_since REAL")
+
+    def _execute(self, sql: str, params=()):
+        """Exécute une requête d'écriture dans sa propre transaction"""
+        with self._lock:
+            if self._in_transaction:
+                # Les erreurs remontent pour annuler toute la transaction
+                self._conn.execute(sql, params)
+                return
+            try:
+                with self._conn:
+                    self._conn.execute(sql, params)
+            except sqlite3.Error as e:
+                self.logger.error(f"Erreur SQLite: {e}")
+
+    def _executemany(self, sql: str, rows: List[tuple]):
+        """Exécute une écriture groupée dans une seule transaction"""
+        if not rows:
+            return
+        with self._lock:
+            if self._in_transaction:
+                self._conn.executemany(sql, rows)
+                return
+            try:
+                with self._conn:
+                    self._conn.executemany(sql, rows)
+            except sqlite3.Error as e:
+                self.logger.error(f"Erreur SQLite: {e}")
+
+    @contextmanager
+    def transaction(self, wait: bool = False):
+        # Validation synchrone: une erreur de COMMIT est levée à l'appelant
+        with self._lock:
+            if self._in_transaction:
+                yield
+                return
+
+            self._in_transaction = True
+            try:
+                yield
+            except BaseException:
+                self._conn.rollback()
+                raise
+            else:
+                try:
+                    self._conn.commit()
+                except sqlite3.Error:
+                    self._conn.rollback()
+                    raise
+            finally:
+                self._in_transaction = False
+
+    def _query(self, sql: str, params=()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def get_meta(self, key: str) -> Optional[str]:
+        rows = self._query("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0][0] if rows else None
+
+    def load_lockers(self) -> Dict[str, bool]:
+        rows = self._query("SELECT locker_id, is_occupied FROM lockers ORDER BY locker_id")
+        return {str(locker_id): bool(is_occupied) for locker_id, is_occupied in rows}
+
+    def save_locker(self, locker_id: int, is_occupied: bool):
+        self._execute(
+            "INSERT OR REPLACE INTO lockers (locker_id, is_occupied) VALUES (?, ?)",
+            (int(locker_id), int(is_occupied))
+        )
+
+    def load_sessions(self) -> List[dict]:
+        rows = self._query(
+            "SELECT locker_id, user_code, start_time, end_time, payment_method, "
+            "amount_paid, is_active, overtime_since FROM sessions"
+        )
+        return [{
+            'locker_id': locker_id,
+            'user_code': user_code,
+            'start_time': _to_isoformat(start_time),
+            'end_time': _to_isoformat(end_time),
+            'payment_method': payment_method,
+            'amount_paid': amount_paid,
+            'is_active': bool(is_active),
+            'overtime_since': _to_isoformat(overtime_since)
+        } for (locker_id, user_code, start_time, end_time, payment_method, amount_paid,
+               is_active, overtime_since) in rows]
+
+    @staticmethod
+    def _session_row(session_data: dict) -> tuple:
+        return (
+            session_data['locker_id'],
+            session_data['user_code'],
+            _to_timestamp(session_data['start_time']),
+            _to_timestamp(session_data.get('end_time')),
+            session_data.get('payment_method', ''),
+            session_data.get('amount_paid', 0.0),
+            int(session_data.get('is_active', True)),
+            _to_timestamp(session_data.get('overtime_since'))
+        )
+
+    def save_session(self, session_data: dict):
+        self._execute(
+            "INSERT OR REPLACE INTO sessions (locker_id, user_code, start_time, end_time, "
+            "payment_method, amount_paid, is_active, overtime_since) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            self._session_row(session_data)
+        )
+
+    def delete_session(self, locker_id: int):
+        self._execute("DELETE FROM sessions WHERE locker_id = ?", (locker_id,))
+
+    def load_prepaid_codes(self) -> List[dict]:
+        rows = self._query(
+            "SELECT code, value, created_date, expiry_date, is_used, used_date FROM prepaid_codes"
+        )
+        return [self._code_dict(row) for row in rows]
+
+    @staticmethod
+    def _code_dict(row: tuple) -> dict:
+        code, value, created_date, expiry_date, is_used, used_date = row
+        return {
+            'code': code,
+            'value': value,
+            'created_date': _to_isoformat(created_date),
+            'expiry_date': _to_isoformat(expiry_date),
+            'is_used': bool(is_used),
+            'used_date': _to_isoformat(used_date)
+        }
+
+    @staticmethod
+    def _code_row(code_data: dict) -> tuple:
+        return (
+            code_data['code'],
+            code_data['value'],
+            _to_timestamp(code_data['created_date']),
+            _to_timestamp(code_data['expiry_date']),
+            int(code_data.get('is_used', False)),
+            _to_timestamp(code_data.get('used_date'))
+        )
+
+    def save_prepaid_codes(self, codes_data: List[dict]):
+        self._executemany(
+            "INSERT OR REPLACE INTO prepaid_codes (code, value, created_date, expiry_date, "
+            "is_used, used_date) VALUES (?, ?, ?, ?, ?, ?)",
+            [self._code_row(code_data) for code_data in codes_data]
+        )
+
+    def delete_prepaid_codes(self, codes: Iterable[str]):
+        self._executemany("DELETE FROM prepaid_codes WHERE code = ?", [(code,) for code in codes])
+
+    def get_prepaid_code(self, code: str) -> Optional[dict]:
+        rows = self._query(
+            "SELECT code, value, created_date, expiry_date, is_used, used_date "
+            "FROM prepaid_codes WHERE code = ?", (code,)
+        )
+        return self._code_dict(rows[0]) if rows else None
+
+    def prepaid_code_keys(self) -> List[str]:
+        return [code for code, in self._query("SELECT code FROM prepaid_codes")]
+
+    def count_prepaid_codes(self) -> int:
+        return self._query("SELECT COUNT(*) FROM prepaid_codes")[0][0]
+
+    def delete_expired_prepaid_codes(self, now: datetime) -> List[str]:
+        now_ts = now.timestamp()
+        with self._lock:
+            expired = [code for code, in self._query(
+                "SELECT code FROM prepaid_codes WHERE expiry_date < ?", (now_ts,)
+            )]
+            if expired:
+                self._execute("DELETE FROM prepaid_codes WHERE expiry_date < ?", (now_ts,))
+        return expired
+
+    def prepaid_code_statistics(self, now: datetime) -> dict:
+        now_ts = now.timestamp()
+        total, used, expired, active, active_value = self._query(
+            "SELECT COUNT(*), "
+            "COALESCE(SUM(is_used), 0), "
+            "COALESCE(SUM(CASE WHEN is_used = 0 AND expiry_date < ? THEN 1 ELSE 0 END), 0), "
+            "COALESCE(SUM(CASE WHEN is_used = 0 AND expiry_date >= ? THEN 1 ELSE 0 END), 0), "
+            "COALESCE(SUM(CASE WHEN is_used = 0 AND expiry_date >= ? THEN value ELSE 0 END), 0) "
+            "FROM prepaid_codes", (now_ts, now_ts, now_ts)
+        )[0]
+        return {'total': total, 'used': used, 'expired': expired,
+                'active': active, 'active_value': round(active_value, 2)}
+
+    PENDING_COLUMNS = ('reference', 'method', 'amount', 'created_ts', 'expires_ts', 'confirmed_ts')
+
+    def load_pending_payments(self) -> List[dict]:
+        rows = self._query(f"SELECT {', '.join(self.PENDING_COLUMNS)} FROM pending_payments")
+        return [dict(zip(self.PENDING_COLUMNS, row)) for row in rows]
+
+    def save_pending_payment(self, payment_data: dict):
+        self._execute(
+            f"INSERT OR REPLACE INTO pending_payments ({', '.join(self.PENDING_COLUMNS)}) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            tuple(payment_data.get(column) for column in self.PENDING_COLUMNS)
+        )
+
+    def delete_pending_payments(self, references: Iterable[str]):
+        self._executemany("DELETE FROM pending_payments WHERE reference = ?",
+                          [(reference,) for reference in references])
+
+    def append_session_history(self, session_data: dict):
+        self._execute(
+            "INSERT INTO session_history (locker_id, start_time, end_time, payment_method, "
+            "amount_paid, overtime_fee) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                session_data['locker_id'],
+                _to_timestamp(session_data['start_time']),
+                _to_timestamp(session_data.get('end_time') or session_data['start_time']),
+                session_data.get('payment_method', ''),
+                session_data.get('amount_paid', 0.0),
+                session_data.get('overtime_fee', 0.0)
+            )
+        )
+
+    def query_session_history(self, locker_id: Optional[int] = None,
+                              start: Optional[datetime] = None, end: Optional[datetime] = None,
+                              payment_method: Optional[str] = None) -> List[dict]:
+        conditions, params = [], []
+        if locker_id is not None:
+            conditions.append("locker_id = ?")
+            params.append(locker_id)
+        if payment_method is not None:
+            conditions.append("payment_method = ?")
+            params.append(payment_method)
+        if start is not None:
+            conditions.append("end_time >= ?")
+            params.append(start.timestamp())
+        if end is not None:
+            conditions.append("end_time <= ?")
+            params.append(end.timestamp())
+
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._query(
+            "SELECT locker_id, start_time, end_time, payment_method, amount_paid, overtime_fee "
+            f"FROM session_history{where} ORDER BY end_time, id",
+            params
+        )
+        return [{
+            'locker_id': locker_id,
+            'start_time': _to_isoformat(start_time),
+            'end_time': _to_isoformat(end_time),
+            'payment_method': payment_method,
+            'amount_paid': amount_paid,
+            'overtime_fee': overtime_fee
+        } for locker_id, start_time, end_time, payment_method, amount_paid, overtime_fee in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def migrate_json_to_sqlite(storage: SqliteStorage, data_dir: str = "data"):
+    """Importe une seule fois les fichiers JSON historiques dans la base SQLite
+
+    Les fichiers importés (et l'historique des sessions) sont renommés en *.migrated
+    pour servir de sauvegarde.
+    """
+    if storage.get_meta('json_migrated'):
+        return
+
+    source = JsonStorage(data_dir)
+    migrated_files = [path for path in (source.lockers_file, source.sessions_file, source.codes_file,
+                                        source.history.path)
+                      if os.path.exists(path)]
+
+    lockers = source.load_lockers()
+    sessions = [data for data in source.load_sessions() if data.get('is_active', False)]
+    codes = source.load_prepaid_codes()
+    history = source.query_session_history()
+    source.close()
+
+    # Import dans une seule transaction: en cas d'erreur les fichiers JSON restent en place
+    try:
+        with storage._lock, storage._conn:
+            storage._conn.executemany(
+                "INSERT OR REPLACE INTO lockers (locker_id, is_occupied) VALUES (?, ?)",
+                [(int(locker_id), int(is_occupied)) for locker_id, is_occupied in lockers.items()]
+            )
+            storage._conn.executemany(
+                "INSERT OR REPLACE INTO sessions (locker_id, user_code, start_time, end_time, "
+                "payment_method, amount_paid, is_active, overtime_since) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [storage._session_row(data) for data in sessions]
+            )
+            storage._conn.executemany(
+                "INSERT OR REPLACE INTO prepaid_codes (code, value, created_date, expiry_date, "
+                "is_used, used_date) VALUES (?, ?, ?, ?, ?, ?)",
+                [storage._code_row(data) for data in codes]
+            )
+            storage._conn.executemany(
+                "INSERT INTO session_history (locker_id, start_time, end_time, payment_method, "
+                "amount_paid, overtime_fee) VALUES (?, ?, ?, ?, ?, ?)",
+                [(data['locker_id'], _to_timestamp(data['start_time']), _to_timestamp(data['end_time']),
+                  data.get('payment_method', ''), data.get('amount_paid', 0.0), data.get('overtime_fee', 0.0))
+                 for data in history]
+            )
+            storage._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)",
+                (datetime.now().isoformat(),)
+            )
+    except (sqlite3.Error, KeyError, ValueError) as e:
+        storage.logger.error(f"Erreur lors de la migration des fichiers JSON: {e}")
+        return
+
+    for path in migrated_files:
+        os.replace(path, path + ".migrated")
+        storage.logger.info(f"Fichier {path} importé dans {storage.db_path}")
+
+
+class BackgroundStorage(StorageBackend):
+    """Moteur qui délègue les écritures d'un autre moteur à un thread dédié
+
+    Les gestionnaires transmettent des copies (dictionnaires sérialisés): l'écriture
+    sur la carte SD se fait hors du thread de l'interface. Les lectures n'attendent
+    jamais la synchronisation du support:
+    - un code prépayé encore dans la file est servi depuis la dernière version soumise
+    - les autres lectures attendent seulement que les écritures en file sur la même
+      table soient appliquées au moteur (copie en mémoire ou base), s'il y en a
+    flush() reste la barrière qui rend durables toutes les écritures soumises.
+    """
+
+    def __init__(self, backend: StorageBackend, max_pending: int = 256):
+        self.backend = backend
+        self._io_lock = threading.RLock()
+        self._local = threading.local()
+
+        # Écritures soumises et pas encore appliquées au moteur, par table
+        self._unapplied = Counter()
+        self._applied = threading.Condition()
+        # Code -> dernière version soumise et pas encore appliquée (données, ou
+        # marque de suppression)
+        self._pending_codes: Dict[str, object] = {}
+
+        self.worker = PersistenceWorker(self._commit, max_pending)
+
+    def _commit(self):
+        # Sans le verrou des écritures: une lecture n'attend pas la synchronisation
+        self.backend.flush()
+
+    def _submit(self, table: str, method: Callable, *args, codes: Iterable[tuple] = ()):
+        """Programme une écriture sur table
+
+        codes: (code, version) des codes prépayés écrits, servis aux lectures tant
+        que l'écriture n'est pas appliquée.
+        """
+        write = (table, method, args, list(codes))
+        batch = getattr(self._local, 'batch', None)
+        if batch is not None:
+            batch.append(write)
+            return
+        self._enqueue([write], transactional=False)
+
+    @property
+    def atomic_transactions(self) -> bool:
+        return self.backend.atomic_transactions
+
+    def _enqueue(self, writes: List[tuple], transactional: bool, wait: bool = False):
+        """Transmet des écritures au thread d'écriture, en une seule tâche
+
+        Avec wait, attend leur validation et lève l'erreur rencontrée par le thread.
+        """
+        with self._applied:
+            for table, _, _, codes in writes:
+                self._unapplied[table] += 1
+                self._pending_codes.update(codes)
+
+        def apply():
+            for _, method, args, _ in writes:
+                method(*args)
+
+        errors = []
+
+        def task():
+            try:
+                with self._io_lock:
+                    if transactional:
+                        with self.backend.transaction():
+                            apply()
+                    else:
+                        apply()
+            except Exception as e:
+                errors.append(e)
+                raise
+            finally:
+                self._mark_applied(writes)
+        self.worker.submit(task)
+
+        if wait:
+            self.worker.barrier()
+            if errors:
+                raise errors[0]
+
+    def _mark_applied(self, writes: List[tuple]):
+        with self._applied:
+            for table, _, _, codes in writes:
+                self._unapplied[table] -= 1
+                for code, version in codes:
+                    # Une version plus récente du code peut être encore en file
+                    if self._pending_codes.get(code) is version:
+                        del self._pending_codes[code]
+            self._applied.notify_all()
+
+    @contextmanager
+    def transaction(self, wait: bool = False):
+        # Les écritures du bloc sont transmises au thread d'écriture en une seule
+        # tâche, exécutée dans une transaction du moteur; rien n'est transmis si le
+        # bloc échoue. Avec wait, l'échec de la validation est levé ici.
+        if getattr(self._local, 'batch', None) is not None:
+            yield
+            return
+
+        self._local.batch = []
+        try:
+            yield
+        except BaseException:
+            self._local.batch = None
+            raise
+        batch, self._local.batch = self._local.batch, None
+        if batch:
+            self._enqueue(batch, transactional=True, wait=wait)
+
+    def _wait_applied(self, table: str):
+        """Attend que les écritures en file sur table soient appliquées au moteur"""
+        if self.worker.is_worker_thread():
+            return
+        with self._applied:
+            while self._unapplied[table]:
+                self._applied.wait()
+
+    def _read(self, table: str, method: Callable, *args):
+        self._wait_applied(table)
+        with self._io_lock:
+            return method(*args)
+
+    def load_lockers(self) -> Dict[str, bool]:
+        return self._read('lockers', self.backend.load_lockers)
+
+    def save_locker(self, locker_id: int, is_occupied: bool):
+        self._submit('lockers', self.backend.save_locker, locker_id, is_occupied)
+
+    def load_sessions(self) -> List[dict]:
+        return self._read('sessions', self.backend.load_sessions)
+
+    def save_session(self, session_data: dict):
+        self._submit('sessions', self.backend.save_session, session_data)
+
+    def delete_session(self, locker_id: int):
+        self._submit('sessions', self.backend.delete_session, locker_id)
+
+    def load_prepaid_codes(self) -> List[dict]:
+        return self._read('codes', self.backend.load_prepaid_codes)
+
+    def save_prepaid_codes(self, codes_data: List[dict]):
+        self._submit('codes', self.backend.save_prepaid_codes, codes_data,
+                     codes=[(code_data['code'], code_data) for code_data in codes_data])
+
+    def delete_prepaid_codes(self, codes: Iterable[str]):
+        codes = list(codes)
+        deleted = object()
+        self._submit('codes', self.backend.delete_prepaid_codes, codes,
+                     codes=[(code, deleted) for code in codes])
+
+    def get_prepaid_code(self, code: str) -> Optional[dict]:
+        with self._applied:
+            version = self._pending_codes.get(code, _MISSING)
+        if version is not _MISSING:
+            return version if isinstance(version, dict) else None
+        with self._io_lock:
+            return self.backend.get_prepaid_code(code)
+
+    def prepaid_code_keys(self) -> List[str]:
+        return self._read('codes', self.backend.prepaid_code_keys)
+
+    def count_prepaid_codes(self) -> int:
+        return self._read('codes', self.backend.count_prepaid_codes)
+
+    def delete_expired_prepaid_codes(self, now: datetime) -> List[str]:
+        return self._read('codes', self.backend.delete_expired_prepaid_codes, now)
+
+    def prepaid_code_statistics(self, now: datetime) -> dict:
+        return self._read('codes', self.backend.prepaid_code_statistics, now)
+
+    def load_pending_payments(self) -> List[dict]:
+        return self._read('pending', self.backend.load_pending_payments)
+
+    def save_pending_payment(self, payment_data: dict):
+        self._submit('pending', self.backend.save_pending_payment, payment_data)
+
+    def delete_pending_payments(self, references: Iterable[str]):
+        self._submit('pending', self.backend.delete_pending_payments, list(references))
+
+    def append_session_history(self, session_data: dict):
+        self._submit('history', self.backend.append_session_history, session_data)
+
+    def query_session_history(self, locker_id: Optional[int] = None,
+                              start: Optional[datetime] = None, end: Optional[datetime] = None,
+                              payment_method: Optional[str] = None) -> List[dict]:
+        return self._read('history', self.backend.query_session_history, locker_id, start, end, payment_method)
+
+    def flush(self):
+        self.worker.barrier()
+
+    def when_durable(self, callback: Callable[[], None]):
+        self.worker.when_durable(callback)
+
+    def close(self):
+        # Vide la file d'écriture avant de fermer le moteur
+        self.worker.close()
+        with self._io_lock:
+            self.backend.close()
+
+
+def create_storage(config) -> StorageBackend:
+    """Crée le moteur de stockage choisi dans la configuration"""
+    backend = config.get('storage.backend', 'json')
+    data_dir = config.get('storage.data_dir', 'data')
+    commit_window = config.get('storage.commit_window', 0.05)
+
+    if backend == 'sqlite':
+        db_path = config.get('storage.sqlite_path', os.path.join(data_dir, 'borne.db'))
+        storage = SqliteStorage(db_path, data_dir)
+    elif backend == 'journal':
+        from src.core.journal import JournalStorage
+        storage = JournalStorage(data_dir, config.get('storage.journal_compact_every', 500), commit_window)
+    else:
+        storage = JsonStorage(data_dir, commit_window)
+
+    if config.get('storage.background_writes', True):
+        return BackgroundStorage(storage, config.get('storage.write_queue_size', 256))
+    return storage
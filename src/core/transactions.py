@@ -0,0 +1,123 @@
+"""
+Réservations payées: paiement et réservation du casier validés ensemble
+"""
+
+from typing import Optional
+from src.core.logger import setup_logger
+
+
+class TransactionError(Exception):
+    """Échec d'une étape d'une transaction (annulée en entier)"""
+
+
+class ReservationService:
+    """Réserve un casier et consomme son paiement (code prépayé, paiement QR/USSD
+    confirmé) dans une même transaction
+
+    Ne passe que par les méthodes publiques des gestionnaires. La validation est
+    toujours attendue avant de rendre la main (même avec le thread d'écriture): une
+    erreur d'écriture annule la transaction du moteur et l'état en mémoire, le code
+    reste utilisable et le casier libre.
+
+    Avec un moteur dont les transactions sont atomiques (SQLite), le paiement et la
+    réservation sont écrits en une seule validation: après une coupure, les deux
+    sont présents ou absents. Les moteurs JSON écrivent un fichier par table (codes,
+    casiers, sessions): une coupure entre deux renommages peut laisser un code
+    utilisé sans casier.
+    """
+
+    def __init__(self, payment_manager, locker_manager):
+        self.payment_manager = payment_manager
+        self.locker_manager = locker_manager
+        self.storage = locker_manager.storage
+        self.logger = setup_logger("transactions")
+
+        self.atomic = payment_manager.storage is self.storage and self.storage.atomic_transactions
+        if not self.atomic:
+            self.logger.warning("Moteur de stockage sans transaction atomique: paiement et "
+                                "réservation sont validés ensemble mais pas de façon atomique")
+
+    def redeem_and_reserve(self, code: str, user_code: str, locker_id: Optional[int] = None,
+                           port_type: Optional[str] = None) -> Optional[int]:
+        """Utilise un code prépayé et réserve un casier en une seule transaction
+
+        Sans numéro de casier, le casier est choisi par la politique d'attribution.
+        Retourne le casier réservé, ou None: dans ce cas rien n'a été modifié (le code
+        reste utilisable et le casier libre).
+        """
+        prepaid_code = self.payment_manager.validate_prepaid_code(code)
+        if prepaid_code is None or not self._locker_available(locker_id):
+            return None
+
+        # Le magasin colonnaire écrit hors du moteur de stockage, donc hors transaction:
+        # son écriture est annulée par restore_prepaid_code
+        redeemed = reserved = None
+        try:
+            with self.storage.transaction(wait=True):
+                redeemed = self.payment_manager.redeem_prepaid_code(code)
+                if redeemed is None:
+                    raise TransactionError(f"code {code} déjà utilisé")
+                reserved = self._reserve(user_code, 'prepaid', redeemed.value, locker_id, port_type)
+        except Exception as e:
+            self.logger.error(f"Transaction annulée pour le code {code}: {e}")
+            if reserved is not None:
+                self.locker_manager.cancel_reservation(reserved)
+            if redeemed is not None:
+                self.payment_manager.restore_prepaid_code(redeemed)
+            return None
+
+        self.logger.info(f"Code prépayé {code} utilisé pour le casier {reserved}")
+        return reserved
+
+    def reserve_paid(self, reference: str, user_code: str, locker_id: Optional[int] = None,
+                     port_type: Optional[str] = None) -> Optional[int]:
+        """Rattache un paiement QR/USSD confirmé à un casier réservé, en une seule transaction
+
+        Retourne le casier réservé, ou None: dans ce cas rien n'a été modifié (le
+        paiement reste en attente de rattachement et le casier libre).
+        """
+        payment = self.payment_manager.get_pending_payment(reference)
+        if payment is None or not payment.is_confirmed or not self._locker_available(locker_id):
+            return None
+
+        # Verrou du registre avant celui du moteur (ordre des écritures du registre)
+        with self.payment_manager.pending_payments_locked():
+            reserved = completed = None
+            try:
+                with self.storage.transaction(wait=True):
+                    reserved = self._reserve(user_code, payment.method, payment.amount, locker_id, port_type)
+                    completed = self.payment_manager.complete_pending_payment(reference, reserved)
+                    if completed is None:
+                        raise TransactionError(f"paiement {reference} déjà rattaché ou expiré")
+            except Exception as e:
+                self.logger.error(f"Transaction annulée pour le paiement {reference}: {e}")
+                if reserved is not None:
+                    self.locker_manager.cancel_reservation(reserved)
+                if completed is not None:
+                    self.payment_manager.restore_pending_payment(completed)
+                return None
+
+        return reserved
+
+    def _locker_available(self, locker_id: Optional[int]) -> bool:
+        """Vérifie, avant toute écriture, qu'un casier peut être réservé"""
+        if locker_id is None:
+            available = self.locker_manager.available_count() > 0
+        else:
+            available = self.locker_manager.is_locker_available(locker_id)
+        if not available:
+            self.logger.warning(f"Aucun casier disponible ({locker_id or 'attribution automatique'})")
+        return available
+
+    def _reserve(self, user_code: str, payment_method: str, amount: float,
+                 locker_id: Optional[int], port_type: Optional[str]) -> int:
+        """Réserve le casier demandé (ou celui de la politique d'attribution)"""
+        if locker_id is None:
+            reserved = self.locker_manager.reserve_any(user_code, payment_method, amount, port_type)
+        elif self.locker_manager.reserve_locker(locker_id, user_code, payment_method, amount):
+            reserved = locker_id
+        else:
+            reserved = None
+        if reserved is None:
+            raise TransactionError(f"réservation du casier {locker_id or '(attribution automatique)'} impossible")
+        return reserved
@@ -0,0 +1,149 @@
+"""
+Modèle du tableau des codes prépayés (lecture paresseuse, tri et filtres)
+"""
+
+import time
+from typing import Dict, List, Optional
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+
+class PrepaidCodesModel(QAbstractTableModel):
+    """Codes prépayés lus directement dans le PaymentManager
+
+    Une requête (filtres, tri) ne produit que la liste des clés. Les lignes sont
+    exposées à la vue par tranches au fil du défilement (fetchMore) et chaque
+    code n'est lu qu'au moment d'être affiché.
+    """
+
+    COLUMNS = ("Code", "Valeur", "Créé", "Expiré", "Utilisé")
+    SORT_KEYS = ('code', 'value', 'created', 'expiry', 'used')
+    FETCH_SIZE = 200
+
+    def __init__(self, payment_manager, parent=None):
+        super().__init__(parent)
+        self.payment_manager = payment_manager
+
+        self.status: Optional[str] = None
+        self.value: Optional[float] = None
+        self.prefix: Optional[str] = None
+        self.batch: Optional[tuple] = None
+        self.expiring_within: Optional[int] = None
+        self.sort_by = 'created'
+        self.descending = True
+
+        self._codes: List[str] = []
+        self._fetched = 0
+        self._rows: Dict[str, int] = {}
+        self._cache: Dict[int, object] = {}
+        self._now_ts = time.time()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else self._fetched
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        return not parent.isValid() and self._fetched < len(self._codes)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        end = min(len(self._codes), self._fetched + self.FETCH_SIZE)
+        if end == self._fetched:
+            return
+        self.beginInsertRows(QModelIndex(), self._fetched, end - 1)
+        for row in range(self._fetched, end):
+            self._rows[self._codes[row]] = row
+        self._fetched = end
+        self.endInsertRows()
+
+    def total_count(self) -> int:
+        """Nombre de codes correspondant aux filtres (lignes pas encore exposées comprises)"""
+        return len(self._codes)
+
+    def _code_at(self, row: int):
+        prepaid_code = self._cache.get(row)
+        if prepaid_code is None:
+            prepaid_code = self.payment_manager.prepaid_codes.get(self._codes[row])
+            self._cache[row] = prepaid_code
+        return prepaid_code
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        if role != Qt.DisplayRole:
+            return None
+
+        prepaid_code = self._code_at(index.row())
+        if prepaid_code is None:
+            # Supprimé depuis la requête (purge des expirés)
+            return "-"
+
+        column = index.column()
+        if column == 0:
+            return prepaid_code.code
+        if column == 1:
+            return f"{prepaid_code.value}€"
+        if column == 2:
+            return prepaid_code.created_date.strftime("%d/%m/%Y %H:%M")
+        if column == 3:
+            return "🔴 Oui" if prepaid_code.is_expired(self._now_ts) else "🟢 Non"
+        return "🔴 Oui" if prepaid_code.is_used else "🟢 Non"
+
+    def sort(self, column: int, order=Qt.AscendingOrder):
+        self.sort_by = self.SORT_KEYS[column]
+        self.descending = order == Qt.DescendingOrder
+        self.reload()
+
+    def set_filters(self, status: Optional[str] = None, value: Optional[float] = None,
+                    prefix: Optional[str] = None, batch: Optional[tuple] = None,
+                    expiring_within: Optional[int] = None):
+        self.status = status
+        self.value = value
+        self.prefix = prefix
+        self.batch = batch
+        self.expiring_within = expiring_within
+        self.reload()
+
+    def reload(self):
+        """Relance la requête (filtres, tri ou ensemble des codes modifiés)"""
+        codes = self.payment_manager.query_codes(
+            self.status, self.value, self.sort_by, self.descending,
+            prefix=self.prefix, batch=self.batch, expiring_within=self.expiring_within
+        )
+        self.beginResetModel()
+        self._codes = codes
+        self._fetched = 0
+        self._rows = {}
+        self._cache = {}
+        self._now_ts = time.time()
+        self.endResetModel()
+        # Première tranche; les suivantes sont demandées par la vue au défilement
+        self.fetchMore()
+
+    def refresh(self):
+        """Relit les seules lignes exposées (coût proportionnel à l'affichage)"""
+        self._cache = {}
+        self._now_ts = time.time()
+        if self._fetched:
+            self.dataChanged.emit(self.index(0, 0), self.index(self._fetched - 1, len(self.COLUMNS) - 1))
+
+    def on_codes_changed(self, change: str, codes: list):
+        """Met à jour les lignes des codes modifiés (signal codes_changed)"""
+        if change in ('created', 'expired'):
+            self.reload()
+            return
+        for code in codes:
+            row = self._rows.get(code)
+            if row is not None:
+                self._cache.pop(row, None)
+                self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.COLUMNS) - 1))
\ No newline at end of file
@@ -0,0 +1,47 @@
+"""
+Relais des événements des gestionnaires vers des signaux Qt
+"""
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from src.core.events import CodesEvent, LockerEvent, PaymentEvent
+from src.ui.locker_model import LockerTableModel
+
+
+class ManagerEvents(QObject):
+    """Expose les bus d'événements des gestionnaires sous forme de signaux Qt
+
+    Les événements peuvent être publiés depuis un autre thread (générateur de
+    codes, planificateur): les écrans se connectent en file d'attente pour être
+    appelés dans le thread de l'interface, après l'action en cours.
+    Porte aussi le modèle des casiers affiché par les grilles et tableaux.
+    """
+
+    locker_changed = pyqtSignal(int, bool, str)  # casier, occupé, raison
+    codes_changed = pyqtSignal(str, list)  # changement, codes concernés
+    payment_changed = pyqtSignal(str, str, float)  # référence, état, montant
+
+    def __init__(self, config, locker_manager, payment_manager, parent=None):
+        super().__init__(parent)
+        # État des casiers partagé par les vues de tous les écrans
+        self.locker_model = LockerTableModel(config, locker_manager, self)
+        self.locker_changed.connect(self.locker_model.on_locker_changed)
+        
+        self._unsubscribe = [
+            locker_manager.events.subscribe(self._on_locker_event),
+            payment_manager.events.subscribe(self._on_payment_manager_event)
+        ]
+
+    def _on_locker_event(self, event: LockerEvent):
+        self.locker_changed.emit(event.locker_id, event.is_occupied, event.reason)
+
+    def _on_payment_manager_event(self, event):
+        if isinstance(event, PaymentEvent):
+            self.payment_changed.emit(event.reference, event.status, event.amount)
+        elif isinstance(event, CodesEvent):
+            self.codes_changed.emit(event.change, list(event.codes))
+
+    def close(self):
+        for unsubscribe in self._unsubscribe:
+            unsubscribe()
+        self._unsubscribe = []
@@ -0,0 +1,222 @@
+"""
+Modèle et vues partagés de l'état des casiers (grille virtualisée et tableau)
+"""
+
+from typing import Dict, List
+
+from PyQt5.QtWidgets import QListView, QStyledItemDelegate, QStyle, QAbstractItemView
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QRectF, QSize
+from PyQt5.QtGui import QBrush, QColor, QFont, QPen
+
+# Couleurs des casiers (fond, bordure)
+FREE_COLORS = ("#28a745", "#20c997")
+OCCUPIED_COLORS = ("#dc3545", "#c82333")
+SELECTED_COLORS = ("#0078d4", "#17a2b8")
+
+
+class LockerTableModel(QAbstractTableModel):
+    """État des casiers, une ligne par casier
+
+    Partagé par tous les écrans: la grille affiche la première colonne, le tableau
+    d'administration toutes. L'état libre/occupé est gardé en mémoire et mis à jour
+    casier par casier par les événements; les informations de session ne sont lues
+    que pour les cellules affichées.
+    """
+
+    AvailableRole = Qt.UserRole + 1
+    LockerIdRole = Qt.UserRole + 2
+
+    COLUMNS = ("Casier", "État", "Code Utilisateur", "Début", "Actions")
+    LOCKER, STATUS, USER_CODE, START, ACTION = range(5)
+
+    def __init__(self, config, locker_manager, parent=None):
+        super().__init__(parent)
+        self.config = config
+        self.locker_manager = locker_manager
+        self._locker_ids: List[int] = []
+        self._rows: Dict[int, int] = {}
+        self._available: List[bool] = []
+        self.reload()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._available)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        if self._available[index.row()] or index.column() == self.ACTION:
+            return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        return Qt.ItemIsEnabled
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        row, column = index.row(), index.column()
+        locker_id = self._locker_ids[row]
+        is_available = self._available[row]
+
+        if role == self.AvailableRole:
+            return is_available
+        if role == self.LockerIdRole:
+            return locker_id
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        if role == Qt.BackgroundRole and column == self.ACTION and not is_available:
+            return QBrush(QColor(OCCUPIED_COLORS[0]))
+        if role != Qt.DisplayRole:
+            return None
+
+        if column == self.LOCKER:
+            return str(locker_id)
+        if column == self.STATUS:
+            return "🟢 Libre" if is_available else "🔴 Occupé"
+        if column == self.ACTION:
+            return "-" if is_available else "🔓 Libérer"
+
+        session = None if is_available else self.locker_manager.get_session_info(locker_id)
+        if session is None:
+            return "-"
+        if column == self.USER_CODE:
+            return session.user_code
+        return session.start_time.strftime("%H:%M:%S")
+
+    def index_of(self, locker_id: int, column: int = 0) -> QModelIndex:
+        row = self._rows.get(locker_id)
+        return QModelIndex() if row is None else self.index(row, column)
+
+    def reload(self):
+        """Relit l'état de tous les casiers; seules les lignes modifiées sont signalées"""
+        locker_ids = self.locker_manager.locker_ids()
+        available = [self.locker_manager.is_locker_available(i) for i in locker_ids]
+
+        if locker_ids != self._locker_ids:
+            # Les lignes suivent l'ordre des numéros, qui ne sont pas forcément contigus
+            self.beginResetModel()
+            self._locker_ids = locker_ids
+            self._rows = {locker_id: row for row, locker_id in enumerate(locker_ids)}
+            self._available = available
+            self.endResetModel()
+            return
+
+        for row, is_available in enumerate(available):
+            if is_available != self._available[row]:
+                self._available[row] = is_available
+                self._row_changed(row)
+
+    def on_locker_changed(self, locker_id: int, is_occupied: bool, reason: str):
+        """Met à jour la ligne d'un casier (signal locker_changed)"""
+        row = self._rows.get(locker_id)
+        if row is not None:
+            self._available[row] = not is_occupied
+            self._row_changed(row)
+
+    def _row_changed(self, row: int):
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.COLUMNS) - 1))
+
+
+class LockerDelegate(QStyledItemDelegate):
+    """Dessine un casier (rectangle arrondi coloré selon son état)"""
+
+    def __init__(self, cell_size: QSize, font_size: int, compact: bool, parent=None):
+        super().__init__(parent)
+        self.base_size = cell_size
+        self.base_font_size = font_size
+        self.compact = compact
+        self.zoom = 1.0
+
+    def sizeHint(self, option, index) -> QSize:
+        return QSize(int(self.base_size.width() * self.zoom), int(self.base_size.height() * self.zoom))
+
+    def paint(self, painter, option, index):
+        locker_id = index.data(LockerTableModel.LockerIdRole)
+        is_available = index.data(LockerTableModel.AvailableRole)
+
+        if option.state & QStyle.State_Selected:
+            background, border = SELECTED_COLORS
+        elif is_available:
+            background, border = FREE_COLORS
+        else:
+            background, border = OCCUPIED_COLORS
+
+        if self.compact:
+            text = f"🟢 C{locker_id}\nLIBRE" if is_available else f"🔴 C{locker_id}\nOCCUPÉ"
+            radius = 5
+        else:
+            text = f"🟢\nCasier {locker_id}\nLIBRE" if is_available else f"🔴\nCasier {locker_id}\nOCCUPÉ"
+            radius = 12
+
+        painter.save()
+        painter.setRenderHint(painter.Antialiasing)
+        rect = QRectF(option.rect).adjusted(1.5, 1.5, -1.5, -1.5)
+        painter.setPen(QPen(QColor(border), 3 if not self.compact else 1))
+        painter.setBrush(QColor(background))
+        painter.drawRoundedRect(rect, radius, radius)
+
+        painter.setPen(QColor("#ffffff"))
+        painter.setFont(QFont("Segoe UI", max(5, round(self.base_font_size * self.zoom)), QFont.Bold))
+        painter.drawText(option.rect, Qt.AlignCenter, text)
+        painter.restore()
+
+
+class LockerGridView(QListView):
+    """Grille virtualisée des casiers
+
+    Seules les cellules visibles sont dessinées; le nombre de colonnes suit la
+    largeur disponible. Le zoom (boutons ou Ctrl + molette) agrandit ou réduit les
+    cellules pour les installations de plusieurs centaines de casiers.
+    """
+
+    MIN_ZOOM = 0.5
+    MAX_ZOOM = 2.0
+    ZOOM_STEP = 1.25
+
+    def __init__(self, cell_size=(63, 24), font_size: int = 8, compact: bool = True, parent=None):
+        super().__init__(parent)
+        self.locker_delegate = LockerDelegate(QSize(*cell_size), font_size, compact, self)
+        self.setItemDelegate(self.locker_delegate)
+
+        self.setViewMode(QListView.ListMode)
+        self.setFlow(QListView.LeftToRight)
+        self.setWrapping(True)
+        self.setResizeMode(QListView.Adjust)
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.Batched)
+        self.setSpacing(3)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setFocusPolicy(Qt.NoFocus)
+        self.setProperty("role", "lockers")
+
+    def set_zoom(self, zoom: float):
+        zoom = min(self.MAX_ZOOM, max(self.MIN_ZOOM, zoom))
+        if zoom == self.locker_delegate.zoom:
+            return
+        self.locker_delegate.zoom = zoom
+        # Les tailles des cellules sont recalculées (taille uniforme: une seule mesure)
+        self.scheduleDelayedItemsLayout()
+
+    def zoom_in(self):
+        self.set_zoom(self.locker_delegate.zoom * self.ZOOM_STEP)
+
+    def zoom_out(self):
+        self.set_zoom(self.locker_delegate.zoom / self.ZOOM_STEP)
+
+    def wheelEvent(self, event):
+        if event.modifiers() & Qt.ControlModifier:
+            if event.angleDelta().y() > 0:
+                self.zoom_in()
+            else:
+                self.zoom_out()
+            event.accept()
+            return
+        super().wheelEvent(event)
\ No newline at end of file
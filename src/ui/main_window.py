@@ -2,30 +2,43 @@
 Fenêtre principale de l'application borne
 """
 
-from PyQt5.QtWidgets import (QMainWindow, QStackedWidget, QVBoxLayout, 
+import time
+
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QStackedWidget, QVBoxLayout, 
                             QWidget, QLabel, QHBoxLayout)
 from PyQt5.QtCore import Qt, QTimer, pyqtSignal
 from PyQt5.QtGui import QFont, QPalette, QColor
 
 from src.ui.screens.home_screen import HomeScreen
-from src.ui.screens.payment_screen import PaymentScreen
-from src.ui.screens.locker_screen import LockerScreen
-from src.ui.screens.admin_screen import AdminScreen
+from src.ui.event_bridge import ManagerEvents
+from src.ui.theme import apply_theme
 from src.core.locker_manager import LockerManager
 from src.core.payment_manager import PaymentManager
+from src.core.startup import StartupTimer
+from src.core.storage import create_storage
 from src.core.logger import setup_logger
 
 class MainWindow(QMainWindow):
     """Fenêtre principale de l'application"""
     
-    def __init__(self, config):
+    def __init__(self, config, startup: StartupTimer = None):
         super().__init__()
         self.config = config
         self.logger = setup_logger("main_window")
         
-        # Initialisation des gestionnaires
-        self.locker_manager = LockerManager(config)
-        self.payment_manager = PaymentManager(config)
+        # Mesure du démarrage jusqu'à la première image (rapport dans le journal)
+        self.startup = startup or StartupTimer()
+        self._first_frame_pending = True
+        
+        # Initialisation des gestionnaires (moteur de stockage partagé)
+        self.storage = create_storage(config)
+        self.locker_manager = LockerManager(config, self.storage)
+        self.payment_manager = PaymentManager(config, self.storage)
+        self.startup.mark("Stockage et gestionnaires")
+        
+        # Changements d'état relayés aux écrans: seuls les éléments concernés sont mis à jour
+        self.events = ManagerEvents(config, self.locker_manager, self.payment_manager, self)
+        self.startup.mark("Événements")
         
         # Configuration de la fenêtre
         self.setWindowTitle("Borne de Recharge")
@@ -33,73 +46,33 @@ class MainWindow(QMainWindow):
         
         # Application du thème
         self._apply_theme()
+        self.startup.mark("Thème")
         
         # Configuration de l'interface
         self._setup_ui()
+        self.startup.mark("Interface (écran d'accueil)")
         
         # Timer pour les vérifications périodiques
         self.timer = QTimer()
         self.timer.timeout.connect(self._periodic_checks)
         self.timer.start(30000)  # 30 secondes
         
+        # Timer réarmé sur la prochaine échéance de session
+        self.deadline_timer = QTimer()
+        self.deadline_timer.setSingleShot(True)
+        self.deadline_timer.timeout.connect(self._on_deadline)
+        self.locker_manager.scheduler.set_wakeup_callback(self._arm_deadline_timer)
+        self._arm_deadline_timer()
+        
+        # Alertes de durée de charge dans la barre de titre
+        self.locker_manager.charging.add_warning_listener(self._on_charging_warning)
+        self.locker_manager.charging.add_limit_listener(self._on_charging_limit)
+        
         self.logger.info("Fenêtre principale initialisée")
     
     def _apply_theme(self):
-        """Applique le thème sombre moderne"""
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #1e1e1e;
-                color: #ffffff;
-            }
-            
-            QLabel {
-                color: #ffffff;
-                font-family: 'Segoe UI', Arial, sans-serif;
-            }
-            
-            QPushButton {
-                background-color: #0078d4;
-                color: white;
-                border: none;
-                border-radius: 8px;
-                padding: 12px 24px;
-                font-size: 14px;
-                font-weight: bold;
-                min-height: 40px;
-            }
-            
-            QPushButton:hover {
-                background-color: #106ebe;
-            }
-            
-            QPushButton:pressed {
-                background-color: #005a9e;
-            }
-            
-            QPushButton:disabled {
-                background-color: #404040;
-                color: #808080;
-            }
-            
-            QLineEdit {
-                background-color: #2d2d2d;
-                border: 2px solid #404040;
-                border-radius: 6px;
-                padding: 8px 12px;
-                color: #ffffff;
-                font-size: 14px;
-                min-height: 20px;
-            }
-            
-            QLineEdit:focus {
-                border-color: #0078d4;
-            }
-            
-            QFrame {
-                background-color: #2d2d2d;
-                border-radius: 8px;
-            }
-        """)
+        """Applique le thème sombre moderne (feuille de style de l'application)"""
+        apply_theme(QApplication.instance())
     
     def _setup_ui(self):
         """Configure l'interface utilisateur"""
@@ -128,12 +101,7 @@ class MainWindow(QMainWindow):
         """Crée la barre de titre"""
         title_frame = QWidget()
         title_frame.setFixedHeight(80)
-        title_frame.setStyleSheet("""
-            QWidget {
-                background-color: #0078d4;
-                border-radius: 0px;
-            }
-        """)
+        title_frame.setProperty("role", "titlebar")
         
         title_layout = QHBoxLayout(title_frame)
         title_layout.setContentsMargins(20, 0, 20, 0)
@@ -141,7 +109,6 @@ class MainWindow(QMainWindow):
         # Titre principal
         title_label = QLabel("🔋 BORNE DE RECHARGE")
         title_label.setFont(QFont("Segoe UI", 24, QFont.Bold))
-        title_label.setStyleSheet("color: white;")
         title_layout.addWidget(title_label)
         
         title_layout.addStretch()
@@ -149,66 +116,95 @@ class MainWindow(QMainWindow):
         # Indicateur de statut
         self.status_indicator = QLabel("🟢 OPÉRATIONNELLE")
         self.status_indicator.setFont(QFont("Segoe UI", 12, QFont.Bold))
-        self.status_indicator.setStyleSheet("color: white;")
         title_layout.addWidget(self.status_indicator)
         
         layout.addWidget(title_frame)
     
     def _create_screens(self):
-        """Crée tous les écrans de l'application"""
-        # Écran d'accueil
-        self.home_screen = HomeScreen(self.config, self.locker_manager, self.payment_manager)
-        self.home_screen.screen_changed.connect(self.change_screen)
-        self.stacked_widget.addWidget(self.home_screen)
-        
-        # Écran de paiement
-        self.payment_screen = PaymentScreen(self.config, self.locker_manager, self.payment_manager)
-        self.payment_screen.screen_changed.connect(self.change_screen)
-        self.stacked_widget.addWidget(self.payment_screen)
-        
-        # Écran des casiers
-        self.locker_screen = LockerScreen(self.config, self.locker_manager, self.payment_manager)
-        self.locker_screen.screen_changed.connect(self.change_screen)
-        self.stacked_widget.addWidget(self.locker_screen)
-        
-        # Écran d'administration
-        self.admin_screen = AdminScreen(self.config, self.locker_manager, self.payment_manager)
-        self.admin_screen.screen_changed.connect(self.change_screen)
-        self.stacked_widget.addWidget(self.admin_screen)
+        """Crée l'écran d'accueil; les autres écrans sont construits à leur première visite"""
+        self.screens = {}
+        self.screen_factories = {
+            'home': lambda: HomeScreen,
+            'payment': self._payment_screen_class,
+            'locker': self._locker_screen_class,
+            'admin': self._admin_screen_class,
+        }
         
         # Écran par défaut
-        self.stacked_widget.setCurrentWidget(self.home_screen)
+        self.stacked_widget.setCurrentWidget(self.get_screen('home'))
+    
+    # Les modules des écrans (et leurs dépendances: qrcode, modèles et tableaux
+    # d'administration...) ne sont importés qu'à la construction de l'écran
+    
+    @staticmethod
+    def _payment_screen_class():
+        from src.ui.screens.payment_screen import PaymentScreen
+        return PaymentScreen
+    
+    @staticmethod
+    def _locker_screen_class():
+        from src.ui.screens.locker_screen import LockerScreen
+        return LockerScreen
+    
+    @staticmethod
+    def _admin_screen_class():
+        from src.ui.screens.admin_screen import AdminScreen
+        return AdminScreen
+    
+    def get_screen(self, screen_name: str):
+        """Écran demandé, construit et ajouté à la pile au premier appel"""
+        screen = self.screens.get(screen_name)
+        if screen is None:
+            start = time.perf_counter()
+            screen_class = self.screen_factories[screen_name]()
+            screen = screen_class(self.config, self.locker_manager, self.payment_manager)
+            screen.screen_changed.connect(self.change_screen)
+            screen.bind_events(self.events)
+            self.stacked_widget.addWidget(screen)
+            self.screens[screen_name] = screen
+            self.logger.info(f"Écran {screen_name} construit en {(time.perf_counter() - start) * 1000:.0f} ms")
+        return screen
+    
+    @property
+    def home_screen(self):
+        return self.get_screen('home')
+    
+    @property
+    def payment_screen(self):
+        return self.get_screen('payment')
+    
+    @property
+    def locker_screen(self):
+        return self.get_screen('locker')
+    
+    @property
+    def admin_screen(self):
+        return self.get_screen('admin')
     
     def _create_status_bar(self, layout):
         """Crée la barre de statut"""
         status_frame = QWidget()
         status_frame.setFixedHeight(40)
-        status_frame.setStyleSheet("""
-            QWidget {
-                background-color: #2d2d2d;
-                border-radius: 0px;
-            }
-        """)
+        status_frame.setProperty("role", "statusbar")
         
         status_layout = QHBoxLayout(status_frame)
         status_layout.setContentsMargins(20, 0, 20, 0)
         
         # Informations de statut
         self.locker_status_label = QLabel()
-        self.locker_status_label.setStyleSheet("color: #cccccc; font-size: 12px;")
         status_layout.addWidget(self.locker_status_label)
         
         status_layout.addStretch()
         
         # Heure
         self.time_label = QLabel()
-        self.time_label.setStyleSheet("color: #cccccc; font-size: 12px;")
         status_layout.addWidget(self.time_label)
         
         layout.addWidget(status_frame)
         
-        # Mise à jour initiale
+        # Mise à jour initiale, puis à chaque changement d'état d'un casier
         self._update_status_bar()
+        self.events.locker_changed.connect(lambda *_: self._update_status_bar(), Qt.QueuedConnection)
     
     def _update_status_bar(self):
         """Met à jour la barre de statut"""
@@ -219,7 +215,7 @@ class MainWindow(QMainWindow):
         self.time_label.setText(current_time)
         
         # Mise à jour du statut des casiers
-        available_lockers = len(self.locker_manager.get_available_lockers())
+        available_lockers = self.locker_manager.available_count()
         total_lockers = self.config.get('lockers.count', 8)
         occupied_lockers = total_lockers - available_lockers
         
@@ -227,33 +223,54 @@ class MainWindow(QMainWindow):
             f"Casiers: {available_lockers} libres / {occupied_lockers} occupés / {total_lockers} total"
         )
     
+    def _arm_deadline_timer(self):
+        """Programme le réveil à la prochaine échéance de session"""
+        delay = self.locker_manager.time_until_next_deadline()
+        if delay is None:
+            self.deadline_timer.stop()
+            return
+        
+        # Plafonné à une heure: le timer est simplement réarmé au réveil
+        self.deadline_timer.start(int(min(delay, 3600) * 1000) + 1)
+    
+    def _on_deadline(self):
+        """Traite les échéances atteintes"""
+        # Les casiers libérés sont signalés aux écrans par les événements
+        self.locker_manager.check_expired_sessions()
+        self._arm_deadline_timer()
+    
+    def _show_status_alert(self, text: str, duration_ms: int = 15000):
+        """Affiche temporairement une alerte à la place de l'indicateur de statut"""
+        self.status_indicator.setText(text)
+        QTimer.singleShot(duration_ms, lambda: self.status_indicator.setText("🟢 OPÉRATIONNELLE"))
+    
+    def _on_charging_warning(self, locker_id: int, remaining: int):
+        """Avertit de la fin de charge prochaine d'un casier"""
+        self._show_status_alert(f"⚠️ Casier {locker_id}: fin de charge dans {remaining // 60} min")
+    
+    def _on_charging_limit(self, locker_id: int, action: str):
+        """Signale qu'un casier a atteint la durée maximale de charge"""
+        if action == 'cutoff':
+            self._show_status_alert(f"🔌 Casier {locker_id}: charge terminée")
+        else:
+            self._show_status_alert(f"⏱️ Casier {locker_id}: temps de charge dépassé")
+    
     def _periodic_checks(self):
         """Vérifications périodiques"""
         # Vérifier les sessions expirées
         self.locker_manager.check_expired_sessions()
         
-        # Nettoyer les codes expirés
+        # Nettoyer les codes expirés et les demandes de paiement échues
         self.payment_manager.cleanup_expired_codes()
+        self.payment_manager.cleanup_pending_payments()
         
-        # Mettre à jour la barre de statut
+        # Mettre à jour l'heure de la barre de statut (les écrans suivent les événements)
         self._update_status_bar()
-        
-        # Rafraîchir l'écran actuel si nécessaire
-        current_screen = self.stacked_widget.currentWidget()
-        if hasattr(current_screen, 'refresh'):
-            current_screen.refresh()
     
     def change_screen(self, screen_name: str, data: dict = None):
-        """Change l'écran affiché"""
-        screen_map = {
-            'home': self.home_screen,
-            'payment': self.payment_screen,
-            'locker': self.locker_screen,
-            'admin': self.admin_screen
-        }
-        
-        if screen_name in screen_map:
-            screen = screen_map[screen_name]
+        """Change l'écran affiché (construit à la première visite)"""
+        if screen_name in self.screen_factories:
+            screen = self.get_screen(screen_name)
             
             # Passer les données à l'écran si nécessaire
             if data and hasattr(screen, 'set_data'):
@@ -266,8 +283,39 @@ class MainWindow(QMainWindow):
             self.stacked_widget.setCurrentWidget(screen)
             self.logger.info(f"Changement d'écran vers: {screen_name}")
     
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self._first_frame_pending:
+            self._first_frame_pending = False
+            # Rappel après la fin du dessin en cours: la première image est affichée
+            QTimer.singleShot(0, self._on_first_frame)
+    
+    def _on_first_frame(self):
+        """Journalise le rapport de démarrage, phase par phase"""
+        self.startup.mark("Première image")
+        self.logger.info("Temps de démarrage jusqu'à la première image:")
+        for line in self.startup.report():
+            self.logger.info(f"  {line}")
+        
+        # L'écran de paiement, le registre des paiements et le client du fournisseur
+        # sont préparés dès que l'accueil est affiché, avant le choix d'un client
+        QTimer.singleShot(0, lambda: self.get_screen('payment'))
+        QTimer.singleShot(0, self.payment_manager.prepare_payments)
+    
     def closeEvent(self, event):
         """Gestion de la fermeture de l'application"""
         self.logger.info("Fermeture de l'application")
         self.timer.stop()
+        self.deadline_timer.stop()
+        for screen in self.screens.values():
+            if hasattr(screen, 'shutdown'):
+                screen.shutdown()
+        self.events.close()
+        self.payment_manager.close()
+        # Barrière: toutes les écritures en attente sont validées avant la fermeture
+        try:
+            self.storage.flush()
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la validation des écritures: {e}")
+        self.storage.close()
         event.accept()
\ No newline at end of file
@@ -0,0 +1,59 @@
+"""
+Rendu des QR codes directement dans une QImage, à la taille d'affichage
+"""
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor, QImage, QPainter
+
+
+def qr_matrix(data: str, border: int = 4) -> list:
+    """Matrice des modules du QR code (True = module noir), marge comprise"""
+    # qrcode n'est chargé qu'au premier QR code; PIL n'est jamais utilisé ici
+    import qrcode
+
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        border=border,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def render_qr_matrix(matrix: list, size: int, fill_color=Qt.black, back_color=Qt.white) -> QImage:
+    """Dessine une matrice de modules dans une image carrée de size pixels
+
+    Chaque module occupe un nombre entier de pixels (bords nets, sans mise à
+    l'échelle); le reste de la division est réparti en marge autour du code.
+    Les modules noirs consécutifs d'une ligne sont remplis d'un seul rectangle.
+    """
+    image = QImage(size, size, QImage.Format_RGB32)
+    image.fill(QColor(back_color))
+
+    count = len(matrix)
+    if count == 0:
+        return image
+    module = max(1, size // count)
+    offset = (size - module * count) // 2
+
+    painter = QPainter(image)
+    fill = QColor(fill_color)
+    for row, modules in enumerate(matrix):
+        y = offset + row * module
+        start = None
+        for column, dark in enumerate(modules):
+            if dark and start is None:
+                start = column
+            elif not dark and start is not None:
+                painter.fillRect(offset + start * module, y, (column - start) * module, module, fill)
+                start = None
+        if start is not None:
+            painter.fillRect(offset + start * module, y, (count - start) * module, module, fill)
+    painter.end()
+    return image
+
+
+def render_qr(data: str, size: int, fill_color=Qt.black, back_color=Qt.white) -> QImage:
+    """QR code de data, prêt à afficher en size x size pixels"""
+    return render_qr_matrix(qr_matrix(data), size, fill_color, back_color)
\ No newline at end of file
@@ -3,12 +3,39 @@
 """
 
 from PyQt5.QtWidgets import (QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, 
-                            QLineEdit, QPushButton, QFrame, QTextEdit, QTabWidget,
-                            QWidget, QTableWidget, QTableWidgetItem, QHeaderView,
-                            QMessageBox, QInputDialog)
-from PyQt5.QtCore import Qt, QTimer
+                            QLineEdit, QFrame, QTextEdit, QTabWidget,
+                            QWidget, QHeaderView,
+                            QMessageBox, QInputDialog, QSpinBox, QProgressBar,
+                            QTableView, QAbstractItemView, QComboBox)
+from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
 from PyQt5.QtGui import QFont
+from datetime import datetime
+from src.ui.codes_model import PrepaidCodesModel
+from src.ui.locker_model import LockerTableModel
 from src.ui.screens.base_screen import BaseScreen
+from src.ui.theme import set_style_state
+
+class CodeGenerationWorker(QThread):
+    """Génère un lot de codes prépayés hors du thread de l'interface"""
+    
+    progress = pyqtSignal(int, int)  # codes générés, total
+    completed = pyqtSignal(list)     # codes générés
+    failed = pyqtSignal(str)
+    
+    def __init__(self, payment_manager, count: int, value: float):
+        super().__init__()
+        self.payment_manager = payment_manager
+        self.count = count
+        self.value = value
+    
+    def run(self):
+        try:
+            codes = self.payment_manager.generate_prepaid_codes(
+                self.count, self.value, progress_callback=self.progress.emit
+            )
+            self.completed.emit(codes)
+        except Exception as e:
+            self.failed.emit(str(e))
 
 class AdminScreen(BaseScreen):
     """Écran d'administration pour la gestion de la borne"""
@@ -28,28 +55,14 @@ class AdminScreen(BaseScreen):
         self.title_label = self.create_title("🔧 Administration")
         self.layout.addWidget(self.title_label)
         self.content_frame = QFrame()
-        self.content_frame.setStyleSheet("""
-            QFrame {
-                background-color: #2d2d2d;
-                border-radius: 12px;
-                border: 2px solid #404040;
-            }
-        """)
+        self.content_frame.setProperty("role", "content")
         self.content_layout = QVBoxLayout(self.content_frame)
         self.content_layout.setContentsMargins(30, 30, 30, 30)
         self.layout.addWidget(self.content_frame)
         self.message_label = QLabel()
         self.message_label.setFont(QFont("Segoe UI", 16))
         self.message_label.setAlignment(Qt.AlignCenter)
-        self.message_label.setStyleSheet("""
-            QLabel {
-                color: #ffffff;
-                background-color: #404040;
-                border-radius: 8px;
-                padding: 15px;
-                margin: 10px 0;
-            }
-        """)
+        self.message_label.setProperty("role", "message")
         self.layout.addWidget(self.message_label)
         self._show_login_screen()
         self.layout.addStretch()
@@ -58,10 +71,7 @@ class AdminScreen(BaseScreen):
     
     def _show_login_screen(self):
         """Affiche l'écran de connexion administrateur"""
-        for i in reversed(range(self.content_layout.count())):
-            widget = self.content_layout.itemAt(i).widget()
-            if widget is not None:
-                widget.setParent(None)
+        self.clear_layout(self.content_layout)
         login_instructions = QLabel("""
         🔐 Accès Administrateur
 
@@ -69,29 +79,18 @@ class AdminScreen(BaseScreen):
         """)
         login_instructions.setFont(QFont("Segoe UI", 16))
         login_instructions.setAlignment(Qt.AlignCenter)
-        login_instructions.setStyleSheet("color: #cccccc; margin: 20px 0;")
+        login_instructions.setProperty("role", "instructions")
         self.content_layout.addWidget(login_instructions)
         code_layout = QHBoxLayout()
         code_label = QLabel("Code maître:")
         code_label.setFont(QFont("Segoe UI", 16, QFont.Bold))
-        code_label.setStyleSheet("color: #ffffff;")
+        code_label.setProperty("role", "field")
         code_layout.addWidget(code_label)
         self.master_code_input = QLineEdit()
         self.master_code_input.setFont(QFont("Segoe UI", 18))
         self.master_code_input.setPlaceholderText("Entrez le code maître...")
         self.master_code_input.setEchoMode(QLineEdit.Password)
-        self.master_code_input.setStyleSheet("""
-            QLineEdit {
-                background-color: #404040;
-                border: 2px solid #606060;
-                border-radius: 8px;
-                padding: 12px;
-                color: #ffffff;
-            }
-            QLineEdit:focus {
-                border-color: #0078d4;
-            }
-        """)
+        self.master_code_input.setProperty("role", "code")
         self.master_code_input.returnPressed.connect(self._authenticate)
         code_layout.addWidget(self.master_code_input)
         self.content_layout.addLayout(code_layout)
@@ -101,7 +100,7 @@ class AdminScreen(BaseScreen):
             attempts_label = QLabel(f"⚠️ Tentatives échouées: {self.failed_attempts}/{self.max_attempts}")
             attempts_label.setFont(QFont("Segoe UI", 12))
             attempts_label.setAlignment(Qt.AlignCenter)
-            attempts_label.setStyleSheet("color: #dc3545; margin: 10px 0;")
+            attempts_label.setProperty("role", "warning")
             self.content_layout.addWidget(attempts_label)
     
 
@@ -128,32 +127,12 @@ class AdminScreen(BaseScreen):
     
     def _show_admin_panel(self):
         """Affiche le panneau d'administration principal"""
-        # Nettoyer le contenu existant
-        for i in reversed(range(self.content_layout.count())):
-            self.content_layout.itemAt(i).widget().setParent(None)
+        # Nettoyer le contenu existant (layouts imbriqués de la connexion compris)
+        self.clear_layout(self.content_layout)
         
         # Créer les onglets d'administration
         self.admin_tabs = QTabWidget()
-        self.admin_tabs.setStyleSheet("""
-            QTabWidget::pane {
-                border: 2px solid #404040;
-                border-radius: 8px;
-                background-color: #404040;
-            }
-            QTabBar::tab {
-                background-color: #606060;
-                color: white;
-                padding: 12px 20px;
-                margin: 2px;
-                border-radius: 6px;
-            }
-            QTabBar::tab:selected {
-                background-color: #0078d4;
-            }
-            QTabBar::tab:hover {
-                background-color: #707070;
-            }
-        """)
+        self.admin_tabs.setProperty("role", "admin")
         
         # Onglet État des casiers
         self._create_lockers_tab()
@@ -182,36 +161,19 @@ class AdminScreen(BaseScreen):
         title = QLabel("🔒 État des Casiers")
         title.setFont(QFont("Segoe UI", 20, QFont.Bold))
         title.setAlignment(Qt.AlignCenter)
-        title.setStyleSheet("color: #ffffff; margin: 15px 0;")
+        title.setProperty("role", "section")
         layout.addWidget(title)
         
-        # Tableau des casiers
-        self.lockers_table = QTableWidget()
-        self.lockers_table.setColumnCount(5)
-        self.lockers_table.setHorizontalHeaderLabels([
-            "Casier", "État", "Code Utilisateur", "Début", "Actions"
-        ])
+        # Tableau des casiers (modèle partagé: seules les lignes affichées sont lues)
+        self.lockers_table = QTableView()
+        self.lockers_table.setModel(self.locker_model)
+        self.lockers_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.lockers_table.setSelectionMode(QAbstractItemView.NoSelection)
+        self.lockers_table.verticalHeader().setVisible(False)
+        self.lockers_table.clicked.connect(self._on_lockers_table_clicked)
         
         # Style du tableau
-        self.lockers_table.setStyleSheet("""
-            QTableWidget {
-                background-color: #2d2d2d;
-                color: #ffffff;
-                border: 1px solid #404040;
-                border-radius: 6px;
-            }
-            QTableWidget::item {
-                padding: 8px;
-                border-bottom: 1px solid #404040;
-            }
-            QHeaderView::section {
-                background-color: #404040;
-                color: #ffffff;
-                padding: 10px;
-                border: none;
-                font-weight: bold;
-            }
-        """)
+        self.lockers_table.setProperty("role", "data")
         
         # Ajuster les colonnes
         header = self.lockers_table.horizontalHeader()
@@ -244,66 +206,95 @@ class AdminScreen(BaseScreen):
         title = QLabel("💳 Codes Prépayés")
         title.setFont(QFont("Segoe UI", 20, QFont.Bold))
         title.setAlignment(Qt.AlignCenter)
-        title.setStyleSheet("color: #ffffff; margin: 15px 0;")
+        title.setProperty("role", "section")
         layout.addWidget(title)
         
         # Génération de nouveaux codes
         generation_frame = QFrame()
-        generation_frame.setStyleSheet("""
-            QFrame {
-                background-color: #404040;
-                border-radius: 8px;
-                padding: 15px;
-                margin: 10px 0;
-            }
-        """)
+        generation_frame.setProperty("role", "panel")
         gen_layout = QHBoxLayout(generation_frame)
         
         gen_layout.addWidget(QLabel("Valeur (€):"))
         
         self.code_value_input = QLineEdit("5.00")
-        self.code_value_input.setStyleSheet("""
-            QLineEdit {
-                background-color: #2d2d2d;
-                border: 1px solid #606060;
-                border-radius: 4px;
-                padding: 8px;
-                color: #ffffff;
-            }
-        """)
+        self.code_value_input.setProperty("role", "setting")
         gen_layout.addWidget(self.code_value_input)
         
-        generate_button = self.create_button("➕ Générer Code", self._generate_prepaid_code, "primary")
-        gen_layout.addWidget(generate_button)
+        gen_layout.addWidget(QLabel("Quantité:"))
+        
+        self.code_quantity_input = QSpinBox()
+        self.code_quantity_input.setRange(1, 10000)
+        self.code_quantity_input.setValue(1)
+        self.code_quantity_input.setProperty("role", "setting")
+        gen_layout.addWidget(self.code_quantity_input)
+        
+        self.generate_button = self.create_button("➕ Générer", self._generate_prepaid_code, "primary")
+        gen_layout.addWidget(self.generate_button)
         
         layout.addWidget(generation_frame)
         
-        # Tableau des codes
-        self.codes_table = QTableWidget()
-        self.codes_table.setColumnCount(5)
-        self.codes_table.setHorizontalHeaderLabels([
-            "Code", "Valeur", "Créé", "Expiré", "Utilisé"
-        ])
-        
-        self.codes_table.setStyleSheet("""
-            QTableWidget {
-                background-color: #2d2d2d;
-                color: #ffffff;
-                border: 1px solid #404040;
-                border-radius: 6px;
-            }
-            QTableWidget::item {
-                padding: 8px;
-                border-bottom: 1px solid #404040;
-            }
-            QHeaderView::section {
-                background-color: #404040;
-                color: #ffffff;
-                padding: 10px;
-                border: none;
-                font-weight: bold;
-            }
-        """)
+        # Progression de la génération en lot
+        self.generation_progress = QProgressBar()
+        self.generation_progress.setProperty("role", "progress")
+        self.generation_progress.hide()
+        layout.addWidget(self.generation_progress)
+        
+        # Statistiques des codes
+        self.codes_stats_label = QLabel()
+        self.codes_stats_label.setFont(QFont("Segoe UI", 12))
+        self.codes_stats_label.setAlignment(Qt.AlignCenter)
+        self.codes_stats_label.setProperty("role", "stats")
+        layout.addWidget(self.codes_stats_label)
+        
+        # Filtres (recherche, état, valeur, échéance, lot)
+        filters_layout = QHBoxLayout()
+        
+        self.codes_search_input = QLineEdit()
+        self.codes_search_input.setPlaceholderText("🔍 Code...")
+        self.codes_search_input.setMaxLength(8)
+        self.codes_search_input.textChanged.connect(self._apply_codes_filters)
+        filters_layout.addWidget(self.codes_search_input)
+        
+        filters_layout.addWidget(QLabel("État:"))
+        self.codes_status_filter = QComboBox()
+        for label, status in (("Tous", None), ("🟢 Actifs", 'active'), ("🔴 Utilisés", 'used'), ("⌛ Expirés", 'expired')):
+            self.codes_status_filter.addItem(label, status)
+        self.codes_status_filter.currentIndexChanged.connect(self._apply_codes_filters)
+        filters_layout.addWidget(self.codes_status_filter)
+        
+        filters_layout.addWidget(QLabel("Valeur:"))
+        self.codes_value_filter = QComboBox()
+        self.codes_value_filter.currentIndexChanged.connect(self._apply_codes_filters)
+        filters_layout.addWidget(self.codes_value_filter)
+        
+        filters_layout.addWidget(QLabel("Échéance:"))
+        self.codes_expiry_filter = QComboBox()
+        for label, seconds in (("Toutes", None), ("Sous 24 h", 86400), ("Sous 7 jours", 7 * 86400),
+                               ("Sous 30 jours", 30 * 86400)):
+            self.codes_expiry_filter.addItem(label, seconds)
+        self.codes_expiry_filter.currentIndexChanged.connect(self._apply_codes_filters)
+        filters_layout.addWidget(self.codes_expiry_filter)
+        
+        filters_layout.addWidget(QLabel("Lot:"))
+        self.codes_batch_filter = QComboBox()
+        self.codes_batch_filter.currentIndexChanged.connect(self._apply_codes_filters)
+        filters_layout.addWidget(self.codes_batch_filter)
+        filters_layout.addStretch()
+        
+        layout.addLayout(filters_layout)
+        
+        # Tableau des codes: modèle lu à la demande, trié par le PaymentManager
+        # (tri activé avant l'association au modèle: la première requête est faite
+        # une seule fois, par _reload_codes_table)
+        self.codes_model = PrepaidCodesModel(self.payment_manager, self)
+        self.codes_table = QTableView()
+        self.codes_table.horizontalHeader().setSortIndicator(2, Qt.DescendingOrder)
+        self.codes_table.setSortingEnabled(True)
+        self.codes_table.setModel(self.codes_model)
+        self.codes_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.codes_table.verticalHeader().setVisible(False)
+        
+        self.codes_table.setProperty("role", "data")
         
         header = self.codes_table.horizontalHeader()
         header.setSectionResizeMode(QHeaderView.Stretch)
@@ -311,13 +302,13 @@ class AdminScreen(BaseScreen):
         layout.addWidget(self.codes_table)
         
         # Bouton d'actualisation
-        refresh_codes_button = self.create_button("🔄 Actualiser", self._refresh_codes_table, "secondary")
+        refresh_codes_button = self.create_button("🔄 Actualiser", self._reload_codes_table, "secondary")
         layout.addWidget(refresh_codes_button)
         
         self.admin_tabs.addTab(codes_widget, "💳 Codes")
         
         # Remplir le tableau initial
-        self._refresh_codes_table()
+        self._reload_codes_table()
     
     def _create_maintenance_tab(self):
         """Crée l'onglet de maintenance"""
@@ -328,7 +319,7 @@ class AdminScreen(BaseScreen):
         title = QLabel("🔧 Maintenance")
         title.setFont(QFont("Segoe UI", 20, QFont.Bold))
         title.setAlignment(Qt.AlignCenter)
-        title.setStyleSheet("color: #ffffff; margin: 15px 0;")
+        title.setProperty("role", "section")
         layout.addWidget(title)
         
         # Actions de maintenance
@@ -371,22 +362,13 @@ class AdminScreen(BaseScreen):
         # Zone de logs en temps réel
         logs_label = QLabel("📋 Logs Récents:")
         logs_label.setFont(QFont("Segoe UI", 16, QFont.Bold))
-        logs_label.setStyleSheet("color: #ffffff; margin: 20px 0 10px 0;")
+        logs_label.setProperty("role", "subsection")
         layout.addWidget(logs_label)
         
         self.logs_display = QTextEdit()
         self.logs_display.setReadOnly(True)
         self.logs_display.setMaximumHeight(200)
-        self.logs_display.setStyleSheet("""
-            QTextEdit {
-                background-color: #1e1e1e;
-                color: #00ff00;
-                border: 1px solid #404040;
-                border-radius: 6px;
-                font-family: 'Courier New', monospace;
-                font-size: 12px;
-            }
-        """)
+        self.logs_display.setProperty("role", "logs")
         layout.addWidget(self.logs_display)
         
         self.admin_tabs.addTab(maintenance_widget, "🔧 Maintenance")
@@ -403,7 +385,7 @@ class AdminScreen(BaseScreen):
         title = QLabel("⚙️ Configuration")
         title.setFont(QFont("Segoe UI", 20, QFont.Bold))
         title.setAlignment(Qt.AlignCenter)
-        title.setStyleSheet("color: #ffffff; margin: 15px 0;")
+        title.setProperty("role", "section")
         layout.addWidget(title)
         
         # Paramètres principaux
@@ -412,44 +394,20 @@ class AdminScreen(BaseScreen):
         # Nombre de casiers
         config_grid.addWidget(QLabel("Nombre de casiers:"), 0, 0)
         self.lockers_count_input = QLineEdit(str(self.config.get('lockers.count', 8)))
-        self.lockers_count_input.setStyleSheet("""
-            QLineEdit {
-                background-color: #2d2d2d;
-                border: 1px solid #606060;
-                border-radius: 4px;
-                padding: 8px;
-                color: #ffffff;
-            }
-        """)
+        self.lockers_count_input.setProperty("role", "setting")
         config_grid.addWidget(self.lockers_count_input, 0, 1)
         
         # Timeout de session
         config_grid.addWidget(QLabel("Timeout session (sec):"), 1, 0)
         self.session_timeout_input = QLineEdit(str(self.config.get('security.session_timeout', 300)))
-        self.session_timeout_input.setStyleSheet("""
-            QLineEdit {
-                background-color: #2d2d2d;
-                border: 1px solid #606060;
-                border-radius: 4px;
-                padding: 8px;
-                color: #ffffff;
-            }
-        """)
+        self.session_timeout_input.setProperty("role", "setting")
         config_grid.addWidget(self.session_timeout_input, 1, 1)
         
         # Code maître
         config_grid.addWidget(QLabel("Code maître:"), 2, 0)
         self.master_code_config_input = QLineEdit(self.config.get('security.master_code', '9999'))
         self.master_code_config_input.setEchoMode(QLineEdit.Password)
-        self.master_code_config_input.setStyleSheet("""
-            QLineEdit {
-                background-color: #2d2d2d;
-                border: 1px solid #606060;
-                border-radius: 4px;
-                padding: 8px;
-                color: #ffffff;
-            }
-        """)
+        self.master_code_config_input.setProperty("role", "setting")
         config_grid.addWidget(self.master_code_config_input, 2, 1)
         
         layout.addLayout(config_grid)
@@ -464,85 +422,106 @@ class AdminScreen(BaseScreen):
     
     def _refresh_lockers_table(self):
         """Actualise le tableau des casiers"""
-        locker_count = self.config.get('lockers.count', 8)
-        self.lockers_table.setRowCount(locker_count)
-        
-        for i in range(1, locker_count + 1):
-            row = i - 1
-            
-            # Numéro du casier
-            self.lockers_table.setItem(row, 0, QTableWidgetItem(str(i)))
-            
-            # État
-            is_available = self.locker_manager.is_locker_available(i)
-            status = "🟢 Libre" if is_available else "🔴 Occupé"
-            self.lockers_table.setItem(row, 1, QTableWidgetItem(status))
-            
-            # Informations de session
-            session = self.locker_manager.get_session_info(i)
-            if session:
-                self.lockers_table.setItem(row, 2, QTableWidgetItem(session.user_code))
-                self.lockers_table.setItem(row, 3, QTableWidgetItem(
-                    session.start_time.strftime("%H:%M:%S")
-                ))
-            else:
-                self.lockers_table.setItem(row, 2, QTableWidgetItem("-"))
-                self.lockers_table.setItem(row, 3, QTableWidgetItem("-"))
-            
-            # Bouton d'action
-            if not is_available:
-                action_button = QPushButton("🔓 Libérer")
-                action_button.setStyleSheet("""
-                    QPushButton {
-                        background-color: #dc3545;
-                        color: white;
-                        border-radius: 4px;
-                        padding: 6px 12px;
-                    }
-                    QPushButton:hover {
-                        background-color: #c82333;
-                    }
-                """)
-                action_button.clicked.connect(lambda checked, locker_id=i: self._release_locker(locker_id))
-                self.lockers_table.setCellWidget(row, 4, action_button)
-            else:
-                self.lockers_table.setItem(row, 4, QTableWidgetItem("-"))
+        self.locker_model.reload()
+    
+    def _on_lockers_table_clicked(self, index):
+        """Libère le casier dont la cellule d'action a été touchée"""
+        if index.column() == LockerTableModel.ACTION and not index.data(LockerTableModel.AvailableRole):
+            self._release_locker(index.data(LockerTableModel.LockerIdRole))
+    
+    def _update_codes_stats(self):
+        """Actualise les statistiques des codes prépayés"""
+        stats = self.payment_manager.get_code_statistics()
+        self.codes_stats_label.setText(
+            f"Actifs: {stats['active']} ({stats['active_value']}€) / "
+            f"Utilisés: {stats['used']} / Expirés: {stats['expired']} / Total: {stats['total']}"
+        )
     
     def _refresh_codes_table(self):
-        """Actualise le tableau des codes prépayés"""
-        codes = list(self.payment_manager.prepaid_codes.values())
-        self.codes_table.setRowCount(len(codes))
-        
-        for row, code in enumerate(codes):
-            self.codes_table.setItem(row, 0, QTableWidgetItem(code.code))
-            self.codes_table.setItem(row, 1, QTableWidgetItem(f"{code.value}€"))
-            self.codes_table.setItem(row, 2, QTableWidgetItem(
-                code.created_date.strftime("%d/%m/%Y %H:%M")
-            ))
-            
-            # Vérifier si expiré
-            from datetime import datetime
-            is_expired = datetime.now() > code.expiry_date
-            expired_text = "🔴 Oui" if is_expired else "🟢 Non"
-            self.codes_table.setItem(row, 3, QTableWidgetItem(expired_text))
-            
-            # Vérifier si utilisé
-            used_text = "🔴 Oui" if code.is_used else "🟢 Non"
-            self.codes_table.setItem(row, 4, QTableWidgetItem(used_text))
+        """Actualise les codes affichés (seules les lignes exposées sont relues)"""
+        self._update_codes_stats()
+        self.codes_model.refresh()
+    
+    def _reload_codes_table(self):
+        """Relance la requête des codes et les listes des valeurs et lots proposés aux filtres"""
+        self._update_codes_stats()
+        
+        values = [(f"{value}€", value) for value in self.payment_manager.code_values()]
+        self._fill_filter(self.codes_value_filter, "Toutes", values)
+        
+        batches = [
+            (f"{datetime.fromtimestamp(created_ts).strftime('%d/%m/%Y %H:%M:%S')} - {value}€ x{count}", (created_ts, value))
+            for created_ts, value, count in self.payment_manager.code_batches()
+        ]
+        self._fill_filter(self.codes_batch_filter, "Tous", batches)
+        
+        self._apply_codes_filters()
+    
+    @staticmethod
+    def _fill_filter(combo: QComboBox, all_label: str, items: list):
+        """Remplit un filtre (premier choix: aucun filtrage) en gardant la sélection courante"""
+        current = combo.currentData()
+        combo.blockSignals(True)
+        combo.clear()
+        combo.addItem(all_label, None)
+        for label, data in items:
+            combo.addItem(label, data)
+        combo.setCurrentIndex(max(0, combo.findData(current)))
+        combo.blockSignals(False)
+    
+    def _apply_codes_filters(self):
+        """Filtre le tableau des codes selon la recherche et les filtres choisis"""
+        self.codes_model.set_filters(
+            self.codes_status_filter.currentData(),
+            self.codes_value_filter.currentData(),
+            prefix=self.codes_search_input.text().strip().upper() or None,
+            batch=self.codes_batch_filter.currentData(),
+            expiring_within=self.codes_expiry_filter.currentData()
+        )
     
     def _generate_prepaid_code(self):
-        """Génère un nouveau code prépayé"""
+        """Génère un ou plusieurs codes prépayés"""
         try:
             value = float(self.code_value_input.text())
             if value <= 0:
                 raise ValueError("La valeur doit être positive")
-            
+        except ValueError as e:
+            self._show_message(f"❌ Erreur: {e}", "error")
+            return
+        
+        quantity = self.code_quantity_input.value()
+        if quantity == 1:
             code = self.payment_manager.generate_prepaid_code(value)
             self._show_message(f"✅ Code généré: {code} (valeur: {value}€)", "success")
             self._refresh_codes_table()
-            
-        except ValueError as e:
-            self._show_message(f"❌ Erreur: {e}", "error")
+            return
+        
+        # Génération en lot dans un thread pour ne pas figer l'écran
+        self.generate_button.setEnabled(False)
+        self.generation_progress.setRange(0, quantity)
+        self.generation_progress.setValue(0)
+        self.generation_progress.show()
+        
+        self.generation_worker = CodeGenerationWorker(self.payment_manager, quantity, value)
+        self.generation_worker.progress.connect(self._on_generation_progress)
+        self.generation_worker.completed.connect(
+            lambda codes: self._on_generation_finished(f"✅ {len(codes)} codes générés (valeur: {value}€)", "success")
+        )
+        self.generation_worker.failed.connect(
+            lambda error: self._on_generation_finished(f"❌ Erreur lors de la génération: {error}", "error")
+        )
+        self.generation_worker.start()
+    
+    def _on_generation_progress(self, done: int, total: int):
+        """Met à jour la barre de progression de la génération en lot"""
+        self.generation_progress.setValue(done)
+    
+    def _on_generation_finished(self, message: str, msg_type: str):
+        """Termine une génération en lot"""
+        self.generation_progress.hide()
+        self.generate_button.setEnabled(True)
+        self._show_message(message, msg_type)
+        self._refresh_codes_table()
     
     def _force_open_locker(self):
         """Force l'ouverture d'un casier"""
@@ -616,7 +595,11 @@ class AdminScreen(BaseScreen):
         if reply == QMessageBox.Yes:
             import sys
             import os
-            os.execl(sys.executable, sys.executable, *sys.argv)
+            # Fermeture normale de la fenêtre d'abord: les écritures en attente
+            # (file d'écriture, validation groupée) sont validées avant le remplacement
+            # du processus
+            if self.window().close():
+                os.execl(sys.executable, sys.executable, *sys.argv)
     
     def _export_logs(self):
         """Exporte les logs"""
@@ -679,41 +662,26 @@ class AdminScreen(BaseScreen):
     def _show_message(self, message: str, msg_type: str = "info"):
         """Affiche un message à l'utilisateur"""
         self.message_label.setText(message)
-        
-        if msg_type == "success":
-            self.message_label.setStyleSheet("""
-                QLabel {
-                    color: #ffffff;
-                    background-color: #28a745;
-                    border-radius: 8px;
-                    padding: 15px;
-                    margin: 10px 0;
-                }
-            """)
-        elif msg_type == "error":
-            self.message_label.setStyleSheet("""
-                QLabel {
-                    color: #ffffff;
-                    background-color: #dc3545;
-                    border-radius: 8px;
-                    padding: 15px;
-                    margin: 10px 0;
-                }
-            """)
-        else:  # info
-            self.message_label.setStyleSheet("""
-                QLabel {
-                    color: #ffffff;
-                    background-color: #17a2b8;
-                    border-radius: 8px;
-                    padding: 15px;
-                    margin: 10px 0;
-                }
-            """)
+        set_style_state(self.message_label, "status", msg_type if msg_type in ("success", "error") else "info")
         
         # Effacer le message après 5 secondes
         QTimer.singleShot(5000, lambda: self.message_label.clear())
     
+    def bind_events(self, events):
+        """Suit les changements d'état des codes (le tableau des casiers suit son modèle)"""
+        self.locker_model = events.locker_model
+        events.codes_changed.connect(self._on_codes_changed, Qt.QueuedConnection)
+    
+    def _on_codes_changed(self, change: str, codes: list):
+        """Actualise les codes prépayés affichés"""
+        if self.is_authenticated and hasattr(self, 'admin_tabs'):
+            self._update_codes_stats()
+            if change == 'created':
+                # Nouvelle valeur possible dans le filtre
+                self._reload_codes_table()
+            else:
+                self.codes_model.on_codes_changed(change, codes)
+    
     def refresh(self):
         """Rafraîchit l'écran d'administration"""
         if self.is_authenticated and hasattr(self, 'admin_tabs'):
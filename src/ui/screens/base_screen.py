@@ -2,7 +2,8 @@
 Écran de base pour tous les écrans de l'application
 """
 
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
+                            QStackedWidget, QSizePolicy)
 from PyQt5.QtCore import pyqtSignal, Qt
 from PyQt5.QtGui import QFont
 
@@ -30,15 +31,7 @@ class BaseScreen(QWidget):
         title = QLabel(text)
         title.setFont(QFont("Segoe UI", 28, QFont.Bold))
         title.setAlignment(Qt.AlignCenter)
-        title.setStyleSheet("""
-            QLabel {
-                color: #ffffff;
-                margin: 20px 0;
-                padding: 20px;
-                background-color: #2d2d2d;
-                border-radius: 12px;
-            }
-        """)
+        title.setProperty("role", "title")
         return title
     
     def create_button(self, text: str, callback=None, style_class: str = "primary") -> QPushButton:
@@ -47,61 +40,8 @@ class BaseScreen(QWidget):
         button.setFont(QFont("Segoe UI", 16, QFont.Bold))
         button.setMinimumHeight(60)
         
-        if style_class == "primary":
-            button.setStyleSheet("""
-                QPushButton {
-                    background-color: #0078d4;
-                    color: white;
-                    border: none;
-                    border-radius: 12px;
-                    padding: 16px 32px;
-                    font-size: 16px;
-                    font-weight: bold;
-                }
-                QPushButton:hover {
-                    background-color: #106ebe;
-                }
-                QPushButton:pressed {
-                    background-color: #005a9e;
-                }
-            """)
-        elif style_class == "secondary":
-            button.setStyleSheet("""
-                QPushButton {
-                    background-color: #404040;
-                    color: white;
-                    border: 2px solid #606060;
-                    border-radius: 12px;
-                    padding: 16px 32px;
-                    font-size: 16px;
-                    font-weight: bold;
-                }
-                QPushButton:hover {
-                    background-color: #505050;
-                    border-color: #0078d4;
-                }
-                QPushButton:pressed {
-                    background-color: #303030;
-                }
-            """)
-        elif style_class == "danger":
-            button.setStyleSheet("""
-                QPushButton {
-                    background-color: #d13438;
-                    color: white;
-                    border: none;
-                    border-radius: 12px;
-                    padding: 16px 32px;
-                    font-size: 16px;
-                    font-weight: bold;
-                }
-                QPushButton:hover {
-                    background-color: #b52d32;
-                }
-                QPushButton:pressed {
-                    background-color: #9a252a;
-                }
-            """)
+        # Apparence donnée par la feuille de style de l'application (theme.py)
+        button.setProperty("variant", style_class)
         
         if callback:
             button.clicked.connect(callback)
@@ -126,6 +66,57 @@ class BaseScreen(QWidget):
         
         return nav_layout
     
+    def create_page_stack(self, builders: dict) -> QStackedWidget:
+        """Crée la pile des pages de l'écran
+        
+        `builders` associe un nom de page à la fonction qui remplit son layout: chaque
+        page est construite à sa première visite puis gardée (voir page et show_page).
+        """
+        self.page_builders = builders
+        self.pages = {}
+        self.page_stack = QStackedWidget()
+        self.page_stack.setProperty("role", "pages")
+        return self.page_stack
+    
+    def page(self, name: str) -> QWidget:
+        """Page de la pile, construite à la première demande"""
+        page = self.pages.get(name)
+        if page is None:
+            page = QWidget()
+            page_layout = QVBoxLayout(page)
+            page_layout.setContentsMargins(0, 0, 0, 0)
+            self.page_builders[name](page_layout)
+            self.pages[name] = page
+            self.page_stack.addWidget(page)
+        return page
+    
+    def show_page(self, name: str) -> QWidget:
+        """Affiche une page de la pile
+        
+        L'état de la page est à réinitialiser avant (via page()): le premier
+        affichage a ainsi directement la bonne taille.
+        """
+        page = self.page(name)
+        
+        # Seule la page affichée compte dans la taille de la pile (changement de
+        # politique des pages cachées non propagé: la pile est recalculée ensuite)
+        for other in self.pages.values():
+            policy = QSizePolicy.Preferred if other is page else QSizePolicy.Ignored
+            other.setSizePolicy(policy, policy)
+        self.page_stack.setCurrentWidget(page)
+        self.page_stack.updateGeometry()
+        return page
+    
+    @staticmethod
+    def clear_layout(layout):
+        """Retire tous les éléments d'un layout, widgets des layouts imbriqués compris"""
+        while layout.count():
+            item = layout.takeAt(0)
+            if item.widget() is not None:
+                item.widget().setParent(None)
+            elif item.layout() is not None:
+                BaseScreen.clear_layout(item.layout())
+    
     def go_home(self):
         """Retourne à l'écran d'accueil"""
         self.screen_changed.emit('home', {})
@@ -138,6 +129,13 @@ class BaseScreen(QWidget):
         """Rafraîchit l'écran (à surcharger dans les classes filles)"""
         pass
     
+    def bind_events(self, events):
+        """Abonne l'écran aux changements d'état (à surcharger dans les classes filles)
+        
+        `events` est un ManagerEvents; connecter ses signaux avec Qt.QueuedConnection.
+        """
+        pass
+    
     def set_data(self, data: dict):
         """Définit les données pour l'écran (à surcharger dans les classes filles)"""
         pass
\ No newline at end of file
@@ -3,6 +3,7 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QFont
+from src.ui.locker_model import LockerGridView
 from src.ui.screens.base_screen import BaseScreen
 
 class HomeScreen(BaseScreen):
@@ -31,7 +32,7 @@ class HomeScreen(BaseScreen):
         welcome_title = QLabel("🔋 Bienvenue sur votre borne de recharge")
         welcome_title.setFont(QFont("Segoe UI", 19, QFont.Bold))
         welcome_title.setAlignment(Qt.AlignCenter)
-        welcome_title.setStyleSheet("color: #0078d4; margin-bottom: 4px;")
+        welcome_title.setProperty("role", "welcome")
         scroll_layout.addWidget(welcome_title)
 
         # Cadre état des casiers
@@ -60,50 +61,26 @@ class HomeScreen(BaseScreen):
 
     def _create_status_frame(self) -> QFrame:
         frame = QFrame()
-        frame.setStyleSheet("""
-            QFrame {
-                background-color: #2d2d2d;
-                border-radius: 7px;
-                border: 1px solid #404040;
-            }
-        """)
+        frame.setProperty("role", "summary")
         layout = QVBoxLayout(frame)
         layout.setSpacing(2)
         status_title = QLabel("📊 État des casiers")
         status_title.setFont(QFont("Segoe UI", 10, QFont.Bold))
         status_title.setAlignment(Qt.AlignCenter)
-        status_title.setStyleSheet("color: #ffffff;")
         layout.addWidget(status_title)
-        self.lockers_grid = QGridLayout()
-        self.lockers_grid.setSpacing(3)
-        self._update_lockers_display()
-        layout.addLayout(self.lockers_grid)
+        # Grille virtualisée: seuls les casiers visibles sont dessinés, le modèle
+        # partagé (bind_events) ne signale que les casiers dont l'état a changé
+        self.lockers_view = LockerGridView(cell_size=(63, 24), font_size=8, compact=True)
+        layout.addWidget(self.lockers_view)
         return frame
 
     def _update_lockers_display(self):
-        for i in reversed(range(self.lockers_grid.count())):
-            widget = self.lockers_grid.itemAt(i).widget()
-            if widget:
-                widget.setParent(None)
-        locker_count = self.config.get('lockers.count', 8)
-        cols = 4
-        for i in range(1, locker_count + 1):
-            row = (i - 1) // cols
-            col = (i - 1) % cols
-            is_available = self.locker_manager.is_locker_available(i)
-            locker_widget = QLabel(f"Casier {i}")
-            locker_widget.setAlignment(Qt.AlignCenter)
-            locker_widget.setFont(QFont("Segoe UI", 8, QFont.Bold))
-            locker_widget.setFixedSize(63, 24)
-            if is_available:
-                locker_widget.setStyleSheet(
-                    "background-color: #28a745; color: white; border-radius: 5px; border: 1px solid #20c997;")
-                locker_widget.setText(f"🟢 C{i}\nLIBRE")
-            else:
-                locker_widget.setStyleSheet(
-                    "background-color: #dc3545; color: white; border-radius: 5px; border: 1px solid #c82333;")
-                locker_widget.setText(f"🔴 C{i}\nOCCUPÉ")
-            self.lockers_grid.addWidget(locker_widget, row, col)
+        """Relit l'état des casiers (seuls les casiers modifiés sont redessinés)"""
+        if self.lockers_view.model() is not None:
+            self.lockers_view.model().reload()
+
+    def bind_events(self, events):
+        self.lockers_view.setModel(events.locker_model)
 
     def _create_options_layout(self) -> QVBoxLayout:
         options_layout = QVBoxLayout()
@@ -111,7 +88,7 @@ class HomeScreen(BaseScreen):
         options_title = QLabel("🎯 Choisissez votre méthode d'accès")
         options_title.setFont(QFont("Segoe UI", 13, QFont.Bold))
         options_title.setAlignment(Qt.AlignCenter)
-        options_title.setStyleSheet("color: #ffffff; margin-bottom: 2px;")
+        options_title.setProperty("role", "heading")
         options_layout.addWidget(options_title)
         # Deux lignes, boutons larges et compacts
         options_grid = QGridLayout()
@@ -133,13 +110,7 @@ class HomeScreen(BaseScreen):
         button.setMinimumSize(110, 46)
         button.setMaximumSize(145, 56)
         button.clicked.connect(callback)
-        button.setStyleSheet("""
-            QPushButton {
-                background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                    stop:0 #0078d4, stop:1 #005a9e);
-                color: white; border: none; border-radius: 7px; padding: 2px 2px;
-            }
-        """)
+        button.setProperty("variant", "option")
         return button
 
     def _create_instructions(self) -> QLabel:
@@ -148,8 +119,7 @@ class HomeScreen(BaseScreen):
             "1️⃣ Choisir un mode   2️⃣ Prendre un casier   3️⃣ Placer l'appareil   4️⃣ Garder le code")
         instructions.setFont(QFont("Segoe UI", 7))
         instructions.setAlignment(Qt.AlignCenter)
-        instructions.setStyleSheet(
-            "background-color: #2d2d2d; color: #cccccc; border-radius: 5px; padding: 2px; border: 1px solid #404040;")
+        instructions.setProperty("role", "footnote")
         return instructions
 
     def _go_to_prepaid_payment(self):
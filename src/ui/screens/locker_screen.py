@@ -4,17 +4,25 @@
 
 import secrets
 from PyQt5.QtWidgets import (QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, 
-                            QLineEdit, QPushButton, QFrame, QDialog, QDialogButtonBox)
-from PyQt5.QtCore import Qt, QTimer
+                            QLineEdit, QPushButton, QFrame, QDialog, QDialogButtonBox,
+                            QAbstractItemView)
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
 from PyQt5.QtGui import QFont
 
+from src.core.transactions import ReservationService
+from src.ui.locker_model import LockerTableModel, LockerGridView
 from src.ui.screens.base_screen import BaseScreen
+from src.ui.theme import set_style_state
 
 class LockerScreen(BaseScreen):
     """Écran de sélection et gestion des casiers"""
     
+    # Émis (depuis le thread d'écriture) quand la réservation est enregistrée
+    reservation_saved = pyqtSignal()
+    
     def __init__(self, config, locker_manager, payment_manager):
         super().__init__(config, locker_manager, payment_manager)
+        self.reservations = ReservationService(payment_manager, locker_manager)
         self.access_method = 'digicode'
         self.access_data = {}
         self.selected_locker = None
@@ -29,30 +37,22 @@ class LockerScreen(BaseScreen):
         
         # Zone de contenu principal
         self.content_frame = QFrame()
-        self.content_frame.setStyleSheet("""
-            QFrame {
-                background-color: #2d2d2d;
-                border-radius: 12px;
-                border: 2px solid #404040;
-            }
-        """)
+        self.content_frame.setProperty("role", "content")
         self.content_layout = QVBoxLayout(self.content_frame)
         self.content_layout.setContentsMargins(30, 30, 30, 30)
         self.layout.addWidget(self.content_frame)
         
+        # Pages digicode et sélection, construites à la première visite
+        self.content_layout.addWidget(self.create_page_stack({
+            'digicode': self._build_digicode_page,
+            'selection': self._build_selection_page
+        }))
+        
         # Zone de message
         self.message_label = QLabel()
         self.message_label.setFont(QFont("Segoe UI", 16))
         self.message_label.setAlignment(Qt.AlignCenter)
-        self.message_label.setStyleSheet("""
-            QLabel {
-                color: #ffffff;
-                background-color: #404040;
-                border-radius: 8px;
-                padding: 15px;
-                margin: 10px 0;
-            }
-        """)
+        self.message_label.setProperty("role", "message")
         self.layout.addWidget(self.message_label)
         
         self.layout.addStretch()
@@ -66,20 +66,43 @@ class LockerScreen(BaseScreen):
         self.access_data = data
         self.access_method = data.get('method', 'digicode')
         
-        # Nettoyer le contenu existant
-        for i in reversed(range(self.content_layout.count())):
-            self.content_layout.itemAt(i).widget().setParent(None)
-        
-        # Configurer selon la méthode
+        # Page de la méthode (gardée entre les visites): seul son état est réinitialisé
         if self.access_method == 'digicode':
-            self._setup_digicode_selection()
+            self._show_digicode_selection()
         else:
-            self._setup_locker_selection()
+            self._show_locker_selection()
     
-    def _setup_digicode_selection(self):
-        """Configure l'interface pour la sélection avec digicode"""
+    def _show_digicode_selection(self):
+        """Affiche la page du digicode, saisie vide"""
         self.title_label.setText("🔢 Accès par Digicode Personnel")
+        self.page('digicode')
+        self.digicode_input.clear()
+        self.digicode_input.setEchoMode(QLineEdit.Password)
+        self.validate_digicode_button.setEnabled(False)
+        self.show_page('digicode')
+    
+    def _show_locker_selection(self):
+        """Affiche la page de sélection de casier, sans casier sélectionné"""
+        method_names = {
+            'prepaid': 'Code Prépayé',
+            'qr': 'QR Code',
+            'ussd': 'USSD'
+        }
         
+        method_name = method_names.get(self.access_method, 'Paiement')
+        self.title_label.setText(f"🔒 Sélection de Casier - {method_name}")
+        self.page('selection')
+        
+        self.selected_locker = None
+        self.locker_grid.clearSelection()
+        self.selection_info.setText("Aucun casier sélectionné")
+        set_style_state(self.selection_info, "status", "")
+        self.confirm_selection_button.setEnabled(False)
+        self.auto_button.setEnabled(self.locker_manager.available_count() > 0)
+        self.show_page('selection')
+    
+    def _build_digicode_page(self, layout: QVBoxLayout):
+        """Construit la page de choix du digicode"""
         # Instructions
         instructions = QLabel("""
         🔐 Choisissez votre code personnel à 4 chiffres
@@ -89,15 +112,15 @@ class LockerScreen(BaseScreen):
         """)
         instructions.setFont(QFont("Segoe UI", 14))
         instructions.setAlignment(Qt.AlignCenter)
-        instructions.setStyleSheet("color: #cccccc; margin: 20px 0;")
-        self.content_layout.addWidget(instructions)
+        instructions.setProperty("role", "instructions")
+        layout.addWidget(instructions)
         
         # Sélection du code
         code_layout = QHBoxLayout()
         
         code_label = QLabel("Votre code (4 chiffres):")
         code_label.setFont(QFont("Segoe UI", 16, QFont.Bold))
-        code_label.setStyleSheet("color: #ffffff;")
+        code_label.setProperty("role", "field")
         code_layout.addWidget(code_label)
         
         self.digicode_input = QLineEdit()
@@ -105,23 +128,12 @@ class LockerScreen(BaseScreen):
         self.digicode_input.setPlaceholderText("0000")
         self.digicode_input.setMaxLength(4)
         self.digicode_input.setEchoMode(QLineEdit.Password)
-        self.digicode_input.setStyleSheet("""
-            QLineEdit {
-                background-color: #404040;
-                border: 2px solid #606060;
-                border-radius: 8px;
-                padding: 15px;
-                color: #ffffff;
-                text-align: center;
-            }
-            QLineEdit:focus {
-                border-color: #0078d4;
-            }
-        """)
+        self.digicode_input.setProperty("role", "code")
+        self.digicode_input.setProperty("variant", "digicode")
         self.digicode_input.textChanged.connect(self._on_digicode_changed)
         code_layout.addWidget(self.digicode_input)
         
-        self.content_layout.addLayout(code_layout)
+        layout.addLayout(code_layout)
         
         # Bouton de génération automatique
         generate_button = self.create_button(
@@ -129,10 +141,10 @@ class LockerScreen(BaseScreen):
             self._generate_random_code,
             "secondary"
         )
-        self.content_layout.addWidget(generate_button)
+        layout.addWidget(generate_button)
         
         # Clavier numérique
-        self._create_numeric_keyboard()
+        layout.addWidget(self._create_numeric_keyboard())
         
         # Bouton de validation
         self.validate_digicode_button = self.create_button(
@@ -140,19 +152,10 @@ class LockerScreen(BaseScreen):
             self._confirm_digicode
         )
         self.validate_digicode_button.setEnabled(False)
-        self.content_layout.addWidget(self.validate_digicode_button)
+        layout.addWidget(self.validate_digicode_button)
     
-    def _setup_locker_selection(self):
-        """Configure l'interface pour la sélection de casier"""
-        method_names = {
-            'prepaid': 'Code Prépayé',
-            'qr': 'QR Code',
-            'ussd': 'USSD'
-        }
-        
-        method_name = method_names.get(self.access_method, 'Paiement')
-        self.title_label.setText(f"🔒 Sélection de Casier - {method_name}")
-        
+    def _build_selection_page(self, layout: QVBoxLayout):
+        """Construit la page de sélection de casier"""
         # Instructions
         instructions = QLabel("""
         📦 Choisissez un casier libre pour votre appareil
@@ -162,26 +165,18 @@ class LockerScreen(BaseScreen):
         """)
         instructions.setFont(QFont("Segoe UI", 14))
         instructions.setAlignment(Qt.AlignCenter)
-        instructions.setStyleSheet("color: #cccccc; margin: 20px 0;")
-        self.content_layout.addWidget(instructions)
+        instructions.setProperty("role", "instructions")
+        layout.addWidget(instructions)
         
         # Grille des casiers
-        self._create_locker_grid()
+        layout.addWidget(self._create_locker_grid())
         
         # Informations sur le casier sélectionné
         self.selection_info = QLabel("Aucun casier sélectionné")
         self.selection_info.setFont(QFont("Segoe UI", 16, QFont.Bold))
         self.selection_info.setAlignment(Qt.AlignCenter)
-        self.selection_info.setStyleSheet("""
-            QLabel {
-                color: #ffffff;
-                background-color: #404040;
-                border-radius: 8px;
-                padding: 15px;
-                margin: 15px 0;
-            }
-        """)
-        self.content_layout.addWidget(self.selection_info)
+        self.selection_info.setProperty("role", "selection")
+        layout.addWidget(self.selection_info)
         
         # Bouton de confirmation
         self.confirm_selection_button = self.create_button(
@@ -189,18 +184,20 @@ class LockerScreen(BaseScreen):
             self._confirm_locker_selection
         )
         self.confirm_selection_button.setEnabled(False)
-        self.content_layout.addWidget(self.confirm_selection_button)
+        layout.addWidget(self.confirm_selection_button)
+        
+        # Attribution automatique selon la politique configurée
+        self.auto_button = self.create_button(
+            "⚡ Attribuer un casier automatiquement", 
+            self._reserve_any_locker,
+            "secondary"
+        )
+        layout.addWidget(self.auto_button)
     
-    def _create_numeric_keyboard(self):
+    def _create_numeric_keyboard(self) -> QFrame:
         """Crée un clavier numérique pour la saisie tactile"""
         keyboard_frame = QFrame()
-        keyboard_frame.setStyleSheet("""
-            QFrame {
-                background-color: #404040;
-                border-radius: 8px;
-                margin: 20px 0;
-            }
-        """)
+        keyboard_frame.setProperty("keyboard", "numeric")
         
         keyboard_layout = QGridLayout(keyboard_frame)
         
@@ -220,108 +217,51 @@ class LockerScreen(BaseScreen):
                 
                 if key == '⌫':
                     button.clicked.connect(self._backspace_digicode)
-                    button.setStyleSheet("""
-                        QPushButton {
-                            background-color: #d13438;
-                            color: white;
-                            border-radius: 8px;
-                        }
-                        QPushButton:hover {
-                            background-color: #b52d32;
-                        }
-                    """)
+                    button.setProperty("key", "delete")
                 elif key == '✅':
                     button.clicked.connect(self._confirm_digicode)
-                    button.setStyleSheet("""
-                        QPushButton {
-                            background-color: #28a745;
-                            color: white;
-                            border-radius: 8px;
-                        }
-                        QPushButton:hover {
-                            background-color: #218838;
-                        }
-                    """)
+                    button.setProperty("key", "confirm")
                 else:
                     button.clicked.connect(lambda checked, k=key: self._add_digit(k))
-                    button.setStyleSheet("""
-                        QPushButton {
-                            background-color: #606060;
-                            color: white;
-                            border-radius: 8px;
-                        }
-                        QPushButton:hover {
-                            background-color: #707070;
-                        }
-                    """)
+                    button.setProperty("key", "char")
                 
                 keyboard_layout.addWidget(button, row, col)
         
-        self.content_layout.addWidget(keyboard_frame)
+        return keyboard_frame
     
-    def _create_locker_grid(self):
+    def _create_locker_grid(self) -> QFrame:
         """Crée la grille des casiers sélectionnables"""
         grid_frame = QFrame()
-        grid_frame.setStyleSheet("""
-            QFrame {
-                background-color: #404040;
-                border-radius: 8px;
-                padding: 20px;
-                margin: 20px 0;
-            }
-        """)
-        
-        grid_layout = QGridLayout(grid_frame)
-        
-        locker_count = self.config.get('lockers.count', 8)
-        cols = 4
-        
-        self.locker_buttons = {}
-        
-        for i in range(1, locker_count + 1):
-            row = (i - 1) // cols
-            col = (i - 1) % cols
-            
-            is_available = self.locker_manager.is_locker_available(i)
-            
-            button = QPushButton(f"Casier {i}")
-            button.setFont(QFont("Segoe UI", 14, QFont.Bold))
-            button.setMinimumSize(120, 100)
-            
-            if is_available:
-                button.setStyleSheet("""
-                    QPushButton {
-                        background-color: #28a745;
-                        color: white;
-                        border-radius: 12px;
-                        border: 3px solid #20c997;
-                    }
-                    QPushButton:hover {
-                        background-color: #218838;
-                        border-color: #17a2b8;
-                    }
-                    QPushButton:pressed {
-                        background-color: #1e7e34;
-                    }
-                """)
-                button.setText(f"🟢\nCasier {i}\nLIBRE")
-                button.clicked.connect(lambda checked, locker_id=i: self._select_locker(locker_id))
-            else:
-                button.setStyleSheet("""
-                    QPushButton {
-                        background-color: #dc3545;
-                        color: white;
-                        border-radius: 12px;
-                        border: 3px solid #c82333;
-                    }
-                """)
-                button.setText(f"🔴\nCasier {i}\nOCCUPÉ")
-                button.setEnabled(False)
-            
-            self.locker_buttons[i] = button
-            grid_layout.addWidget(button, row, col)
-        
-        self.content_layout.addWidget(grid_frame)
+        grid_frame.setProperty("role", "panel")
+        grid_frame.setProperty("variant", "grid")
+        
+        grid_layout = QVBoxLayout(grid_frame)
+        
+        # Grille virtualisée alimentée par le modèle partagé des casiers
+        self.locker_grid = LockerGridView(cell_size=(120, 100), font_size=14, compact=False)
+        self.locker_grid.setModel(self.locker_model)
+        self.locker_grid.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.locker_grid.setMinimumHeight(110)
+        self.locker_grid.clicked.connect(self._on_locker_clicked)
+        grid_layout.addWidget(self.locker_grid)
+        
+        # Zoom pour les grandes installations
+        zoom_layout = QHBoxLayout()
+        zoom_layout.addStretch()
+        for text, callback in (("➖", self.locker_grid.zoom_out), ("➕", self.locker_grid.zoom_in)):
+            zoom_button = QPushButton(text)
+            zoom_button.setFixedSize(48, 40)
+            zoom_button.setProperty("role", "zoom")
+            zoom_button.clicked.connect(callback)
+            zoom_layout.addWidget(zoom_button)
+        grid_layout.addLayout(zoom_layout)
+        
+        return grid_frame
+    
+    def _on_locker_clicked(self, index):
+        """Sélectionne le casier cliqué s'il est libre"""
+        if index.data(LockerTableModel.AvailableRole):
+            self._select_locker(index.data(LockerTableModel.LockerIdRole))
     
     def _add_digit(self, digit: str):
         """Ajoute un chiffre au digicode"""
@@ -371,53 +311,16 @@ class LockerScreen(BaseScreen):
     
     def _switch_to_locker_selection(self):
         """Passe à l'interface de sélection de casier"""
-        # Nettoyer le contenu existant
-        for i in reversed(range(self.content_layout.count())):
-            self.content_layout.itemAt(i).widget().setParent(None)
-        
-        # Configurer l'interface de sélection
-        self._setup_locker_selection()
+        self._show_locker_selection()
     
     def _select_locker(self, locker_id: int):
         """Sélectionne un casier"""
-        # Réinitialiser tous les boutons
-        for lid, button in self.locker_buttons.items():
-            if self.locker_manager.is_locker_available(lid):
-                button.setStyleSheet("""
-                    QPushButton {
-                        background-color: #28a745;
-                        color: white;
-                        border-radius: 12px;
-                        border: 3px solid #20c997;
-                    }
-                    QPushButton:hover {
-                        background-color: #218838;
-                        border-color: #17a2b8;
-                    }
-                """)
-        
         # Mettre en surbrillance le casier sélectionné
-        selected_button = self.locker_buttons[locker_id]
-        selected_button.setStyleSheet("""
-            QPushButton {
-                background-color: #0078d4;
-                color: white;
-                border-radius: 12px;
-                border: 3px solid #17a2b8;
-            }
-        """)
+        self.locker_grid.setCurrentIndex(self.locker_model.index_of(locker_id))
         
         self.selected_locker = locker_id
         self.selection_info.setText(f"🎯 Casier {locker_id} sélectionné")
-        self.selection_info.setStyleSheet("""
-            QLabel {
-                color: #ffffff;
-                background-color: #0078d4;
-                border-radius: 8px;
-                padding: 15px;
-                margin: 15px 0;
-            }
-        """)
+        set_style_state(self.selection_info, "status", "selected")
         
         self.confirm_selection_button.setEnabled(True)
         
@@ -429,28 +332,61 @@ class LockerScreen(BaseScreen):
             self._show_message("❌ Veuillez sélectionner un casier", "error")
             return
         
-        # Générer un code utilisateur si nécessaire
-        if self.access_method == 'digicode':
-            user_code = self.access_data.get('user_code', '0000')
+        user_code = self._user_code_for_reservation()
+        
+        # Réserver le casier (la sélection n'est plus modifiable pendant la réservation)
+        self.confirm_selection_button.setEnabled(False)
+        if self._reserve(user_code, self.selected_locker) is not None:
+            self._show_success_dialog(user_code)
         else:
-            # Générer un code aléatoire pour les autres méthodes
-            user_code = ''.join([str(secrets.randbelow(10)) for _ in range(4)])
+            self.confirm_selection_button.setEnabled(True)
+            self._show_message("❌ Erreur lors de la réservation du casier", "error")
+    
+    def _user_code_for_reservation(self) -> str:
+        """Code utilisateur de la réservation (généré si nécessaire)"""
+        if self.access_method == 'digicode':
+            return self.access_data.get('user_code', '0000')
+        # Générer un code aléatoire pour les autres méthodes
+        return ''.join([str(secrets.randbelow(10)) for _ in range(4)])
+    
+    def _reserve(self, user_code: str, locker_id=None):
+        """Réserve un casier (choisi par la politique d'attribution si locker_id est None)
+        
+        Avec un code prépayé ou un paiement QR/USSD, le paiement et la réservation
+        forment une seule transaction. Retourne le casier réservé, ou None.
+        """
+        port_type = self.access_data.get('port_type')
+        
+        if self.access_method == 'prepaid' and self.access_data.get('code'):
+            return self.reservations.redeem_and_reserve(
+                self.access_data['code'], user_code, locker_id, port_type
+            )
+        
+        reference = self.access_data.get('reference')
+        if reference is not None:
+            # Paiement QR/USSD: confirmé et pas encore rattaché à une session
+            return self.reservations.reserve_paid(reference, user_code, locker_id, port_type)
         
-        # Réserver le casier
-        payment_method = self.access_method
         amount = self.access_data.get('amount', 0.0)
+        if locker_id is None:
+            locker_id = self.locker_manager.reserve_any(user_code, self.access_method, amount, port_type)
+        elif not self.locker_manager.reserve_locker(locker_id, user_code, self.access_method, amount):
+            locker_id = None
+        return locker_id
+    
+    def _reserve_any_locker(self):
+        """Réserve le casier proposé par la politique d'attribution"""
+        user_code = self._user_code_for_reservation()
         
-        success = self.locker_manager.reserve_locker(
-            self.selected_locker, 
-            user_code, 
-            payment_method, 
-            amount
-        )
+        locker_id = self._reserve(user_code)
         
-        if success:
-            self._show_success_dialog(user_code)
-        else:
-            self._show_message("❌ Erreur lors de la réservation du casier", "error")
+        if locker_id is None:
+            self._show_message("❌ Aucun casier libre pour le moment", "error")
+            return
+        
+        self.selected_locker = locker_id
+        self.confirm_selection_button.setEnabled(False)
+        self._show_success_dialog(user_code)
     
     def _show_success_dialog(self, user_code: str):
         """Affiche le dialogue de succès avec les informations importantes"""
@@ -458,12 +394,7 @@ class LockerScreen(BaseScreen):
         dialog.setWindowTitle("🎉 Réservation Confirmée")
         dialog.setModal(True)
         dialog.setMinimumSize(500, 400)
-        dialog.setStyleSheet("""
-            QDialog {
-                background-color: #2d2d2d;
-                color: #ffffff;
-            }
-        """)
+        dialog.setProperty("role", "success")
         
         layout = QVBoxLayout(dialog)
         
@@ -471,15 +402,7 @@ class LockerScreen(BaseScreen):
         success_title = QLabel("🎉 Casier Réservé avec Succès!")
         success_title.setFont(QFont("Segoe UI", 24, QFont.Bold))
         success_title.setAlignment(Qt.AlignCenter)
-        success_title.setStyleSheet("""
-            QLabel {
-                color: #28a745;
-                margin: 20px 0;
-                padding: 20px;
-                background-color: #404040;
-                border-radius: 12px;
-            }
-        """)
+        success_title.setProperty("role", "success-title")
         layout.addWidget(success_title)
         
         # Informations importantes
@@ -500,35 +423,29 @@ class LockerScreen(BaseScreen):
         info_label = QLabel(info_text)
         info_label.setFont(QFont("Segoe UI", 14))
         info_label.setAlignment(Qt.AlignCenter)
-        info_label.setStyleSheet("""
-            QLabel {
-                color: #ffffff;
-                background-color: #404040;
-                border-radius: 8px;
-                padding: 20px;
-                margin: 10px 0;
-                line-height: 1.6;
-            }
-        """)
+        info_label.setProperty("role", "notice")
         layout.addWidget(info_label)
         
+        # État de l'enregistrement: confirmé seulement une fois la réservation écrite
+        save_status = QLabel("⏳ Enregistrement de la réservation...")
+        save_status.setFont(QFont("Segoe UI", 12))
+        save_status.setAlignment(Qt.AlignCenter)
+        save_status.setProperty("role", "save-status")
+        layout.addWidget(save_status)
+        
+        def on_saved():
+            save_status.setText("💾 Réservation enregistrée")
+            set_style_state(save_status, "status", "saved")
+        
+        self.reservation_saved.connect(on_saved)
+        self.locker_manager.when_saved(self.reservation_saved.emit)
+        
         # Boutons
         button_box = QDialogButtonBox()
         
         ok_button = QPushButton("✅ J'ai noté mon code")
         ok_button.setFont(QFont("Segoe UI", 14, QFont.Bold))
-        ok_button.setStyleSheet("""
-            QPushButton {
-                background-color: #28a745;
-                color: white;
-                border-radius: 8px;
-                padding: 12px 24px;
-                min-width: 200px;
-            }
-            QPushButton:hover {
-                background-color: #218838;
-            }
-        """)
+        ok_button.setProperty("variant", "confirm")
         ok_button.clicked.connect(dialog.accept)
         
         button_box.addButton(ok_button, QDialogButtonBox.AcceptRole)
@@ -536,6 +453,7 @@ class LockerScreen(BaseScreen):
         
         # Afficher le dialogue
         result = dialog.exec_()
+        self.reservation_saved.disconnect(on_saved)
         
         if result == QDialog.Accepted:
             # Retourner à l'écran d'accueil
@@ -544,71 +462,30 @@ class LockerScreen(BaseScreen):
     def _show_message(self, message: str, msg_type: str = "info"):
         """Affiche un message à l'utilisateur"""
         self.message_label.setText(message)
-        
-        if msg_type == "success":
-            self.message_label.setStyleSheet("""
-                QLabel {
-                    color: #ffffff;
-                    background-color: #28a745;
-                    border-radius: 8px;
-                    padding: 15px;
-                    margin: 10px 0;
-                }
-            """)
-        elif msg_type == "error":
-            self.message_label.setStyleSheet("""
-                QLabel {
-                    color: #ffffff;
-                    background-color: #dc3545;
-                    border-radius: 8px;
-                    padding: 15px;
-                    margin: 10px 0;
-                }
-            """)
-        else:  # info
-            self.message_label.setStyleSheet("""
-                QLabel {
-                    color: #ffffff;
-                    background-color: #17a2b8;
-                    border-radius: 8px;
-                    padding: 15px;
-                    margin: 10px 0;
-                }
-            """)
+        set_style_state(self.message_label, "status", msg_type if msg_type in ("success", "error") else "info")
         
         # Effacer le message après 5 secondes
         QTimer.singleShot(5000, lambda: self.message_label.clear())
     
     def refresh(self):
         """Rafraîchit l'écran des casiers"""
-        if hasattr(self, 'locker_buttons'):
-            # Mettre à jour l'état des boutons de casiers
-            for locker_id, button in self.locker_buttons.items():
-                is_available = self.locker_manager.is_locker_available(locker_id)
-                
-                if is_available:
-                    button.setEnabled(True)
-                    button.setText(f"🟢\nCasier {locker_id}\nLIBRE")
-                    button.setStyleSheet("""
-                        QPushButton {
-                            background-color: #28a745;
-                            color: white;
-                            border-radius: 12px;
-                            border: 3px solid #20c997;
-                        }
-                        QPushButton:hover {
-                            background-color: #218838;
-                            border-color: #17a2b8;
-                        }
-                    """)
-                else:
-                    button.setEnabled(False)
-                    button.setText(f"🔴\nCasier {locker_id}\nOCCUPÉ")
-                    button.setStyleSheet("""
-                        QPushButton {
-                            background-color: #dc3545;
-                            color: white;
-                            border-radius: 12px;
-                            border: 3px solid #c82333;
-                        }
-                    """)
\ No newline at end of file
+        # Seuls les casiers dont l'état a changé sont redessinés
+        self.locker_model.reload()
+    
+    def bind_events(self, events):
+        """Suit les changements d'état des casiers affichés"""
+        self.locker_model = events.locker_model
+        events.locker_changed.connect(self._on_locker_changed, Qt.QueuedConnection)
+    
+    def _on_locker_changed(self, locker_id: int, is_occupied: bool, reason: str):
+        """Annule la sélection d'un casier pris entre-temps (la grille suit le modèle)"""
+        confirm_button = getattr(self, 'confirm_selection_button', None)
+        
+        # Casier sélectionné pris entre-temps (autre borne, administration)
+        if is_occupied and locker_id == self.selected_locker and confirm_button and confirm_button.isEnabled():
+            self.selected_locker = None
+            self.locker_grid.clearSelection()
+            confirm_button.setEnabled(False)
+            self.selection_info.setText("Aucun casier sélectionné")
+            set_style_state(self.selection_info, "status", "")
+            self._show_message(f"⚠️ Le casier {locker_id} n'est plus disponible", "error")
\ No newline at end of file
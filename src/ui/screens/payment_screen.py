@@ -2,22 +2,47 @@
 Écran de paiement de la borne
 """
 
-import qrcode
-from io import BytesIO
 from PyQt5.QtWidgets import (QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, 
                             QPushButton, QFrame, QTextEdit, QGridLayout)
 from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QFont, QPixmap
 
+from src.core.pending_payments import DuplicateReferenceError
+from src.core.qr_pool import QrPaymentPool
+from src.ui.qr_renderer import render_qr
 from src.ui.screens.base_screen import BaseScreen
+from src.ui.theme import set_style_state
 
 class PaymentScreen(BaseScreen):
     """Écran de gestion des paiements"""
     
+    USSD_INSTRUCTIONS = """
+        📞 Composez le code USSD suivant sur votre téléphone:
+        
+        {ussd_code}
+        
+        Référence du paiement: {reference}
+        
+        Suivez les instructions sur votre téléphone pour effectuer le paiement
+        Une fois le paiement confirmé, appuyez sur "Paiement effectué"
+        """
+    
+    PAYMENT_AMOUNT = 5.0  # Prix fixe pour l'exemple
+    QR_SIZE = 300
+    
     def __init__(self, config, locker_manager, payment_manager):
         super().__init__(config, locker_manager, payment_manager)
         self.payment_method = 'prepaid'
         self.payment_data = {}
+        self.qr_reference = None
+        self.ussd_reference = None
+        
+        # Demandes de paiement QR (référence, URL, image) préparées en arrière-plan
+        self.qr_pool = QrPaymentPool(
+            payment_manager, lambda url: render_qr(url, self.QR_SIZE), self.PAYMENT_AMOUNT,
+            capacity=config.get('payment.qr_pool_size', 3),
+            ttl=config.get('payment.qr_pool_ttl', 120)
+        )
     
     def setup_ui(self):
         """Configure l'interface de l'écran de paiement"""
@@ -29,30 +54,23 @@ class PaymentScreen(BaseScreen):
         
         # Zone de contenu principal
         self.content_frame = QFrame()
-        self.content_frame.setStyleSheet("""
-            QFrame {
-                background-color: #2d2d2d;
-                border-radius: 12px;
-                border: 2px solid #404040;
-            }
-        """)
+        self.content_frame.setProperty("role", "content")
         self.content_layout = QVBoxLayout(self.content_frame)
         self.content_layout.setContentsMargins(30, 30, 30, 30)
         self.layout.addWidget(self.content_frame)
         
+        # Une page par méthode de paiement, construite à la première visite
+        self.content_layout.addWidget(self.create_page_stack({
+            'prepaid': self._build_prepaid_page,
+            'qr': self._build_qr_page,
+            'ussd': self._build_ussd_page
+        }))
+        
         # Zone de message
         self.message_label = QLabel()
         self.message_label.setFont(QFont("Segoe UI", 16))
         self.message_label.setAlignment(Qt.AlignCenter)
-        self.message_label.setStyleSheet("""
-            QLabel {
-                color: #ffffff;
-                background-color: #404040;
-                border-radius: 8px;
-                padding: 15px;
-                margin: 10px 0;
-            }
-        """)
+        self.message_label.setProperty("role", "message")
         self.layout.addWidget(self.message_label)
         
         self.layout.addStretch()
@@ -66,22 +84,53 @@ class PaymentScreen(BaseScreen):
         self.payment_data = data
         self.payment_method = data.get('method', 'prepaid')
         
-        # Nettoyer le contenu existant
-        for i in reversed(range(self.content_layout.count())):
-            self.content_layout.itemAt(i).widget().setParent(None)
-        
-        # Configurer selon la méthode
+        # Page de la méthode (gardée entre les visites): seul son état est réinitialisé
         if self.payment_method == 'prepaid':
-            self._setup_prepaid_payment()
+            self._show_prepaid_payment()
         elif self.payment_method == 'qr':
-            self._setup_qr_payment()
+            self._show_qr_payment()
         elif self.payment_method == 'ussd':
-            self._setup_ussd_payment()
+            self._show_ussd_payment()
     
-    def _setup_prepaid_payment(self):
-        """Configure l'interface pour le paiement par code prépayé"""
+    def _show_prepaid_payment(self):
+        """Affiche la page du paiement par code prépayé, saisie vide"""
         self.title_label.setText("💳 Paiement par Code Prépayé")
+        self.page('prepaid')
+        self.code_input.clear()
+        self.validate_button.setEnabled(False)
+        self.show_page('prepaid')
+    
+    def _show_qr_payment(self):
+        """Affiche la page du paiement QR avec un nouveau QR code"""
+        self.title_label.setText("📱 Paiement par QR Code")
+        self.page('qr')
+        self._generate_qr_code()
+        self.show_page('qr')
+    
+    def _show_ussd_payment(self):
+        """Affiche la page du paiement USSD"""
+        self.title_label.setText("📞 Paiement par USSD")
+        self.page('ussd')
+        
+        # Nouvelle demande de paiement, retrouvée par sa référence à la confirmation
+        # (une référence attribuée entre-temps à un paiement QR est remplacée)
+        while True:
+            self.ussd_reference = self.payment_manager.new_payment_reference()
+            try:
+                self.payment_manager.register_pending_payment(self.ussd_reference, 'ussd', self.PAYMENT_AMOUNT)
+                break
+            except DuplicateReferenceError:
+                continue
         
+        ussd_code = self.payment_manager.get_ussd_code()
+        self.ussd_instructions.setText(self.USSD_INSTRUCTIONS.format(
+            ussd_code=ussd_code, reference=self.ussd_reference
+        ))
+        self.ussd_display.setText(ussd_code)
+        self.show_page('ussd')
+    
+    def _build_prepaid_page(self, layout: QVBoxLayout):
+        """Construit la page du paiement par code prépayé"""
         # Instructions
         instructions = QLabel("""
         🎫 Entrez votre code prépayé acheté en boutique
@@ -91,39 +140,27 @@ class PaymentScreen(BaseScreen):
         """)
         instructions.setFont(QFont("Segoe UI", 14))
         instructions.setAlignment(Qt.AlignCenter)
-        instructions.setStyleSheet("color: #cccccc; margin: 20px 0;")
-        self.content_layout.addWidget(instructions)
+        instructions.setProperty("role", "instructions")
+        layout.addWidget(instructions)
         
         # Champ de saisie du code
         code_layout = QHBoxLayout()
         
         code_label = QLabel("Code prépayé:")
         code_label.setFont(QFont("Segoe UI", 16, QFont.Bold))
-        code_label.setStyleSheet("color: #ffffff;")
+        code_label.setProperty("role", "field")
         code_layout.addWidget(code_label)
         
         self.code_input = QLineEdit()
         self.code_input.setFont(QFont("Segoe UI", 16))
         self.code_input.setPlaceholderText("Entrez votre code...")
         self.code_input.setMaxLength(8)
-        self.code_input.setStyleSheet("""
-            QLineEdit {
-                background-color: #404040;
-                border: 2px solid #606060;
-                border-radius: 8px;
-                padding: 12px;
-                color: #ffffff;
-                font-size: 18px;
-                text-transform: uppercase;
-            }
-            QLineEdit:focus {
-                border-color: #0078d4;
-            }
-        """)
+        self.code_input.setProperty("role", "code")
+        self.code_input.setProperty("variant", "prepaid")
         self.code_input.textChanged.connect(self._on_code_changed)
         code_layout.addWidget(self.code_input)
         
-        self.content_layout.addLayout(code_layout)
+        layout.addLayout(code_layout)
         
         # Bouton de validation
         self.validate_button = self.create_button(
@@ -131,15 +168,13 @@ class PaymentScreen(BaseScreen):
             self._validate_prepaid_code
         )
         self.validate_button.setEnabled(False)
-        self.content_layout.addWidget(self.validate_button)
+        layout.addWidget(self.validate_button)
         
         # Clavier virtuel
-        self._create_virtual_keyboard()
+        layout.addWidget(self._create_virtual_keyboard())
     
-    def _setup_qr_payment(self):
-        """Configure l'interface pour le paiement QR"""
-        self.title_label.setText("📱 Paiement par QR Code")
-        
+    def _build_qr_page(self, layout: QVBoxLayout):
+        """Construit la page du paiement QR (QR code et référence mis à jour à chaque visite)"""
         # Instructions
         instructions = QLabel("""
         📱 Scannez le QR code avec votre téléphone
@@ -149,11 +184,20 @@ class PaymentScreen(BaseScreen):
         """)
         instructions.setFont(QFont("Segoe UI", 14))
         instructions.setAlignment(Qt.AlignCenter)
-        instructions.setStyleSheet("color: #cccccc; margin: 20px 0;")
-        self.content_layout.addWidget(instructions)
+        instructions.setProperty("role", "instructions")
+        layout.addWidget(instructions)
         
-        # Génération et affichage du QR code
-        self._generate_qr_code()
+        # QR code et référence
+        self.qr_label = QLabel()
+        self.qr_label.setAlignment(Qt.AlignCenter)
+        self.qr_label.setProperty("role", "qr")
+        layout.addWidget(self.qr_label)
+        
+        self.qr_reference_label = QLabel()
+        self.qr_reference_label.setFont(QFont("Segoe UI", 14, QFont.Bold))
+        self.qr_reference_label.setAlignment(Qt.AlignCenter)
+        self.qr_reference_label.setProperty("role", "reference")
+        layout.addWidget(self.qr_reference_label)
         
         # Bouton de rafraîchissement
         refresh_button = self.create_button(
@@ -161,59 +205,35 @@ class PaymentScreen(BaseScreen):
             self._generate_qr_code,
             "secondary"
         )
-        self.content_layout.addWidget(refresh_button)
+        layout.addWidget(refresh_button)
     
-    def _setup_ussd_payment(self):
-        """Configure l'interface pour le paiement USSD"""
-        self.title_label.setText("📞 Paiement par USSD")
-        
+    def _build_ussd_page(self, layout: QVBoxLayout):
+        """Construit la page du paiement USSD (code affiché à chaque visite)"""
         # Instructions
-        ussd_code = self.payment_manager.get_ussd_code()
-        instructions = QLabel(f"""
-        📞 Composez le code USSD suivant sur votre téléphone:
-        
-        {ussd_code}
-        
-        Suivez les instructions sur votre téléphone pour effectuer le paiement
-        Une fois le paiement confirmé, appuyez sur "Paiement effectué"
-        """)
-        instructions.setFont(QFont("Segoe UI", 14))
-        instructions.setAlignment(Qt.AlignCenter)
-        instructions.setStyleSheet("color: #cccccc; margin: 20px 0;")
-        self.content_layout.addWidget(instructions)
+        self.ussd_instructions = QLabel()
+        self.ussd_instructions.setFont(QFont("Segoe UI", 14))
+        self.ussd_instructions.setAlignment(Qt.AlignCenter)
+        self.ussd_instructions.setProperty("role", "instructions")
+        layout.addWidget(self.ussd_instructions)
         
         # Code USSD en grand
-        ussd_display = QLabel(ussd_code)
-        ussd_display.setFont(QFont("Segoe UI", 36, QFont.Bold))
-        ussd_display.setAlignment(Qt.AlignCenter)
-        ussd_display.setStyleSheet("""
-            QLabel {
-                color: #0078d4;
-                background-color: #404040;
-                border-radius: 12px;
-                padding: 30px;
-                border: 3px solid #0078d4;
-            }
-        """)
-        self.content_layout.addWidget(ussd_display)
+        self.ussd_display = QLabel()
+        self.ussd_display.setFont(QFont("Segoe UI", 36, QFont.Bold))
+        self.ussd_display.setAlignment(Qt.AlignCenter)
+        self.ussd_display.setProperty("role", "ussd")
+        layout.addWidget(self.ussd_display)
         
         # Bouton de confirmation
         confirm_button = self.create_button(
             "✅ Paiement effectué", 
             self._confirm_ussd_payment
         )
-        self.content_layout.addWidget(confirm_button)
+        layout.addWidget(confirm_button)
     
-    def _create_virtual_keyboard(self):
+    def _create_virtual_keyboard(self) -> QFrame:
         """Crée un clavier virtuel pour la saisie tactile"""
         keyboard_frame = QFrame()
-        keyboard_frame.setStyleSheet("""
-            QFrame {
-                background-color: #404040;
-                border-radius: 8px;
-                margin-top: 20px;
-            }
-        """)
+        keyboard_frame.setProperty("keyboard", "alpha")
         
         keyboard_layout = QGridLayout(keyboard_frame)
         
@@ -238,56 +258,20 @@ class PaymentScreen(BaseScreen):
                     
                     if key == '⌫':
                         button.clicked.connect(self._backspace)
-                        button.setStyleSheet("""
-                            QPushButton {
-                                background-color: #d13438;
-                                color: white;
-                                border-radius: 6px;
-                            }
-                            QPushButton:hover {
-                                background-color: #b52d32;
-                            }
-                        """)
+                        button.setProperty("key", "delete")
                     elif key == '🔄':
                         button.clicked.connect(self._clear_input)
-                        button.setStyleSheet("""
-                            QPushButton {
-                                background-color: #ffc107;
-                                color: black;
-                                border-radius: 6px;
-                            }
-                            QPushButton:hover {
-                                background-color: #e0a800;
-                            }
-                        """)
+                        button.setProperty("key", "clear")
                     elif key == '✅':
                         button.clicked.connect(self._validate_prepaid_code)
-                        button.setStyleSheet("""
-                            QPushButton {
-                                background-color: #28a745;
-                                color: white;
-                                border-radius: 6px;
-                            }
-                            QPushButton:hover {
-                                background-color: #218838;
-                            }
-                        """)
+                        button.setProperty("key", "confirm")
                     else:
                         button.clicked.connect(lambda checked, k=key: self._add_character(k))
-                        button.setStyleSheet("""
-                            QPushButton {
-                                background-color: #606060;
-                                color: white;
-                                border-radius: 6px;
-                            }
-                            QPushButton:hover {
-                                background-color: #707070;
-                            }
-                        """)
+                        button.setProperty("key", "char")
                     
                     keyboard_layout.addWidget(button, row, col)
         
-        self.content_layout.addWidget(keyboard_frame)
+        return keyboard_frame
     
     def _add_character(self, char: str):
         """Ajoute un caractère au champ de saisie"""
@@ -328,119 +312,87 @@ class PaymentScreen(BaseScreen):
             # Code valide, aller à la sélection de casier
             self._show_message(f"✅ Code valide! Valeur: {prepaid_code.value}€", "success")
             
-            # Utiliser le code
-            if self.payment_manager.use_prepaid_code(code):
-                # Aller à la sélection de casier
-                QTimer.singleShot(2000, lambda: self.screen_changed.emit('locker', {
-                    'method': 'prepaid',
-                    'code': code,
-                    'amount': prepaid_code.value
-                }))
+            # Aller à la sélection de casier: le code n'est utilisé qu'au moment de la
+            # réservation, dans la même transaction
+            QTimer.singleShot(2000, lambda: self.screen_changed.emit('locker', {
+                'method': 'prepaid',
+                'code': code,
+                'amount': prepaid_code.value
+            }))
         else:
             self._show_message("❌ Code invalide, expiré ou déjà utilisé", "error")
     
     def _generate_qr_code(self):
-        """Génère et affiche un QR code pour le paiement"""
-        import uuid
-        
-        # Générer une référence unique
-        reference = str(uuid.uuid4())[:8].upper()
-        amount = 5.0  # Prix fixe pour l'exemple
-        
-        # Générer l'URL de paiement
-        payment_url = self.payment_manager.generate_qr_payment_url(amount, reference)
-        
-        # Créer le QR code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(payment_url)
-        qr.make(fit=True)
-        
-        # Convertir en image
-        qr_image = qr.make_image(fill_color="black", back_color="white")
-        
-        # Convertir pour Qt
-        buffer = BytesIO()
-        qr_image.save(buffer, format='PNG')
-        buffer.seek(0)
-        
-        pixmap = QPixmap()
-        pixmap.loadFromData(buffer.getvalue())
-        
-        # Afficher le QR code
-        if hasattr(self, 'qr_label'):
-            self.qr_label.setParent(None)
+        """Affiche une nouvelle demande de paiement QR (préparée à l'avance)"""
+        # Une demande préparée dont la référence a été attribuée entre-temps est écartée
+        while True:
+            payment = self.qr_pool.take()
+            try:
+                self.payment_manager.register_pending_payment(payment.reference, 'qr', payment.amount)
+                break
+            except DuplicateReferenceError:
+                continue
+        self.qr_reference = payment.reference
+        
+        # Afficher le QR code et sa référence (labels de la page QR)
+        self.qr_label.setPixmap(QPixmap.fromImage(payment.image))
+        self.qr_reference_label.setText(f"Référence: {payment.reference}")
+        
+        self._show_message(f"💡 QR Code généré - Référence: {payment.reference}", "info")
+    
+    def shutdown(self):
+        """Arrête la préparation des paiements QR (fermeture de l'application)"""
+        self.qr_pool.close()
+    
+    def _confirm_ussd_payment(self):
+        """Le client indique avoir payé par USSD"""
+        if self.payment_manager.get_pending_payment(self.ussd_reference) is None:
+            self._show_ussd_payment()
+            self._show_message("❌ Demande de paiement expirée, veuillez utiliser la nouvelle référence", "error")
+            return
         
-        self.qr_label = QLabel()
-        self.qr_label.setPixmap(pixmap.scaled(300, 300, Qt.KeepAspectRatio, Qt.SmoothTransformation))
-        self.qr_label.setAlignment(Qt.AlignCenter)
-        self.qr_label.setStyleSheet("""
-            QLabel {
-                background-color: white;
-                border-radius: 12px;
-                padding: 20px;
-                margin: 20px 0;
-            }
-        """)
-        self.content_layout.insertWidget(1, self.qr_label)
+        if self.payment_manager.has_payment_provider:
+            # Confirmation attendue du fournisseur (événement payment_changed), sans bloquer l'écran
+            self.payment_manager.check_payment_status(self.ussd_reference)
+            self._show_message("⏳ Vérification du paiement en cours...", "info")
+            return
         
-        # Afficher la référence
-        ref_label = QLabel(f"Référence: {reference}")
-        ref_label.setFont(QFont("Segoe UI", 14, QFont.Bold))
-        ref_label.setAlignment(Qt.AlignCenter)
-        ref_label.setStyleSheet("color: #0078d4; margin: 10px 0;")
-        self.content_layout.insertWidget(2, ref_label)
+        # Sans fournisseur configuré, le paiement déclaré par le client est accepté
+        payment = self.payment_manager.confirm_pending_payment(self.ussd_reference)
+        if payment is not None:
+            self._proceed_to_locker(payment.method, payment.reference, payment.amount)
+    
+    def bind_events(self, events):
+        """Suit les confirmations des paiements QR et USSD"""
+        events.payment_changed.connect(self._on_payment_changed, Qt.QueuedConnection)
+    
+    def _on_payment_changed(self, reference: str, status: str, amount: float):
+        """Passe à la sélection du casier quand le paiement affiché est confirmé"""
+        if not self.isVisible():
+            return
+        method = self.payment_method
+        if reference != {'qr': self.qr_reference, 'ussd': self.ussd_reference}.get(method):
+            return
         
-        self._show_message(f"💡 QR Code généré - Référence: {reference}", "info")
+        if status == 'confirmed':
+            self._proceed_to_locker(method, reference, amount)
+        else:
+            self._show_message("❌ Paiement refusé, veuillez réessayer", "error")
     
-    def _confirm_ussd_payment(self):
-        """Confirme le paiement USSD"""
-        # Dans un vrai système, on vérifierait le paiement via API
+    def _proceed_to_locker(self, method: str, reference: str, amount: float):
+        """Annonce le paiement confirmé puis ouvre la sélection du casier"""
         self._show_message("✅ Paiement confirmé! Redirection vers la sélection de casier...", "success")
         
         QTimer.singleShot(2000, lambda: self.screen_changed.emit('locker', {
-            'method': 'ussd',
-            'amount': 5.0
+            'method': method,
+            'amount': amount,
+            'reference': reference
         }))
     
     def _show_message(self, message: str, msg_type: str = "info"):
         """Affiche un message à l'utilisateur"""
         self.message_label.setText(message)
-        
-        if msg_type == "success":
-            self.message_label.setStyleSheet("""
-                QLabel {
-                    color: #ffffff;
-                    background-color: #28a745;
-                    border-radius: 8px;
-                    padding: 15px;
-                    margin: 10px 0;
-                }
-            """)
-        elif msg_type == "error":
-            self.message_label.setStyleSheet("""
-                QLabel {
-                    color: #ffffff;
-                    background-color: #dc3545;
-                    border-radius: 8px;
-                    padding: 15px;
-                    margin: 10px 0;
-                }
-            """)
-        else:  # info
-            self.message_label.setStyleSheet("""
-                QLabel {
-                    color: #ffffff;
-                    background-color: #17a2b8;
-                    border-radius: 8px;
-                    padding: 15px;
-                    margin: 10px 0;
-                }
-            """)
+        set_style_state(self.message_label, "status", msg_type if msg_type in ("success", "error") else "info")
         
         # Effacer le message après 5 secondes
         QTimer.singleShot(5000, lambda: self.message_label.clear())
\ No newline at end of file
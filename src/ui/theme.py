@@ -0,0 +1,528 @@
+"""
+Thème sombre de l'application: une seule feuille de style, états par propriétés dynamiques
+"""
+
+from PyQt5.QtWidgets import QApplication, QWidget
+
+# Feuille de style de l'application, analysée une seule fois au démarrage.
+# Les widgets déclarent leur rôle par propriétés dynamiques (role, variant, key,
+# keyboard) et leur état par la propriété status: changer d'état ne demande que
+# de repolir le widget concerné (voir set_style_state).
+#
+# À spécificité égale la dernière règle l'emporte: les règles génériques
+# (QPushButton, QFrame...) précèdent donc les règles par rôle.
+APP_STYLESHEET = """
+    QMainWindow {
+        background-color: #1e1e1e;
+        color: #ffffff;
+    }
+
+    QLabel {
+        color: #ffffff;
+        font-family: 'Segoe UI', Arial, sans-serif;
+    }
+
+    QPushButton {
+        background-color: #0078d4;
+        color: white;
+        border: none;
+        border-radius: 8px;
+        padding: 12px 24px;
+        font-size: 14px;
+        font-weight: bold;
+        min-height: 40px;
+    }
+
+    QPushButton:hover {
+        background-color: #106ebe;
+    }
+
+    QPushButton:pressed {
+        background-color: #005a9e;
+    }
+
+    QPushButton:disabled {
+        background-color: #404040;
+        color: #808080;
+    }
+
+    QLineEdit {
+        background-color: #2d2d2d;
+        border: 2px solid #404040;
+        border-radius: 6px;
+        padding: 8px 12px;
+        color: #ffffff;
+        font-size: 14px;
+        min-height: 20px;
+    }
+
+    QLineEdit:focus {
+        border-color: #0078d4;
+    }
+
+    QFrame {
+        background-color: #2d2d2d;
+        border-radius: 8px;
+    }
+
+    /* Zone de contenu des écrans: ses cadres et textes sont encadrés comme elle */
+    *[role="content"] QFrame,
+    QFrame[role="content"] {
+        background-color: #2d2d2d;
+        border-radius: 12px;
+        border: 2px solid #404040;
+    }
+
+    /* Pile des pages d'un écran: transparente, seules ses pages sont encadrées */
+    QStackedWidget[role="pages"] {
+        background-color: transparent;
+        border: none;
+    }
+
+    /* Textes */
+    QLabel[role="title"] {
+        color: #ffffff;
+        margin: 20px 0;
+        padding: 20px;
+        background-color: #2d2d2d;
+        border-radius: 12px;
+    }
+
+    QLabel[role="section"] {
+        color: #ffffff;
+        margin: 15px 0;
+    }
+
+    QLabel[role="instructions"] {
+        color: #cccccc;
+        margin: 20px 0;
+    }
+
+    QLabel[role="field"] {
+        color: #ffffff;
+    }
+
+    /* Zone de message: neutre, puis selon le type du dernier message */
+    QLabel[role="message"] {
+        color: #ffffff;
+        background-color: #404040;
+        border-radius: 8px;
+        padding: 15px;
+        margin: 10px 0;
+    }
+
+    QLabel[role="message"][status="success"] {
+        background-color: #28a745;
+    }
+
+    QLabel[role="message"][status="error"] {
+        background-color: #dc3545;
+    }
+
+    QLabel[role="message"][status="info"] {
+        background-color: #17a2b8;
+    }
+
+    /* Casier sélectionné */
+    QLabel[role="selection"] {
+        color: #ffffff;
+        background-color: #404040;
+        border-radius: 8px;
+        padding: 15px;
+        margin: 15px 0;
+    }
+
+    QLabel[role="selection"][status="selected"] {
+        background-color: #0078d4;
+    }
+
+    /* Boutons (BaseScreen.create_button) */
+    QPushButton[variant="primary"] {
+        background-color: #0078d4;
+        color: white;
+        border: none;
+        border-radius: 12px;
+        padding: 16px 32px;
+        font-size: 16px;
+        font-weight: bold;
+    }
+
+    QPushButton[variant="primary"]:hover {
+        background-color: #106ebe;
+    }
+
+    QPushButton[variant="primary"]:pressed {
+        background-color: #005a9e;
+    }
+
+    QPushButton[variant="secondary"] {
+        background-color: #404040;
+        color: white;
+        border: 2px solid #606060;
+        border-radius: 12px;
+        padding: 16px 32px;
+        font-size: 16px;
+        font-weight: bold;
+    }
+
+    QPushButton[variant="secondary"]:hover {
+        background-color: #505050;
+        border-color: #0078d4;
+    }
+
+    QPushButton[variant="secondary"]:pressed {
+        background-color: #303030;
+    }
+
+    QPushButton[variant="danger"] {
+        background-color: #d13438;
+        color: white;
+        border: none;
+        border-radius: 12px;
+        padding: 16px 32px;
+        font-size: 16px;
+        font-weight: bold;
+    }
+
+    QPushButton[variant="danger"]:hover {
+        background-color: #b52d32;
+    }
+
+    QPushButton[variant="danger"]:pressed {
+        background-color: #9a252a;
+    }
+
+    /* Claviers virtuels */
+    QFrame[keyboard="alpha"] {
+        background-color: #404040;
+        border-radius: 8px;
+        margin-top: 20px;
+    }
+
+    QFrame[keyboard="numeric"] {
+        background-color: #404040;
+        border-radius: 8px;
+        margin: 20px 0;
+    }
+
+    QPushButton[key] {
+        color: white;
+        border-radius: 6px;
+    }
+
+    QFrame[keyboard="numeric"] QPushButton[key] {
+        border-radius: 8px;
+    }
+
+    QPushButton[key="char"] {
+        background-color: #606060;
+    }
+
+    QPushButton[key="char"]:hover {
+        background-color: #707070;
+    }
+
+    QPushButton[key="delete"] {
+        background-color: #d13438;
+    }
+
+    QPushButton[key="delete"]:hover {
+        background-color: #b52d32;
+    }
+
+    QPushButton[key="clear"] {
+        background-color: #ffc107;
+        color: black;
+    }
+
+    QPushButton[key="clear"]:hover {
+        background-color: #e0a800;
+    }
+
+    QPushButton[key="confirm"] {
+        background-color: #28a745;
+    }
+
+    QPushButton[key="confirm"]:hover {
+        background-color: #218838;
+    }
+
+    /* Barres de titre et de statut de la fenêtre principale */
+    QWidget[role="titlebar"] {
+        background-color: #0078d4;
+        border-radius: 0px;
+    }
+
+    QWidget[role="statusbar"] {
+        background-color: #2d2d2d;
+        border-radius: 0px;
+    }
+
+    *[role="titlebar"] QLabel {
+        color: white;
+        background-color: transparent;
+    }
+
+    *[role="statusbar"] QLabel {
+        color: #cccccc;
+        background-color: transparent;
+        font-size: 12px;
+    }
+
+    /* Accueil */
+    QLabel[role="welcome"] {
+        color: #0078d4;
+        margin-bottom: 4px;
+    }
+
+    QLabel[role="heading"] {
+        margin-bottom: 2px;
+    }
+
+    QFrame[role="summary"] {
+        background-color: #2d2d2d;
+        border-radius: 7px;
+        border: 1px solid #404040;
+    }
+
+    QLabel[role="footnote"] {
+        background-color: #2d2d2d;
+        color: #cccccc;
+        border-radius: 5px;
+        padding: 2px;
+        border: 1px solid #404040;
+    }
+
+    QPushButton[variant="option"] {
+        background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
+            stop:0 #0078d4, stop:1 #005a9e);
+        color: white;
+        border: none;
+        border-radius: 7px;
+        padding: 2px 2px;
+    }
+
+    /* Saisie des codes (prépayé, digicode, code maître) */
+    QLineEdit[role="code"] {
+        background-color: #404040;
+        border: 2px solid #606060;
+        border-radius: 8px;
+        padding: 12px;
+        color: #ffffff;
+    }
+
+    QLineEdit[role="code"]:focus {
+        border-color: #0078d4;
+    }
+
+    QLineEdit[role="code"][variant="prepaid"] {
+        font-size: 18px;
+    }
+
+    QLineEdit[role="code"][variant="digicode"] {
+        padding: 15px;
+    }
+
+    /* Paiement QR et USSD */
+    QLabel[role="qr"] {
+        background-color: white;
+        border-radius: 12px;
+        padding: 20px;
+        margin: 20px 0;
+    }
+
+    QLabel[role="reference"] {
+        color: #0078d4;
+        margin: 10px 0;
+    }
+
+    QLabel[role="ussd"] {
+        color: #0078d4;
+        background-color: #404040;
+        border-radius: 12px;
+        padding: 30px;
+        border: 3px solid #0078d4;
+    }
+
+    /* Panneaux dans la zone de contenu (grille des casiers, génération des codes) */
+    QFrame[role="panel"] {
+        background-color: #404040;
+        border-radius: 8px;
+        padding: 15px;
+        margin: 10px 0;
+    }
+
+    QFrame[role="panel"][variant="grid"] {
+        padding: 20px;
+        margin: 20px 0;
+    }
+
+    QFrame[role="panel"] QLabel {
+        background-color: #404040;
+        border: none;
+    }
+
+    /* Grille des casiers: seules les cellules sont dessinées */
+    QListView[role="lockers"] {
+        background: transparent;
+        border: none;
+        padding: 0;
+        margin: 0;
+    }
+
+    QPushButton[role="zoom"] {
+        padding: 0;
+        min-height: 0;
+    }
+
+    /* Dialogue de réservation confirmée */
+    QDialog[role="success"] {
+        background-color: #2d2d2d;
+        color: #ffffff;
+    }
+
+    QLabel[role="success-title"] {
+        color: #28a745;
+        margin: 20px 0;
+        padding: 20px;
+        background-color: #404040;
+        border-radius: 12px;
+    }
+
+    QLabel[role="notice"] {
+        color: #ffffff;
+        background-color: #404040;
+        border-radius: 8px;
+        padding: 20px;
+        margin: 10px 0;
+    }
+
+    QLabel[role="save-status"] {
+        color: #cccccc;
+    }
+
+    QLabel[role="save-status"][status="saved"] {
+        color: #28a745;
+    }
+
+    QPushButton[variant="confirm"] {
+        background-color: #28a745;
+        color: white;
+        border-radius: 8px;
+        padding: 12px 24px;
+        min-width: 200px;
+    }
+
+    QPushButton[variant="confirm"]:hover {
+        background-color: #218838;
+    }
+
+    /* Administration */
+    QLabel[role="warning"] {
+        color: #dc3545;
+        margin: 10px 0;
+    }
+
+    QLabel[role="stats"] {
+        color: #cccccc;
+        margin: 5px 0;
+    }
+
+    QLabel[role="subsection"] {
+        color: #ffffff;
+        margin: 20px 0 10px 0;
+    }
+
+    QTabWidget[role="admin"]::pane {
+        border: 2px solid #404040;
+        border-radius: 8px;
+        background-color: #404040;
+    }
+
+    QTabWidget[role="admin"] QTabBar::tab {
+        background-color: #606060;
+        color: white;
+        padding: 12px 20px;
+        margin: 2px;
+        border-radius: 6px;
+    }
+
+    QTabWidget[role="admin"] QTabBar::tab:selected {
+        background-color: #0078d4;
+    }
+
+    QTabWidget[role="admin"] QTabBar::tab:hover {
+        background-color: #707070;
+    }
+
+    QTableView[role="data"] {
+        background-color: #2d2d2d;
+        color: #ffffff;
+        border: 1px solid #404040;
+        border-radius: 6px;
+    }
+
+    QTableView[role="data"]::item {
+        padding: 8px;
+        border-bottom: 1px solid #404040;
+    }
+
+    QTableView[role="data"] QHeaderView::section {
+        background-color: #404040;
+        color: #ffffff;
+        padding: 10px;
+        border: none;
+        font-weight: bold;
+    }
+
+    QLineEdit[role="setting"],
+    QSpinBox[role="setting"] {
+        background-color: #2d2d2d;
+        border: 1px solid #606060;
+        border-radius: 4px;
+        padding: 8px;
+        color: #ffffff;
+    }
+
+    QProgressBar[role="progress"] {
+        background-color: #2d2d2d;
+        border: 1px solid #606060;
+        border-radius: 4px;
+        color: #ffffff;
+        text-align: center;
+    }
+
+    QProgressBar[role="progress"]::chunk {
+        background-color: #0078d4;
+        border-radius: 4px;
+    }
+
+    QTextEdit[role="logs"] {
+        background-color: #1e1e1e;
+        color: #00ff00;
+        border: 1px solid #404040;
+        border-radius: 6px;
+        font-family: 'Courier New', monospace;
+        font-size: 12px;
+    }
+"""
+
+
+def apply_theme(app: QApplication):
+    """Installe la feuille de style de l'application"""
+    app.setStyleSheet(APP_STYLESHEET)
+
+
+def set_style_state(widget: QWidget, name: str, value: str):
+    """Change une propriété dynamique lue par la feuille de style
+
+    Le widget est repoli seul, sans nouvelle analyse de feuille de style; rien
+    n'est fait si la valeur ne change pas.
+    """
+    if widget.property(name) == value:
+        return
+    widget.setProperty(name, value)
+    style = widget.style()
+    style.unpolish(widget)
+    style.polish(widget)
+    widget.update()
\ No newline at end of file
@@ -0,0 +1,33 @@
+"""
+Configuration commune des tests (lancer `python -m pytest` depuis la racine du projet)
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core import logger
+
+
+@pytest.fixture(autouse=True, scope='session')
+def log_dir(tmp_path_factory):
+    """Écrit les logs des tests dans un dossier temporaire plutôt que dans logs/"""
+    previous = logger.LOG_DIR
+    logger.LOG_DIR = str(tmp_path_factory.mktemp("logs"))
+    yield logger.LOG_DIR
+    logger.LOG_DIR = previous
+
+
+@pytest.fixture
+def config(tmp_path):
+    """Configuration dont toutes les données sont écrites dans tmp_path"""
+    from src.core.config import Config
+
+    config = Config(str(tmp_path / "config.json"))
+    config.set('storage.data_dir', str(tmp_path))
+    config.set('storage.sqlite_path', str(tmp_path / "borne.db"))
+    config.set('payment.columnar_store_dir', str(tmp_path / "prepaid_codes"))
+    return config
@@ -0,0 +1,136 @@
+"""
+Tests du moteur d'écriture en arrière-plan
+"""
+
+import threading
+
+import pytest
+
+from src.core.storage import BackgroundStorage, JsonStorage
+
+CODE = {'code': "ABCD1234", 'value': 5.0, 'created_date': "2026-01-01T10:00:00",
+        'expiry_date': "2026-12-31T10:00:00", 'is_used': False, 'used_date': None}
+
+
+class GatedStorage(JsonStorage):
+    """Moteur JSON dont les écritures attendent l'ouverture d'une barrière"""
+
+    def __init__(self, data_dir):
+        super().__init__(data_dir, commit_window=0)
+        self.gate = threading.Event()
+        self.gate.set()
+        self.writes = 0
+
+    def save_locker(self, locker_id, is_occupied):
+        self.gate.wait()
+        self.writes += 1
+        super().save_locker(locker_id, is_occupied)
+
+    def save_prepaid_codes(self, codes_data):
+        self.gate.wait()
+        super().save_prepaid_codes(codes_data)
+
+
+def run_in_thread(target):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(target()), daemon=True)
+    thread.start()
+    return thread, result
+
+
+@pytest.fixture
+def storage(tmp_path):
+    backend = GatedStorage(str(tmp_path))
+    storage = BackgroundStorage(backend, max_pending=4)
+    yield storage
+    backend.gate.set()
+    storage.close()
+
+
+def test_pending_code_is_served_before_it_is_written(storage):
+    storage.backend.gate.clear()
+    storage.save_prepaid_codes([CODE])
+    storage.save_prepaid_codes([dict(CODE, is_used=True)])
+
+    # Servi depuis la dernière version soumise, sans attendre le thread d'écriture
+    assert storage.get_prepaid_code("ABCD1234")['is_used'] is True
+    storage.delete_prepaid_codes(["ABCD1234"])
+    assert storage.get_prepaid_code("ABCD1234") is None
+
+    storage.backend.gate.set()
+    storage.flush()
+    assert storage.get_prepaid_code("ABCD1234") is None
+
+
+def test_reads_wait_for_queued_writes_on_their_table(storage):
+    storage.backend.gate.clear()
+    storage.save_locker(1, True)
+
+    thread, result = run_in_thread(storage.load_lockers)
+    thread.join(0.1)
+    assert thread.is_alive()
+
+    storage.backend.gate.set()
+    thread.join(2)
+    assert result == [{'1': True}]
+
+
+def test_full_queue_blocks_the_caller(storage):
+    storage.backend.gate.clear()
+    storage.save_locker(1, True)
+
+    def fill():
+        for i in range(2, 12):
+            storage.save_locker(i, True)
+        return True
+
+    thread, result = run_in_thread(fill)
+    thread.join(0.2)
+    assert thread.is_alive() and storage.backend.writes == 0
+
+    storage.backend.gate.set()
+    thread.join(2)
+    storage.flush()
+    assert result == [True]
+    assert storage.backend.writes == 11
+    assert len(storage.load_lockers()) == 11
+
+
+def test_transaction_is_one_task_and_waits(storage):
+    with storage.transaction(wait=True):
+        storage.save_locker(1, True)
+        storage.save_session({'locker_id': 1, 'user_code': "1234", 'start_time': "2026-01-01T10:00:00"})
+        assert storage.backend.writes == 0
+
+    assert storage.backend.writes == 1
+    assert storage.load_sessions()[0]['user_code'] == "1234"
+
+
+def test_worker_error_is_raised_to_a_waiting_transaction(storage, monkeypatch):
+    def broken(locker_id, is_occupied):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(storage.backend, 'save_locker', broken)
+    with pytest.raises(OSError):
+        with storage.transaction(wait=True):
+            storage.save_locker(1, True)
+            storage.save_prepaid_codes([CODE])
+
+    assert storage.load_prepaid_codes() == []
+
+
+def test_failed_block_sends_nothing(storage):
+    with pytest.raises(RuntimeError):
+        with storage.transaction():
+            storage.save_locker(1, True)
+            raise RuntimeError("annulé")
+    storage.flush()
+    assert storage.backend.writes == 0
+
+
+def test_durability_callback_after_flush(storage):
+    durable = threading.Event()
+    storage.save_locker(1, True)
+    storage.when_durable(durable.set)
+    storage.flush()
+    assert durable.is_set()
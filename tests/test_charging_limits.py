@@ -0,0 +1,115 @@
+"""
+Tests de la limite de charge et de l'expiration des sessions qui en dépend
+"""
+
+import pytest
+
+from src.core.locker_manager import LockerManager
+from src.core.storage import JsonStorage
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def open_manager(config, tmp_path):
+    storages = []
+
+    def open_manager(**settings):
+        config.set('lockers.charging_time_limit', 7200)
+        config.set('lockers.charging_warnings', [900, 300])
+        config.set('security.session_timeout', 300)
+        for key, value in settings.items():
+            config.set(f'lockers.{key}', value)
+        storage = JsonStorage(str(tmp_path), commit_window=0)
+        storages.append(storage)
+        manager = LockerManager(config, storage)
+        manager.scheduler.clock = clock = FakeClock()
+        return manager, clock
+
+    yield open_manager
+    for storage in storages:
+        storage.close()
+
+
+def advance(manager, clock, seconds):
+    clock.now += seconds
+    manager.check_expired_sessions()
+
+
+def test_warnings_then_overtime(open_manager):
+    manager, clock = open_manager(charging_limit_action='overtime', max_overtime=3600)
+    warnings, limits = [], []
+    manager.charging.add_warning_listener(lambda locker_id, remaining: warnings.append(remaining))
+    manager.charging.add_limit_listener(lambda locker_id, action: limits.append(action))
+    manager.reserve_locker(1, "1234")
+
+    advance(manager, clock, 7200 - 900)
+    assert warnings == [900]
+    advance(manager, clock, 600)
+    assert warnings == [900, 300]
+    advance(manager, clock, 300)
+    assert limits == ['overtime']
+    assert manager.charging.is_overtime(1)
+    assert manager.get_session_info(1).overtime_ts is not None
+    assert not manager.is_locker_available(1)
+
+
+def test_overtime_session_expires_after_max_overtime(open_manager):
+    manager, clock = open_manager(charging_limit_action='overtime', max_overtime=3600)
+    manager.reserve_locker(1, "1234")
+
+    advance(manager, clock, 7200 + 3600 - 1)
+    assert not manager.is_locker_available(1)
+    advance(manager, clock, 1)
+    assert manager.is_locker_available(1)
+    assert not manager.charging.is_overtime(1)
+
+
+def test_unlimited_overtime_is_opt_in(open_manager):
+    manager, clock = open_manager(charging_limit_action='overtime', max_overtime=None)
+    manager.reserve_locker(1, "1234")
+
+    assert ('session_timeout', 1) not in manager.scheduler
+    advance(manager, clock, 7 * 86400)
+    assert not manager.is_locker_available(1)
+    assert manager.charging.is_overtime(1)
+
+
+def test_cutoff_then_expiry(open_manager):
+    manager, clock = open_manager(charging_limit_action='cutoff')
+    cut = []
+    manager.charging.power_cutoff = cut.append
+    manager.reserve_locker(2, "1234")
+
+    advance(manager, clock, 7200)
+    assert cut == [2]
+    assert 2 in manager.charging.cut_off
+    assert not manager.is_locker_available(2)
+
+    advance(manager, clock, 300)
+    assert manager.is_locker_available(2)
+    assert 2 not in manager.charging.cut_off
+
+
+def test_without_limit_sessions_use_session_timeout(open_manager):
+    manager, clock = open_manager(charging_time_limit=0)
+    manager.reserve_locker(1, "1234")
+
+    advance(manager, clock, 299)
+    assert not manager.is_locker_available(1)
+    advance(manager, clock, 1)
+    assert manager.is_locker_available(1)
+
+
+def test_release_cancels_pending_deadlines(open_manager):
+    manager, clock = open_manager(charging_limit_action='overtime')
+    manager.reserve_locker(1, "1234")
+    manager.release_locker(1)
+
+    assert len(manager.scheduler) == 0
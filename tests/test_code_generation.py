@@ -0,0 +1,59 @@
+"""
+Tests de la génération des codes prépayés par lots
+"""
+
+from src.core.payment_manager import CODE_ALPHABET, PaymentManager
+from src.core.storage import JsonStorage
+
+
+class CountingStorage(JsonStorage):
+    """Moteur JSON qui compte les écritures de codes"""
+
+    def __init__(self, data_dir):
+        super().__init__(data_dir, commit_window=0)
+        self.code_writes = []
+
+    def save_prepaid_codes(self, codes_data):
+        self.code_writes.append(len(codes_data))
+        super().save_prepaid_codes(codes_data)
+
+
+def test_batch_is_saved_in_one_write(config, tmp_path):
+    storage = CountingStorage(str(tmp_path))
+    manager = PaymentManager(config, storage)
+    progress = []
+
+    codes = manager.generate_prepaid_codes(500, 5.0, progress_callback=lambda done, total: progress.append(done))
+
+    assert len(codes) == len(set(codes)) == 500
+    assert all(len(code) == 8 and set(code) <= set(CODE_ALPHABET) for code in codes)
+    assert storage.code_writes == [500]
+    assert progress[-1] == 500 and progress == sorted(progress)
+    assert all(manager.validate_prepaid_code(code).value == 5.0 for code in codes)
+    storage.close()
+
+
+def test_batch_survives_restart(config, tmp_path):
+    storage = JsonStorage(str(tmp_path), commit_window=0)
+    codes = PaymentManager(config, storage).generate_prepaid_codes(50, 2.0, validity_days=10)
+    storage.close()
+
+    storage = JsonStorage(str(tmp_path))
+    manager = PaymentManager(config, storage)
+    for code in codes:
+        prepaid_code = manager.validate_prepaid_code(code)
+        assert prepaid_code.value == 2.0
+        assert prepaid_code.expiry_ts - prepaid_code.created_ts == 10 * 86400
+    storage.close()
+
+
+def test_new_codes_never_reuse_existing_ones(config, tmp_path):
+    config.set('payment.prepaid_code_length', 1)
+    storage = JsonStorage(str(tmp_path), commit_window=0)
+    manager = PaymentManager(config, storage)
+
+    first = manager.generate_prepaid_codes(20, 1.0)
+    second = manager.generate_prepaid_codes(len(CODE_ALPHABET) - 20, 1.0)
+
+    assert sorted(first + second) == sorted(CODE_ALPHABET)
+    storage.close()
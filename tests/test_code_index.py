@@ -0,0 +1,157 @@
+"""
+Tests de l'index des codes prépayés (filtres, tris, préfixe), comparé à un parcours complet
+"""
+
+import random
+
+import pytest
+
+from src.core.code_index import BUCKET_SECONDS, CodeIndex
+
+
+NOW = 1_800_000_000
+COLUMNS = {'value': 1, 'created': 2, 'expiry': 3}
+
+
+def make_records(count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    records = []
+    codes = set()
+    while len(records) < count:
+        code = "".join(rng.choice("0123456789ABCDEF") for _ in range(6))
+        if code in codes:
+            continue
+        codes.add(code)
+        value = rng.choice([2.0, 5.0, 10.0])
+        created_ts = NOW - rng.choice([0, 1, 2]) * BUCKET_SECONDS
+        expiry_ts = NOW + rng.randint(-5 * BUCKET_SECONDS, 5 * BUCKET_SECONDS)
+        used_ts = NOW - rng.randint(1, 1000) if rng.random() < 0.3 else None
+        records.append((code, value, created_ts, expiry_ts, used_ts))
+    return records
+
+
+def brute_force(records, now_ts, status=None, value=None, sort_by='created', descending=False,
+                prefix=None, batch=None, expiring_within=None) -> list:
+    result = []
+    for code, code_value, created_ts, expiry_ts, used_ts in records:
+        if prefix and not code.startswith(prefix):
+            continue
+        if batch is not None and (created_ts, code_value) != tuple(batch):
+            continue
+        if value is not None and code_value != value:
+            continue
+        if expiring_within is not None and not now_ts <= expiry_ts <= now_ts + expiring_within:
+            continue
+        if status == 'used' and used_ts is None:
+            continue
+        if status == 'expired' and (used_ts is not None or expiry_ts >= now_ts):
+            continue
+        if status == 'active' and (used_ts is not None or expiry_ts < now_ts):
+            continue
+        result.append((code, code_value, created_ts, expiry_ts, used_ts))
+
+    result.sort(key=lambda record: record[0])
+    if sort_by == 'used':
+        result.sort(key=lambda record: record[4] or 0)
+    elif sort_by != 'code':
+        result.sort(key=lambda record: record[COLUMNS[sort_by]])
+    codes = [record[0] for record in result]
+    if descending:
+        codes.reverse()
+    return codes
+
+
+@pytest.fixture
+def records():
+    return make_records(400)
+
+
+@pytest.mark.parametrize('status', [None, 'used', 'expired', 'active'])
+@pytest.mark.parametrize('sort_by', ['code', 'value', 'created', 'expiry', 'used'])
+def test_status_and_sort_match_full_scan(records, status, sort_by):
+    index = CodeIndex(records)
+    for descending in (False, True):
+        assert (index.query(NOW, status=status, sort_by=sort_by, descending=descending)
+                == brute_force(records, NOW, status=status, sort_by=sort_by, descending=descending))
+
+
+@pytest.mark.parametrize('filters', [
+    {'value': 5.0},
+    {'value': 5.0, 'status': 'active'},
+    {'batch': (NOW - BUCKET_SECONDS, 10.0)},
+    {'batch': (NOW, 2.0), 'status': 'used'},
+    {'expiring_within': 2 * BUCKET_SECONDS},
+    {'expiring_within': 3600, 'value': 2.0},
+    {'prefix': "A"},
+    {'prefix': "3F", 'status': 'active'},
+    {'prefix': "ZZ"},
+    {'value': 7.0},
+])
+def test_filters_match_full_scan(records, filters):
+    index = CodeIndex(records)
+    assert index.query(NOW, **filters) == brute_force(records, NOW, **filters)
+
+
+def test_prefix_matches_are_sorted(records):
+    index = CodeIndex(records)
+    for prefix in ("", "0", "A", "B7", "FFFF"):
+        expected = sorted(record[0] for record in records if record[0].startswith(prefix))
+        assert index.prefix_matches(prefix) == expected
+
+
+def test_add_many_and_set_used_update_the_index(records):
+    index = CodeIndex(records[:200])
+    index.add_many(records[200:])
+    # Un code déjà indexé n'est pas ajouté une seconde fois
+    index.add_many(records[:10])
+    assert len(index) == len(records)
+
+    records = list(records)
+    for position in range(0, len(records), 7):
+        code, value, created_ts, expiry_ts, used_ts = records[position]
+        used_ts = None if used_ts is not None else NOW - 5
+        index.set_used(code, used_ts)
+        records[position] = (code, value, created_ts, expiry_ts, used_ts)
+
+    for status in (None, 'used', 'expired', 'active'):
+        assert (index.query(NOW, status=status, sort_by='used')
+                == brute_force(records, NOW, status=status, sort_by='used'))
+    index.set_used("INCONNU", NOW)
+    assert "INCONNU" not in index
+
+
+def test_remove_many_and_remove_expired(records):
+    index = CodeIndex(records)
+    removed = {record[0] for record in records[::3]}
+    index.remove_many(removed)
+    remaining = [record for record in records if record[0] not in removed]
+    assert index.query(NOW, sort_by='code') == brute_force(remaining, NOW, sort_by='code')
+    assert index.prefix_matches("") == sorted(record[0] for record in remaining)
+
+    index.remove_expired(NOW)
+    remaining = [record for record in remaining if record[3] >= NOW]
+    assert index.query(NOW, sort_by='expiry') == brute_force(remaining, NOW, sort_by='expiry')
+    assert index.query(NOW, status='expired') == []
+
+
+def test_statistics_batches_and_values(records):
+    index = CodeIndex(records)
+    unused = [record for record in records if record[4] is None]
+    expired = [record for record in unused if record[3] < NOW]
+    active = [record for record in unused if record[3] >= NOW]
+
+    assert index.statistics(NOW) == {
+        'total': len(records),
+        'used': len(records) - len(unused),
+        'expired': len(expired),
+        'active': len(active),
+        'active_value': round(sum(record[1] for record in active), 2),
+    }
+    assert index.values() == sorted({record[1] for record in records})
+
+    batches = {}
+    for record in records:
+        batches[(record[2], record[1])] = batches.get((record[2], record[1]), 0) + 1
+    expected = [(created_ts, value, count) for (created_ts, value), count
+                in sorted(batches.items(), reverse=True)]
+    assert index.batches() == expected
@@ -0,0 +1,129 @@
+"""
+Tests du stockage colonnaire des codes prépayés
+"""
+
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src.core.columnar_codes import _HEADER_COUNT, ColumnarCodeStore
+from src.core.records import PrepaidCode
+
+NOW = int(time.time())
+
+
+def make_codes(count, prefix="C", expiry_ts=NOW + 3600):
+    return [PrepaidCode.from_epoch(f"{prefix}{i:07d}", 5.0, NOW, expiry_ts) for i in range(count)]
+
+
+def test_add_and_lookup(tmp_path):
+    store = ColumnarCodeStore(str(tmp_path), initial_capacity=16)
+    assert store.is_new
+    store.add_many(make_codes(100))
+
+    assert len(store) == 100
+    assert "C0000042" in store
+    assert store["C0000042"].value == 5.0
+    assert store.get("C9999999") is None
+    assert "trop-long-pour-la-colonne" not in store
+    with pytest.raises(ValueError):
+        store.add_many([PrepaidCode.from_epoch("é", 1.0, NOW, NOW)])
+    assert len(store) == 100
+
+
+def test_save_updates_row(tmp_path):
+    store = ColumnarCodeStore(str(tmp_path))
+    store.add_many(make_codes(3))
+    code = store["C0000001"]
+    code.is_used = True
+    code.used_ts = NOW
+    store.save(code)
+
+    assert store["C0000001"].is_used
+    assert store["C0000001"].used_ts == NOW
+    assert not store["C0000002"].is_used
+
+
+def test_reopen_keeps_codes(tmp_path):
+    store = ColumnarCodeStore(str(tmp_path), initial_capacity=16)
+    store.add_many(make_codes(50))
+    store.delete_many(["C0000007"])
+    store.close()
+
+    reopened = ColumnarCodeStore(str(tmp_path))
+    assert not reopened.is_new
+    assert len(reopened) == 49
+    assert "C0000007" not in reopened
+    assert reopened["C0000049"].expiry_ts == NOW + 3600
+
+
+def test_remove_expired_and_statistics(tmp_path):
+    store = ColumnarCodeStore(str(tmp_path))
+    store.add_many(make_codes(10, "A", expiry_ts=NOW - 10) + make_codes(5, "B"))
+
+    stats = store.statistics(datetime.fromtimestamp(NOW))
+    assert (stats['total'], stats['expired'], stats['active']) == (15, 10, 5)
+    assert store.remove_expired(datetime.fromtimestamp(NOW)) == 10
+    assert sorted(store) == [f"B{i:07d}" for i in range(5)]
+
+
+def test_compaction_switches_generation(tmp_path):
+    store = ColumnarCodeStore(str(tmp_path))
+    store.add_many(make_codes(3000, "A", expiry_ts=NOW - 10) + make_codes(100, "B"))
+
+    assert store.remove_expired() == 3000
+    assert store.count == 100
+    assert store.generation > 0
+    assert "B0000099" in store
+    store.close()
+
+    files = sorted(os.listdir(tmp_path))
+    assert files == sorted(["header.npy"] + [f"{name}.{store.generation}.npy"
+                                             for name in ColumnarCodeStore.COLUMNS + ('index',)])
+    reopened = ColumnarCodeStore(str(tmp_path))
+    assert sorted(reopened) == [f"B{i:07d}" for i in range(100)]
+
+
+def test_interrupted_rewrite_keeps_previous_generation(tmp_path):
+    store = ColumnarCodeStore(str(tmp_path), initial_capacity=16)
+    store.add_many(make_codes(10))
+    # Coupure après l'écriture d'une partie de la génération suivante
+    np.save(os.path.join(tmp_path, "codes.1.npy"), np.zeros(4, dtype='S8'))
+    store.close()
+
+    reopened = ColumnarCodeStore(str(tmp_path))
+    assert reopened.generation == 0
+    assert len(reopened) == 10 and "C0000009" in reopened
+    assert not os.path.exists(os.path.join(tmp_path, "codes.1.npy"))
+
+
+def test_stale_index_is_rebuilt_on_open(tmp_path):
+    store = ColumnarCodeStore(str(tmp_path), initial_capacity=16)
+    store.add_many(make_codes(10))
+    # Coupure entre l'écriture de l'index et celle de l'en-tête (et index vidé)
+    store.index[:] = -1
+    store.header[_HEADER_COUNT] = 10
+    store.close()
+
+    reopened = ColumnarCodeStore(str(tmp_path))
+    assert all(f"C{i:07d}" in reopened for i in range(10))
+
+
+def test_rows_beyond_header_count_are_ignored(tmp_path):
+    store = ColumnarCodeStore(str(tmp_path), initial_capacity=16)
+    store.add_many(make_codes(5))
+    # Lignes écrites (colonnes et index) mais en-tête pas encore mis à jour
+    store.add_many(make_codes(3, "D"))
+    store.header[_HEADER_COUNT] = 5
+    store.header[1] = 5
+    store.close()
+
+    reopened = ColumnarCodeStore(str(tmp_path))
+    assert len(reopened) == 5
+    assert "D0000000" not in reopened
+    reopened.add_many(make_codes(2, "E"))
+    assert "E0000001" in reopened and "D0000001" not in reopened
@@ -0,0 +1,84 @@
+"""
+Tests de l'historique indexé des sessions terminées
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.core.history import SessionHistory
+
+DAY = datetime(2026, 3, 1, 8, 0, 0)
+
+
+def session(locker_id, end, payment_method='prepaid'):
+    return {'locker_id': locker_id, 'user_code': "1234",
+            'start_time': (end - timedelta(hours=1)).isoformat(), 'end_time': end.isoformat(),
+            'payment_method': payment_method, 'amount_paid': 2.0, 'overtime_fee': 0.0}
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = SessionHistory(str(tmp_path / "session_history.jsonl"), durable=False)
+    yield history
+    history.close()
+
+
+def test_records_drop_the_user_code(history):
+    history.append(session(1, DAY))
+    [record] = history.query()
+    assert 'user_code' not in record
+    assert record['end_time'] == DAY.isoformat()
+
+
+def test_query_matches_a_full_scan(history):
+    rng = random.Random(7)
+    sessions = []
+    # Ajouts dans le désordre: l'index reste trié par date de fin
+    for _ in range(300):
+        end = DAY + timedelta(minutes=rng.randrange(0, 30 * 24 * 60))
+        sessions.append(session(rng.randint(1, 8), end, rng.choice(['prepaid', 'qr', 'ussd'])))
+        history.append(sessions[-1])
+
+    start, end = DAY + timedelta(days=5), DAY + timedelta(days=12)
+    for locker_id in (None, 3):
+        for payment_method in (None, 'qr'):
+            expected = sorted(
+                (data['end_time'], data['locker_id']) for data in sessions
+                if start.isoformat() <= data['end_time'] <= end.isoformat()
+                and locker_id in (None, data['locker_id'])
+                and payment_method in (None, data['payment_method'])
+            )
+            results = history.query(locker_id, start, end, payment_method)
+            assert [(data['end_time'], data['locker_id']) for data in results] == expected
+
+
+def test_bounds_are_inclusive(history):
+    for hour in range(5):
+        history.append(session(1, DAY + timedelta(hours=hour)))
+
+    results = history.query(start=DAY + timedelta(hours=1), end=DAY + timedelta(hours=3))
+    assert len(results) == 3
+    assert history.query(locker_id=2) == []
+    assert history.query(payment_method='inconnu') == []
+
+
+def test_reload_and_truncated_line(tmp_path):
+    path = tmp_path / "session_history.jsonl"
+    history = SessionHistory(str(path), durable=False)
+    history.append(session(1, DAY))
+    history.append(session(2, DAY + timedelta(hours=1)))
+    history.close()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"locker_id": 3, "end_')
+
+    reloaded = SessionHistory(str(path), durable=False)
+    assert len(reloaded) == 2
+    assert [data['locker_id'] for data in reloaded.query()] == [1, 2]
+    reloaded.append(session(4, DAY + timedelta(hours=2)))
+    reloaded.close()
+
+    reopened = SessionHistory(str(path))
+    assert [data['locker_id'] for data in reopened.query()] == [1, 2, 4]
+    reopened.close()
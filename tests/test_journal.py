@@ -0,0 +1,179 @@
+"""
+Tests du journal append-only (relecture, compaction, fin tronquée)
+"""
+
+import errno
+import json
+import os
+
+import pytest
+
+from src.core.journal import AppendOnlyJournal, JournalStorage
+
+
+def apply_set(state: dict, entry: dict):
+    state[entry['key']] = entry['value']
+
+
+def open_journal(directory, compact_every=500) -> AppendOnlyJournal:
+    return AppendOnlyJournal(
+        os.path.join(directory, "test.journal"),
+        os.path.join(directory, "test.snapshot.json"),
+        apply_set,
+        compact_every=compact_every,
+        durable=False
+    )
+
+
+def wait_compaction(journal: AppendOnlyJournal):
+    if journal._compaction_thread is not None:
+        journal._compaction_thread.join()
+
+
+def test_replay_after_crash(tmp_path):
+    journal = open_journal(tmp_path)
+    journal.replay({})
+    for i in range(5):
+        journal.append({'key': f"k{i}", 'value': i})
+    journal.append({'key': "k0", 'value': 10})
+    # Pas de close(): coupure de courant, seul le journal est sur le disque
+
+    state = open_journal(tmp_path).replay({})
+    assert state == {'k0': 10, 'k1': 1, 'k2': 2, 'k3': 3, 'k4': 4}
+
+
+def test_close_compacts_into_snapshot(tmp_path):
+    journal = open_journal(tmp_path)
+    journal.replay({})
+    journal.append({'key': "a", 'value': 1})
+    journal.append({'key': "b", 'value': 2})
+    journal.close()
+
+    with open(os.path.join(tmp_path, "test.snapshot.json"), encoding='utf-8') as f:
+        snapshot = json.load(f)
+    assert snapshot == {'seq': 2, 'state': {'a': 1, 'b': 2}}
+    assert os.path.getsize(os.path.join(tmp_path, "test.journal")) == 0
+
+    reopened = open_journal(tmp_path)
+    assert reopened.replay({}) == {'a': 1, 'b': 2}
+    reopened.append({'key': "c", 'value': 3})
+    assert open_journal(tmp_path).replay({}) == {'a': 1, 'b': 2, 'c': 3}
+
+
+def test_background_compaction_keeps_later_entries(tmp_path):
+    journal = open_journal(tmp_path, compact_every=3)
+    journal.replay({})
+    for i in range(3):
+        journal.append({'key': f"k{i}", 'value': i})
+    wait_compaction(journal)
+    for i in range(3, 5):
+        journal.append({'key': f"k{i}", 'value': i})
+
+    with open(os.path.join(tmp_path, "test.snapshot.json"), encoding='utf-8') as f:
+        assert json.load(f)['seq'] == 3
+    assert not os.path.exists(journal.compacting_path)
+    with open(journal.journal_path, encoding='utf-8') as f:
+        assert [json.loads(line)['seq'] for line in f] == [4, 5]
+
+    assert open_journal(tmp_path).replay({}) == {f"k{i}": i for i in range(5)}
+
+
+def test_interrupted_compaction_segment_is_replayed(tmp_path):
+    journal = open_journal(tmp_path)
+    journal.replay({})
+    journal.append({'key': "a", 'value': 1})
+    journal.append({'key': "b", 'value': 2})
+    journal._file.close()
+    # Coupure pendant la compaction: segment basculé, instantané pas encore écrit
+    os.replace(journal.journal_path, journal.compacting_path)
+
+    reopened = open_journal(tmp_path)
+    assert reopened.replay({}) == {'a': 1, 'b': 2}
+    reopened.append({'key': "c", 'value': 3})
+    reopened.compact()
+    assert not os.path.exists(reopened.compacting_path)
+    assert open_journal(tmp_path).replay({}) == {'a': 1, 'b': 2, 'c': 3}
+
+
+def test_truncated_tail_is_ignored_and_removed(tmp_path):
+    journal = open_journal(tmp_path)
+    journal.replay({})
+    journal.append({'key': "a", 'value': 1})
+    journal._file.close()
+    with open(journal.journal_path, 'a', encoding='utf-8') as f:
+        f.write('{"key": "b", "value": 2, "se')
+
+    reopened = open_journal(tmp_path)
+    assert reopened.replay({}) == {'a': 1}
+    with open(reopened.journal_path, 'rb') as f:
+        assert f.read().endswith(b"}\n")
+
+    # Les ajouts suivants repartent sur une ligne propre
+    reopened.append({'key': "c", 'value': 3})
+    assert open_journal(tmp_path).replay({}) == {'a': 1, 'c': 3}
+
+
+def test_failed_append_is_raised_and_removed(tmp_path, monkeypatch):
+    journal = open_journal(tmp_path)
+    journal.durable = True
+    journal.replay({})
+    journal.append({'key': "a", 'value': 1})
+
+    def fsync(fd):
+        raise OSError(errno.EIO, "erreur d'entrée/sortie")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(os, 'fsync', fsync)
+        with pytest.raises(OSError):
+            journal.append({'key': "b", 'value': 2})
+
+    # Ni appliquée à l'état, ni rejouée au redémarrage
+    assert journal.state == {'a': 1}
+    journal.append({'key': "c", 'value': 3})
+    assert open_journal(tmp_path).replay({}) == {'a': 1, 'c': 3}
+
+
+@pytest.fixture
+def journal_storage(tmp_path):
+    storage = JournalStorage(str(tmp_path), compact_every=500, commit_window=0)
+    yield storage
+    storage.close()
+
+
+def test_transaction_is_one_journal_line(tmp_path, journal_storage):
+    journal_storage.load_lockers()
+    with journal_storage.transaction():
+        journal_storage.save_locker(1, True)
+        journal_storage.save_session({'locker_id': 1, 'user_code': "1234",
+                                      'start_time': "2026-01-01T10:00:00"})
+        journal_storage.delete_pending_payments(["REF1"])
+
+    with open(journal_storage.journal.journal_path, encoding='utf-8') as f:
+        entries = [json.loads(line) for line in f]
+    assert [entry['op'] for entry in entries] == ['batch']
+    assert [entry['op'] for entry in entries[0]['entries']] == ['locker', 'session', 'end_pending']
+
+
+def test_failed_transaction_is_not_journaled(tmp_path, journal_storage):
+    journal_storage.save_locker(2, False)
+    with pytest.raises(RuntimeError):
+        with journal_storage.transaction():
+            journal_storage.save_locker(2, True)
+            raise RuntimeError("échec")
+
+    assert journal_storage.load_lockers()['2'] is False
+    journal_storage.close()
+    assert JournalStorage(str(tmp_path)).load_lockers()['2'] is False
+
+
+def test_pending_payments_survive_restart(tmp_path, journal_storage):
+    payment = {'reference': "REF1", 'method': "qr", 'amount': 5.0,
+               'created_ts': 1.0, 'expires_ts': 2.0, 'confirmed_ts': None}
+    journal_storage.save_pending_payment(payment)
+    journal_storage.save_pending_payment(dict(payment, reference="REF2"))
+    journal_storage.delete_pending_payments(["REF2"])
+    journal_storage.close()
+
+    reopened = JournalStorage(str(tmp_path))
+    assert reopened.load_pending_payments() == [payment]
+    reopened.close()
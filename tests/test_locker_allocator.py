@@ -0,0 +1,96 @@
+"""
+Tests de l'attribution des casiers libres
+"""
+
+import pytest
+
+from src.core.locker_allocator import (
+    FirstFreePolicy, LockerAllocator, PreferenceOrderPolicy, RoundRobinPolicy
+)
+from src.core.locker_manager import LockerManager
+from src.core.storage import JsonStorage
+
+
+def make_allocator(policy=None, count=8, free=None, port_types=None):
+    allocator = LockerAllocator(range(1, count + 1), port_types, policy)
+    allocator.start(range(1, count + 1) if free is None else free)
+    return allocator
+
+
+def allocate(allocator, port_type=None):
+    locker_id = allocator.next_free(port_type)
+    if locker_id is not None:
+        allocator.mark_occupied(locker_id)
+        allocator.policy.allocated(locker_id)
+    return locker_id
+
+
+def test_bitmask_tracks_free_lockers():
+    allocator = make_allocator(free=[1, 3, 5, 3])
+    assert allocator.free_count() == 3
+    assert allocator.free_lockers() == [1, 3, 5]
+
+    allocator.mark_occupied(3)
+    allocator.mark_occupied(3)
+    allocator.mark_free(8)
+    allocator.mark_free(8)
+
+    assert allocator.free_count() == 3
+    assert allocator.free_lockers() == [1, 5, 8]
+    assert allocator.is_free(8) and not allocator.is_free(3)
+    assert not allocator.is_free(-1)
+
+
+def test_first_free_policy():
+    allocator = make_allocator(FirstFreePolicy(), count=4)
+    assert [allocate(allocator) for _ in range(5)] == [1, 2, 3, 4, None]
+    allocator.mark_free(2)
+    assert allocate(allocator) == 2
+
+
+def test_round_robin_policy_wraps_around():
+    allocator = make_allocator(RoundRobinPolicy(), count=4)
+    assert [allocate(allocator) for _ in range(3)] == [1, 2, 3]
+    allocator.mark_free(1)
+    allocator.mark_free(2)
+    assert allocate(allocator) == 4
+    assert allocate(allocator) == 1
+
+
+def test_preference_order_policy():
+    allocator = make_allocator(PreferenceOrderPolicy([5, 2]), count=6)
+    assert [allocate(allocator) for _ in range(4)] == [5, 2, 1, 3]
+    allocator.mark_free(5)
+    assert allocate(allocator) == 5
+
+
+@pytest.mark.parametrize('policy', [FirstFreePolicy, RoundRobinPolicy, lambda: PreferenceOrderPolicy([4, 3])])
+def test_port_type_filter(policy):
+    allocator = make_allocator(policy(), count=4, port_types={2: 'usb-c', 4: 'usb-c', 3: 'lightning'})
+    picked = {allocate(allocator, 'usb-c'), allocate(allocator, 'usb-c')}
+    assert picked == {2, 4}
+    assert allocate(allocator, 'usb-c') is None
+    assert allocate(allocator, 'inconnu') is None
+    assert allocate(allocator, 'lightning') == 3
+
+
+def test_manager_reserve_any(config, tmp_path):
+    config.set('lockers.count', 3)
+    config.set('lockers.allocation_policy', 'nearest')
+    config.set('lockers.screen_order', [3, 1])
+    storage = JsonStorage(str(tmp_path), commit_window=0)
+    manager = LockerManager(config, storage)
+
+    assert manager.reserve_any("1111") == 3
+    assert manager.reserve_any("2222") == 1
+    assert manager.available_count() == 1
+    assert manager.reserve_any("3333") == 2
+    assert manager.reserve_any("4444") is None
+    manager.release_locker(1)
+    assert manager.get_available_lockers() == [1]
+    storage.close()
+
+    # Après redémarrage, les casiers occupés ne sont pas libres
+    storage = JsonStorage(str(tmp_path))
+    assert LockerManager(config, storage).get_available_lockers() == [1]
+    storage.close()
@@ -0,0 +1,173 @@
+"""
+Tests du client du fournisseur de paiement (nouvelles tentatives, coupe-circuit)
+"""
+
+import time
+
+import pytest
+
+from src.core.payment_provider import CircuitBreaker, PaymentProviderClient
+from src.core.payment_stub import StubPaymentProvider
+
+
+class ScriptedProvider(StubPaymentProvider):
+    """Fournisseur local qui répond les erreurs prévues avant de fonctionner normalement"""
+
+    def __init__(self, errors=(), error_status=None):
+        super().__init__()
+        self.errors = list(errors)
+        self.error_status = error_status
+
+    def _route(self, method, path):
+        if self.errors:
+            return self.errors.pop(0), {'error': 'scripted'}
+        if self.error_status is not None:
+            return self.error_status, {'error': 'scripted'}
+        return super()._route(method, path)
+
+
+def wait_until(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.fixture
+def provider():
+    providers = []
+
+    def start(**kwargs):
+        stub = ScriptedProvider(**kwargs)
+        stub.start()
+        providers.append(stub)
+        return stub
+
+    yield start
+    for stub in providers:
+        stub.stop()
+
+
+@pytest.fixture
+def client():
+    clients = []
+
+    def open_client(url, **kwargs):
+        statuses = []
+        options = dict(poll_interval=0.02, timeout=1.0, backoff=0.01,
+                       failure_threshold=2, reset_timeout=30.0)
+        options.update(kwargs)
+        instance = PaymentProviderClient(url, lambda ref, status: statuses.append((ref, status)), **options)
+        clients.append(instance)
+        return instance, statuses
+
+    yield open_client
+    for instance in clients:
+        instance.close()
+
+
+def test_server_errors_are_retried(provider, client):
+    stub = provider(errors=[503, 502])
+    stub.confirm("REF1")
+    instance, statuses = client(stub.url, max_retries=3)
+
+    instance.watch("REF1", time.time() + 60)
+
+    assert wait_until(lambda: statuses == [("REF1", 'confirmed')])
+    assert stub.requests_served >= 3
+    assert instance.breaker.state == CircuitBreaker.CLOSED
+    assert instance.breaker.failures == 0
+
+
+def test_persistent_server_errors_open_the_breaker(provider, client):
+    stub = provider(error_status=503)
+    instance, statuses = client(stub.url, max_retries=1)
+
+    instance.watch("REF1", time.time() + 60)
+
+    assert wait_until(lambda: instance.breaker.state == CircuitBreaker.OPEN)
+    served = stub.requests_served
+    stub.error_status = None
+    stub.confirm("REF1")
+    time.sleep(0.2)
+    # Circuit ouvert: plus aucune interrogation jusqu'à reset_timeout
+    assert stub.requests_served == served
+    assert statuses == []
+
+
+def test_breaker_closes_after_successful_trial(provider, client):
+    stub = provider(error_status=503)
+    instance, statuses = client(stub.url, max_retries=0, reset_timeout=0.2)
+
+    instance.watch("REF1", time.time() + 60)
+    assert wait_until(lambda: instance.breaker.state == CircuitBreaker.OPEN)
+    stub.error_status = None
+    stub.confirm("REF1")
+
+    assert wait_until(lambda: statuses == [("REF1", 'confirmed')])
+    assert instance.breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.parametrize('error_status', [400, 403])
+def test_client_errors_do_not_trip_the_breaker(provider, client, error_status):
+    stub = provider(error_status=error_status)
+    instance, statuses = client(stub.url, max_retries=3)
+
+    instance.watch("REF1", time.time() + 60)
+    assert wait_until(lambda: stub.requests_served >= 5)
+    assert instance.breaker.state == CircuitBreaker.CLOSED
+    assert instance.breaker.failures == 0
+
+    # La référence reste suivie
+    stub.error_status = None
+    stub.confirm("REF1")
+    assert wait_until(lambda: statuses == [("REF1", 'confirmed')])
+
+
+def test_unknown_reference_stays_pending(provider, client):
+    stub = provider()
+    instance, statuses = client(stub.url)
+
+    instance.watch("REF1", time.time() + 60)
+    assert wait_until(lambda: stub.requests_served >= 3)
+    assert statuses == []
+    assert instance.breaker.state == CircuitBreaker.CLOSED
+
+    stub.fail("REF1")
+    assert wait_until(lambda: statuses == [("REF1", 'failed')])
+
+
+def test_circuit_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60.0)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    breaker.record_success()
+    assert breaker.failures == 0
+
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_circuit_breaker_allows_a_single_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+    # Échec de l'essai: le circuit se rouvre
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() and breaker.allow()
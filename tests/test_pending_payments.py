@@ -0,0 +1,195 @@
+"""
+Tests du registre des paiements en attente (échéance, confirmation, persistance)
+"""
+
+import threading
+
+import pytest
+
+from src.core import pending_payments
+from src.core.pending_payments import DuplicateReferenceError, PendingPaymentRegistry
+from src.core.storage import JsonStorage, create_storage
+
+
+class FakeClock:
+    """Remplace le module time du registre"""
+
+    def __init__(self, now: float = 1_800_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(pending_payments, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = JsonStorage(str(tmp_path), commit_window=0)
+    yield storage
+    storage.close()
+
+
+def stored_references(storage) -> list:
+    return sorted(data['reference'] for data in storage.load_pending_payments())
+
+
+def test_expired_payments_are_evicted(clock, storage):
+    registry = PendingPaymentRegistry(storage, ttl=60)
+    registry.register("REF1", 'qr', 5.0)
+    clock.now += 30
+    registry.register("REF2", 'ussd', 5.0)
+
+    clock.now += 31
+    assert registry.get("REF1") is None
+    assert registry.get("REF2") is not None
+    assert registry.evict_expired() == 1
+    assert len(registry) == 1
+    assert stored_references(storage) == ["REF2"]
+
+    clock.now += 30
+    assert registry.evict_expired() == 1
+    assert len(registry) == 0 and stored_references(storage) == []
+
+
+def test_confirm_extends_deadline_once(clock, storage):
+    registry = PendingPaymentRegistry(storage, ttl=60)
+    registry.register("REF1", 'qr', 5.0)
+    assert registry.confirm("INCONNU") == (None, False)
+
+    clock.now += 50
+    payment, confirmed = registry.confirm("REF1")
+    assert confirmed and payment.is_confirmed
+    assert payment.expires_ts == clock.now + 60
+    assert registry.confirm("REF1") == (payment, False)
+
+    # L'échéance d'origine est dépassée, pas celle de la confirmation
+    clock.now += 30
+    assert registry.evict_expired() == 0
+    assert registry.get("REF1") == payment
+    clock.now += 31
+    assert registry.confirm("REF1") == (None, False)
+
+
+def test_complete_and_restore(clock, storage):
+    registry = PendingPaymentRegistry(storage, ttl=60)
+    registry.register("REF1", 'ussd', 5.0)
+    assert registry.complete("REF1") is None
+
+    registry.confirm("REF1")
+    payment = registry.complete("REF1")
+    assert payment is not None and payment.reference == "REF1"
+    assert registry.get("REF1") is None and stored_references(storage) == []
+    assert registry.complete("REF1") is None
+
+    registry.restore(payment)
+    assert registry.get("REF1") == payment
+    assert stored_references(storage) == ["REF1"]
+
+    clock.now += 61
+    assert registry.complete("REF1") is None
+
+
+def test_duplicate_reference_is_rejected(clock, storage, monkeypatch):
+    registry = PendingPaymentRegistry(storage, ttl=60)
+    registry.register("REF1", 'qr', 5.0)
+    payment, _ = registry.confirm("REF1")
+
+    with pytest.raises(DuplicateReferenceError):
+        registry.register("REF1", 'ussd', 2.0)
+    assert registry.get("REF1") == payment
+
+    references = iter(["REF1", "REF1", "REF2"])
+    monkeypatch.setattr(pending_payments, 'new_payment_reference', lambda: next(references))
+    assert registry.new_reference() == "REF2"
+
+    # Une référence échue peut être attribuée de nouveau
+    clock.now += 121
+    assert registry.register("REF1", 'ussd', 2.0).method == 'ussd'
+
+
+def test_failed_write_leaves_registry_unchanged(clock, storage, monkeypatch):
+    registry = PendingPaymentRegistry(storage, ttl=60)
+    registry.register("REF1", 'qr', 5.0)
+
+    def save_pending_payment(payment_data):
+        raise OSError("carte SD pleine")
+
+    monkeypatch.setattr(storage, 'save_pending_payment', save_pending_payment)
+    with pytest.raises(OSError):
+        registry.register("REF2", 'qr', 5.0)
+    with pytest.raises(OSError):
+        registry.confirm("REF1")
+
+    assert registry.get("REF2") is None
+    assert not registry.get("REF1").is_confirmed
+
+
+def test_confirm_and_complete_are_written_in_order(tmp_path):
+    class GatedStorage(JsonStorage):
+        """Moteur JSON dont les enregistrements attendent l'ouverture d'une barrière"""
+
+        def __init__(self, data_dir):
+            super().__init__(data_dir, commit_window=0)
+            self.gate = threading.Event()
+            self.gate.set()
+            self.saving = threading.Event()
+
+        def save_pending_payment(self, payment_data):
+            self.saving.set()
+            self.gate.wait()
+            super().save_pending_payment(payment_data)
+
+    storage = GatedStorage(str(tmp_path))
+    registry = PendingPaymentRegistry(storage, ttl=60)
+    registry.register("REF1", 'qr', 5.0)
+
+    # Confirmation du fournisseur bloquée pendant son écriture
+    storage.gate.clear()
+    storage.saving.clear()
+    confirming = threading.Thread(target=registry.confirm, args=("REF1",), daemon=True)
+    confirming.start()
+    assert storage.saving.wait(5)
+
+    completed = []
+    completing = threading.Thread(target=lambda: completed.append(registry.complete("REF1")), daemon=True)
+    completing.start()
+    completing.join(0.1)
+    storage.gate.set()
+    confirming.join(5)
+    completing.join(5)
+
+    # Le rattachement est écrit après la confirmation: la référence ne revient pas
+    assert completed[0] is not None
+    assert stored_references(storage) == []
+    storage.close()
+
+
+@pytest.mark.parametrize('backend', ['json', 'journal', 'sqlite'])
+def test_payments_survive_restart(clock, config, backend):
+    config.set('storage.backend', backend)
+    config.set('storage.background_writes', True)
+    storage = create_storage(config)
+    registry = PendingPaymentRegistry(storage, ttl=60)
+    registry.register("REF1", 'qr', 5.0)
+    registry.register("REF2", 'ussd', 2.0)
+    registry.register("REF3", 'qr', 5.0)
+    clock.now += 30
+    confirmed, _ = registry.confirm("REF1")
+    registry.confirm("REF2")
+    registry.complete("REF2")
+    storage.close()
+
+    # REF3 échoit pendant l'arrêt; REF1, confirmé, a été prolongé
+    clock.now += 31
+    storage = create_storage(config)
+    registry = PendingPaymentRegistry(storage, ttl=60)
+    assert len(registry) == 1
+    assert registry.get("REF1") == confirmed
+    assert stored_references(storage) == ["REF1"]
+    storage.close()
@@ -0,0 +1,179 @@
+"""
+Tests des écritures atomiques groupées et du thread d'écriture
+"""
+
+import json
+import os
+import threading
+
+import pytest
+
+from src.core import persistence
+from src.core.persistence import GroupCommitWriter, PersistenceWorker
+
+
+def read(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class Unserializable:
+    pass
+
+
+@pytest.fixture
+def fsyncs(monkeypatch):
+    calls = []
+    original = os.fsync
+
+    def fsync(fd):
+        calls.append(fd)
+        original(fd)
+
+    monkeypatch.setattr(persistence.os, 'fsync', fsync)
+    return calls
+
+
+def test_writes_in_window_are_merged(tmp_path, fsyncs, monkeypatch):
+    replaced = []
+    original = os.replace
+    monkeypatch.setattr(persistence.os, 'replace', lambda src, dst: (replaced.append(dst), original(src, dst)))
+    writer = GroupCommitWriter(commit_window=60)
+    a, b = str(tmp_path / "a.json"), str(tmp_path / "b.json")
+
+    for i in range(10):
+        writer.write(a, {'version': i})
+    writer.write(b, [1, 2])
+    assert not os.path.exists(a) and writer.has_pending()
+    writer.flush()
+
+    assert read(a) == {'version': 9}
+    assert read(b) == [1, 2]
+    assert sorted(replaced) == [a, b]
+    # Un fichier temporaire par fichier, un seul répertoire synchronisé
+    assert len(fsyncs) == 3
+    assert not writer.has_pending()
+
+
+def test_commit_window_flushes_in_background(tmp_path):
+    writer = GroupCommitWriter(commit_window=0.01)
+    path = str(tmp_path / "a.json")
+    writer.write(path, {'x': 1})
+
+    for _ in range(200):
+        if os.path.exists(path):
+            break
+        threading.Event().wait(0.01)
+    assert read(path) == {'x': 1}
+
+
+def test_hold_defers_until_release(tmp_path):
+    writer = GroupCommitWriter(commit_window=0)
+    a, b = str(tmp_path / "a.json"), str(tmp_path / "b.json")
+
+    writer.hold()
+    writer.write(a, 1)
+    writer.write(b, 2)
+    assert not os.path.exists(a)
+    writer.release()
+
+    assert (read(a), read(b)) == (1, 2)
+
+
+def test_failed_temp_write_replaces_nothing(tmp_path):
+    writer = GroupCommitWriter(commit_window=0)
+    a, b = str(tmp_path / "a.json"), str(tmp_path / "b.json")
+    writer.write(a, 'old a')
+    writer.write(b, 'old b')
+
+    writer.hold()
+    writer.write(a, 'new a')
+    writer.write(b, Unserializable())
+    with pytest.raises(TypeError):
+        writer.release()
+
+    assert (read(a), read(b)) == ('old a', 'old b')
+    assert sorted(os.listdir(tmp_path)) == ["a.json", "b.json"]
+
+    # Les écritures restent en attente; une version plus récente les remplace
+    writer.write(b, 'new b')
+    assert (read(a), read(b)) == ('new a', 'new b')
+
+
+def test_failed_rename_is_raised_by_flush(tmp_path, monkeypatch):
+    writer = GroupCommitWriter(commit_window=60)
+    path = str(tmp_path / "a.json")
+    writer.write(path, 1)
+
+    def replace(src, dst):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(persistence.os, 'replace', replace)
+    with pytest.raises(OSError):
+        writer.flush()
+    assert writer.has_pending()
+
+    monkeypatch.undo()
+    writer.flush()
+    assert read(path) == 1
+
+
+def test_worker_batches_tasks_into_one_commit():
+    commits = []
+    gate = threading.Event()
+    worker = PersistenceWorker(lambda: commits.append(len(done)), max_pending=64)
+    done = []
+
+    # Le premier bloc occupe le thread pendant que les suivants s'accumulent
+    worker.submit(gate.wait)
+    for i in range(20):
+        worker.submit(lambda i=i: done.append(i))
+    gate.set()
+    worker.barrier()
+
+    assert done == list(range(20))
+    assert commits[-1] == 20
+    assert len(commits) <= 3
+    worker.close()
+    assert not worker.is_running()
+
+
+def test_worker_durability_callbacks_follow_commit():
+    events = []
+    worker = PersistenceWorker(lambda: events.append('commit'))
+    worker.submit(lambda: events.append('write'))
+    worker.when_durable(lambda: events.append('durable'))
+    worker.barrier()
+
+    assert events.index('durable') > events.index('commit') > events.index('write')
+    worker.close()
+
+
+def test_json_transaction_is_undone_when_commit_fails(tmp_path, monkeypatch):
+    from src.core.storage import JsonStorage
+
+    storage = JsonStorage(str(tmp_path), commit_window=0)
+    storage.save_locker(1, False)
+
+    def replace(src, dst):
+        raise OSError(5, "Input/output error")
+
+    monkeypatch.setattr(persistence.os, 'replace', replace)
+    with pytest.raises(OSError):
+        with storage.transaction():
+            storage.save_locker(1, True)
+            storage.save_session({'locker_id': 1, 'user_code': "1234",
+                                  'start_time': "2026-01-01T10:00:00"})
+            storage.append_session_history({'locker_id': 2, 'start_time': "2026-01-01T08:00:00",
+                                            'end_time': "2026-01-01T09:00:00"})
+    monkeypatch.undo()
+
+    assert storage.load_lockers() == {'1': False}
+    assert storage.load_sessions() == []
+    assert storage.query_session_history() == []
+    storage.close()
+
+    reopened = JsonStorage(str(tmp_path))
+    assert reopened.load_lockers() == {'1': False}
+    assert reopened.load_sessions() == []
+    reopened.close()
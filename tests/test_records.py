@@ -0,0 +1,62 @@
+"""
+Tests des enregistrements compacts (sessions et codes prépayés)
+"""
+
+from datetime import datetime
+
+import pytest
+
+from src.core.records import LockerSession, PrepaidCode, iso_from_epoch, to_epoch
+
+START = datetime(2026, 1, 1, 10, 0, 0)
+
+
+def test_to_epoch_accepts_every_date_format():
+    epoch = int(START.timestamp())
+    assert to_epoch(START) == epoch
+    assert to_epoch(START.isoformat()) == epoch
+    assert to_epoch(float(epoch) + 0.7) == epoch
+    assert to_epoch(None) is None
+    assert to_epoch('') is None
+    assert iso_from_epoch(epoch) == "2026-01-01T10:00:00"
+
+
+def test_session_round_trip():
+    session = LockerSession(3, "1234", START, payment_method="qr", amount_paid=2.0,
+                            overtime_since=START.replace(hour=12))
+    data = session.to_dict()
+
+    assert data['start_time'] == "2026-01-01T10:00:00"
+    assert data['end_time'] is None
+    assert data['overtime_since'] == "2026-01-01T12:00:00"
+    assert LockerSession.from_dict(data) == session
+    assert session.start_time == START
+    assert session.overtime_since == START.replace(hour=12)
+
+
+def test_session_dates_are_kept_as_epoch():
+    session = LockerSession(1, "1234", START)
+    session.end_time = START.replace(hour=11)
+
+    assert session.end_ts - session.start_ts == 3600
+    assert LockerSession.from_dict(dict(session.to_dict(), start_time=session.start_ts)) == session
+
+
+def test_code_round_trip_and_expiry():
+    code = PrepaidCode("ABCD1234", 10.0, START, START.replace(year=2027))
+    data = code.to_dict()
+
+    assert data == {'code': "ABCD1234", 'value': 10.0, 'created_date': "2026-01-01T10:00:00",
+                    'expiry_date': "2027-01-01T10:00:00", 'is_used': False, 'used_date': None}
+    assert PrepaidCode.from_dict(data) == code
+    assert PrepaidCode.from_epoch("ABCD1234", 10.0, code.created_ts, code.expiry_ts) == code
+    assert not code.is_expired(code.expiry_ts)
+    assert code.is_expired(code.expiry_ts + 1)
+
+
+@pytest.mark.parametrize('record', [LockerSession(1, "1234", START),
+                                    PrepaidCode("ABCD1234", 1.0, START, START)])
+def test_records_have_no_instance_dict(record):
+    assert not hasattr(record, '__dict__')
+    with pytest.raises(AttributeError):
+        record.unknown_field = 1
@@ -0,0 +1,108 @@
+"""
+Tests de l'ordonnanceur d'échéances et de l'expiration des sessions
+"""
+
+from src.core.locker_manager import LockerManager
+from src.core.scheduler import DeadlineScheduler
+from src.core.storage import JsonStorage
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_due_deadlines_fire_in_order():
+    clock = FakeClock()
+    scheduler = DeadlineScheduler(clock)
+    fired = []
+    for key, delay in (('c', 30), ('a', 10), ('b', 20), ('d', 40)):
+        scheduler.schedule_in(key, delay, lambda key=key: fired.append(key))
+
+    clock.now += 25
+    assert scheduler.run_due() == 2
+    assert fired == ['a', 'b']
+    assert len(scheduler) == 2
+    assert scheduler.time_until_next() == 5
+
+
+def test_reschedule_and_cancel():
+    clock = FakeClock()
+    scheduler = DeadlineScheduler(clock)
+    fired = []
+    scheduler.schedule_in('a', 10, lambda: fired.append('a'))
+    scheduler.schedule_in('b', 20, lambda: fired.append('b'))
+    scheduler.schedule_in('a', 30, lambda: fired.append('a2'))
+
+    assert scheduler.cancel('b')
+    assert not scheduler.cancel('b')
+    assert 'b' not in scheduler
+    assert scheduler.deadline_of('a') == clock.now + 30
+
+    clock.now += 25
+    assert scheduler.run_due() == 0
+    clock.now += 10
+    assert scheduler.run_due() == 1
+    assert fired == ['a2']
+    assert scheduler.next_deadline() is None
+
+
+def test_stale_entries_are_compacted():
+    scheduler = DeadlineScheduler(FakeClock())
+    for i in range(1000):
+        scheduler.schedule_in('same', i, lambda: None)
+
+    assert len(scheduler) == 1
+    assert len(scheduler._heap) <= 2 * 64
+
+
+def test_wakeup_callback_follows_next_deadline():
+    clock = FakeClock()
+    scheduler = DeadlineScheduler(clock)
+    wakeups = []
+    scheduler.set_wakeup_callback(lambda: wakeups.append(scheduler.time_until_next()))
+
+    scheduler.schedule_in('a', 10, lambda: None)
+    scheduler.schedule_in('b', 20, lambda: None)
+    scheduler.schedule_in('c', 5, lambda: None)
+    scheduler.cancel('c')
+    clock.now += 10
+    scheduler.run_due()
+
+    assert wakeups == [10, 5, 10, 10]
+
+
+def test_callback_may_schedule_during_run():
+    clock = FakeClock()
+    scheduler = DeadlineScheduler(clock)
+    fired = []
+    scheduler.schedule_in('a', 1, lambda: scheduler.schedule_in('b', 0, lambda: fired.append('b')))
+
+    clock.now += 1
+    assert scheduler.run_due() == 2
+    assert fired == ['b']
+
+
+def test_session_expires_at_its_deadline(config, tmp_path):
+    config.set('lockers.charging_time_limit', 0)
+    config.set('security.session_timeout', 300)
+    storage = JsonStorage(str(tmp_path), commit_window=0)
+    manager = LockerManager(config, storage)
+    clock = FakeClock()
+    manager.scheduler.clock = clock
+
+    manager.reserve_locker(1, "1234")
+    manager.reserve_locker(2, "5678")
+    clock.now += 120
+    manager.release_locker(2)
+    manager.reserve_locker(2, "5678")
+
+    clock.now += 200
+    assert manager.check_expired_sessions() == 1
+    assert manager.is_locker_available(1)
+    assert not manager.is_locker_available(2)
+    assert 90 < manager.time_until_next_deadline() <= 100
+    storage.close()
@@ -0,0 +1,97 @@
+"""
+Tests de l'import des fichiers JSON dans la base SQLite
+"""
+
+import os
+import sqlite3
+
+from src.core.storage import JsonStorage, SqliteStorage
+
+
+CODE = {'code': "ABCD1234", 'value': 10.0, 'created_date': "2026-01-01T10:00:00",
+        'expiry_date': "2026-12-31T10:00:00", 'is_used': False, 'used_date': None}
+
+SESSION = {'locker_id': 3, 'user_code': "1234", 'start_time': "2026-01-01T10:00:00",
+           'end_time': None, 'payment_method': "prepaid", 'amount_paid': 2.0,
+           'is_active': True, 'overtime_since': None}
+
+
+def write_json_data(data_dir):
+    source = JsonStorage(str(data_dir), commit_window=0)
+    source.save_locker(1, False)
+    source.save_locker(3, True)
+    source.save_session(SESSION)
+    source.save_session(dict(SESSION, locker_id=4, is_active=False))
+    source.save_prepaid_codes([CODE])
+    source.append_session_history({'locker_id': 2, 'start_time': "2026-01-01T08:00:00",
+                                   'end_time': "2026-01-01T09:00:00", 'payment_method': "qr",
+                                   'amount_paid': 2.0, 'overtime_fee': 0.0})
+    source.close()
+    return source
+
+
+def test_json_files_are_imported_once(tmp_path):
+    source = write_json_data(tmp_path)
+    json_files = [source.lockers_file, source.sessions_file, source.codes_file, source.history.path]
+
+    storage = SqliteStorage(str(tmp_path / "borne.db"), str(tmp_path))
+    assert storage.load_lockers() == {'1': False, '3': True}
+    assert storage.load_sessions() == [SESSION]
+    assert storage.load_prepaid_codes() == [CODE]
+    assert [data['locker_id'] for data in storage.query_session_history()] == [2]
+    assert storage.get_meta('json_migrated')
+    for path in json_files:
+        assert not os.path.exists(path)
+        assert os.path.exists(path + ".migrated")
+    storage.close()
+
+    # Un nouveau fichier JSON n'est plus importé au démarrage suivant
+    late = JsonStorage(str(tmp_path), commit_window=0)
+    late.save_locker(9, True)
+    late.close()
+    storage = SqliteStorage(str(tmp_path / "borne.db"), str(tmp_path))
+    assert storage.load_lockers() == {'1': False, '3': True}
+    assert os.path.exists(source.lockers_file)
+    storage.close()
+
+
+def test_failed_import_keeps_json_files(tmp_path):
+    source = write_json_data(tmp_path)
+    broken = JsonStorage(str(tmp_path), commit_window=0)
+    broken.save_prepaid_codes([{'code': "BROKEN", 'value': 5.0}])
+    broken.close()
+
+    storage = SqliteStorage(str(tmp_path / "borne.db"), str(tmp_path))
+    assert storage.get_meta('json_migrated') is None
+    assert storage.load_lockers() == {}
+    assert os.path.exists(source.lockers_file)
+    assert os.path.exists(source.codes_file)
+    storage.close()
+
+
+def test_old_sessions_table_is_upgraded(tmp_path):
+    db_path = str(tmp_path / "borne.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE sessions (
+            locker_id INTEGER PRIMARY KEY,
+            user_code TEXT NOT NULL,
+            start_time REAL NOT NULL,
+            end_time REAL,
+            payment_method TEXT NOT NULL DEFAULT '',
+            amount_paid REAL NOT NULL DEFAULT 0,
+            is_active INTEGER NOT NULL DEFAULT 1
+        );
+        INSERT INTO sessions (locker_id, user_code, start_time) VALUES (5, '9999', 1767261600.0);
+    """)
+    conn.commit()
+    conn.close()
+
+    storage = SqliteStorage(db_path, str(tmp_path))
+    sessions = storage.load_sessions()
+    assert [(data['locker_id'], data['overtime_since']) for data in sessions] == [(5, None)]
+
+    storage.save_session(dict(SESSION, overtime_since="2026-01-01T12:00:00"))
+    assert {data['locker_id']: data['overtime_since'] for data in storage.load_sessions()}[3] \
+        == "2026-01-01T12:00:00"
+    storage.close()
@@ -0,0 +1,141 @@
+"""
+Tests des réservations payées (code prépayé, paiement QR/USSD) et de leur annulation
+"""
+
+import contextlib
+import errno
+import os
+
+import pytest
+
+from src.core.config import Config
+from src.core.locker_manager import LockerManager
+from src.core.payment_manager import PaymentManager
+from src.core.storage import SqliteStorage, create_storage
+from src.core.transactions import ReservationService
+
+
+BACKENDS = [(backend, background) for backend in ('json', 'journal', 'sqlite')
+            for background in (False, True)]
+
+
+def open_kiosk(data_dir, backend, background):
+    config = Config(str(data_dir / "config.json"))
+    config.set('storage.backend', backend)
+    config.set('storage.data_dir', str(data_dir))
+    config.set('storage.sqlite_path', str(data_dir / "borne.db"))
+    config.set('storage.background_writes', background)
+    config.set('lockers.count', 2)
+    storage = create_storage(config)
+    payment_manager = PaymentManager(config, storage)
+    locker_manager = LockerManager(config, storage)
+    return storage, payment_manager, locker_manager
+
+
+@pytest.fixture(params=BACKENDS, ids=lambda p: f"{p[0]}-{'background' if p[1] else 'direct'}")
+def kiosk(request, tmp_path):
+    backend, background = request.param
+    storage, payment_manager, locker_manager = open_kiosk(tmp_path, backend, background)
+    yield storage, payment_manager, locker_manager
+    payment_manager.close()
+    storage.close()
+
+
+@contextlib.contextmanager
+def disk_error(monkeypatch, storage):
+    """Fait échouer toutes les écritures sur le support pendant le bloc
+
+    SQLite: base en lecture seule; JSON et journal: synchronisation refusée (EIO).
+    """
+    target = getattr(storage, 'backend', storage)
+    storage.flush()
+    if isinstance(target, SqliteStorage):
+        target._conn.execute("PRAGMA query_only = ON")
+        try:
+            yield
+        finally:
+            target._conn.execute("PRAGMA query_only = OFF")
+        return
+
+    def fsync(fd):
+        raise OSError(errno.EIO, "erreur d'entrée/sortie")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(os, 'fsync', fsync)
+        yield
+
+
+def test_redeem_and_reserve(kiosk, tmp_path):
+    storage, payment_manager, locker_manager = kiosk
+    service = ReservationService(payment_manager, locker_manager)
+    code = payment_manager.generate_prepaid_code(5.0)
+
+    locker_id = service.redeem_and_reserve(code, "1234", locker_id=2)
+
+    assert locker_id == 2
+    assert payment_manager.validate_prepaid_code(code) is None
+    assert not locker_manager.is_locker_available(2)
+    assert locker_manager.get_session_info(2).user_code == "1234"
+    assert service.redeem_and_reserve(code, "5678", locker_id=1) is None
+    assert locker_manager.is_locker_available(1)
+
+
+def test_redeem_and_reserve_rolls_back(kiosk, monkeypatch):
+    storage, payment_manager, locker_manager = kiosk
+    service = ReservationService(payment_manager, locker_manager)
+    code = payment_manager.generate_prepaid_code(5.0)
+
+    with disk_error(monkeypatch, storage):
+        assert service.redeem_and_reserve(code, "1234") is None
+
+    assert payment_manager.validate_prepaid_code(code) is not None
+    assert locker_manager.available_count() == 2
+    assert locker_manager.get_session_info(1) is None
+    assert service.redeem_and_reserve(code, "1234", locker_id=1) == 1
+
+
+@pytest.mark.parametrize('backend,background', BACKENDS)
+def test_rollback_survives_restart(tmp_path, monkeypatch, backend, background):
+    storage, payment_manager, locker_manager = open_kiosk(tmp_path, backend, background)
+    service = ReservationService(payment_manager, locker_manager)
+    code = payment_manager.generate_prepaid_code(5.0)
+    with disk_error(monkeypatch, storage):
+        assert service.redeem_and_reserve(code, "1234", locker_id=1) is None
+    payment_manager.close()
+    storage.close()
+
+    storage, payment_manager, locker_manager = open_kiosk(tmp_path, backend, background)
+    assert payment_manager.validate_prepaid_code(code) is not None
+    assert locker_manager.is_locker_available(1)
+    payment_manager.close()
+    storage.close()
+
+
+def test_reserve_paid(kiosk):
+    storage, payment_manager, locker_manager = kiosk
+    service = ReservationService(payment_manager, locker_manager)
+    payment_manager.register_pending_payment("REF1", 'qr', 5.0)
+
+    assert service.reserve_paid("REF1", "1234") is None
+    payment_manager.confirm_pending_payment("REF1")
+
+    locker_id = service.reserve_paid("REF1", "1234")
+    assert locker_id is not None
+    assert locker_manager.get_session_info(locker_id).payment_method == 'qr'
+    assert payment_manager.get_pending_payment("REF1") is None
+    assert service.reserve_paid("REF1", "5678") is None
+
+
+def test_reserve_paid_rolls_back(kiosk, monkeypatch):
+    storage, payment_manager, locker_manager = kiosk
+    service = ReservationService(payment_manager, locker_manager)
+    payment_manager.register_pending_payment("REF1", 'ussd', 5.0)
+    payment_manager.confirm_pending_payment("REF1")
+
+    with disk_error(monkeypatch, storage):
+        assert service.reserve_paid("REF1", "1234", locker_id=1) is None
+
+    payment = payment_manager.get_pending_payment("REF1")
+    assert payment is not None and payment.is_confirmed
+    assert locker_manager.is_locker_available(1)
+    assert service.reserve_paid("REF1", "1234", locker_id=1) == 1